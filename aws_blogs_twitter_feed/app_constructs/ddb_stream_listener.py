@@ -56,6 +56,7 @@ class DdbStreamListener(Construct):
         ##         "event_data": {
         ##             "type": "object",
         ##             "properties": {
+        ##                 "sort_key": {"type": "string"},
         ##                 "blog_url": {"type": "string"},
         ##                 "date_created": {"type": "string"},
         ##                 "title": {"type": "string"},
@@ -67,6 +68,7 @@ class DdbStreamListener(Construct):
         ##                 "featured_image_url": {"type": "string"},
         ##             },
         ##             "required": [
+        ##                 "sort_key",
         ##                 "blog_url",
         ##                 "date_created",
         ##                 "title",
@@ -86,6 +88,8 @@ class DdbStreamListener(Construct):
         ##     "required": ["data", "metadata"],
         ## }
 
+        # DynamoDB Streams allows at most two readers per shard. This pipe is
+        # the only one, other consumers follow the events on the bus.
         pipes.CfnPipe(
             scope=self,
             id="NewArticleFoundPipe",
@@ -100,12 +104,14 @@ class DdbStreamListener(Construct):
                     '{"metadata": {"event_id": <$.eventID>,'
                     '"event_time": "<aws.pipes.event.ingestion-time>",'
                     '"event_version": 1},"data": '
-                    '{"blog_url": "<$.dynamodb.NewImage.blog_url.S>",'
+                    '{"sort_key": "<$.dynamodb.Keys.SK.S>",'
+                    '"blog_url": "<$.dynamodb.NewImage.blog_url.S>",'
                     '"date_created": "<$.dynamodb.NewImage.date_created.S>",'
                     '"date_updated": "<$.dynamodb.NewImage.date_updated.S>",'
                     '"title": "<$.dynamodb.NewImage.title.S>",'
                     '"post_excerpt": "<$.dynamodb.NewImage.post_excerpt.S>",'
                     '"main_category": "<$.dynamodb.NewImage.main_category.S>",'
+                    '"featured_image_url": "<$.dynamodb.NewImage.featured_image_url.S>",'
                     '"categories": <$.dynamodb.NewImage.categories.SS>,'
                     '"authors": <$.dynamodb.NewImage.authors.SS>}}'
                 ),
@@ -125,7 +131,21 @@ class DdbStreamListener(Construct):
                             pattern=json.dumps(
                                 {
                                     "eventName": ["INSERT"],
-                                    "dynamodb": {"Keys": {"PK": {"S": ["BlogPost"]}}},
+                                    "dynamodb": {
+                                        # The legacy partition and the month partitions
+                                        "Keys": {
+                                            "PK": {
+                                                "S": [
+                                                    "BlogPost",
+                                                    {"prefix": "BlogPost#"},
+                                                ]
+                                            }
+                                        },
+                                        # Backfilled items must not be posted
+                                        "NewImage": {
+                                            "backfilled": {"BOOL": [{"exists": False}]}
+                                        },
+                                    },
                                 }
                             )
                         )
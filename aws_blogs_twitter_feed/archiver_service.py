@@ -0,0 +1,57 @@
+"""Archiver Service module."""
+
+from constructs import Construct
+from aws_cdk import (
+    Duration,
+    aws_events as events,
+    aws_events_targets as events_targets,
+    aws_lambda as lambda_,
+)
+
+
+class ArchiverService(Construct):
+    """ArchiverService class, responsible for rolling old blog posts into the archive."""
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        resources: dict,
+        archive_after_days: int = 90,
+    ) -> None:
+        """
+        Construct a new ArchiverService.
+
+        Once a day, the posts of the months that ended more than
+        archive_after_days ago are archived.
+        """
+        super().__init__(scope, construct_id)
+
+        handler = lambda_.Function(
+            self,
+            "ArchiverFunction",
+            runtime=lambda_.Runtime.PYTHON_3_9,
+            code=lambda_.Code.from_asset("resources/functions/archiver"),
+            handler="main.lambda_handler",
+            environment=dict(
+                BLOGS_TABLE=resources["table"].table_name,
+                ARCHIVE_AFTER_DAYS=str(archive_after_days),
+            ),
+            layers=[resources["common_layer"]],
+            # The first run archives the whole history, months that do not
+            # fit are left to the next runs
+            timeout=Duration.minutes(15),
+            memory_size=512,
+            tracing=lambda_.Tracing.ACTIVE,
+        )
+
+        events.Rule(
+            self,
+            "ArchiverEvent",
+            description="Archive the old blog posts",
+            enabled=True,
+            schedule=events.Schedule.rate(Duration.days(1)),
+            targets=[events_targets.LambdaFunction(handler=handler)],
+        )
+
+        resources["table"].grant_read_write_data(handler)
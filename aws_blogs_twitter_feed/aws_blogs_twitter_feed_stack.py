@@ -1,4 +1,5 @@
 """AWS Blogs Twitter Feed stack module."""
+import json
 from typing import Any
 
 from aws_cdk import Stack
@@ -8,16 +9,19 @@ from aws_cdk import (
     Fn,
     aws_dynamodb as dynamodb,
     aws_events as events,
+    aws_lambda as lambda_,
     aws_sqs as sqs,
     aws_secretsmanager as secretsmanager,
 )
 
 
+from . import archiver_service
 from . import blog_fetcher_service
-from . import twitter_poster_service
+from . import digest_poster_service
+from . import publisher_service
 from . import excerpt_poster_service
+from . import feed_generator_service
 from .app_constructs.ddb_stream_listener import DdbStreamListener
-from .app_constructs.mastodon_poster import MastodonPoster
 
 
 class AwsBlogsTwitterFeedStack(Stack):
@@ -25,6 +29,7 @@ class AwsBlogsTwitterFeedStack(Stack):
 
     def __init__(self, scope: Construct, construct_id: str, **kwargs: Any) -> None:
         """Constuct a new AwsBlogsTwitterFeedStack."""
+        # pylint: disable=too-many-locals
         super().__init__(scope, construct_id, **kwargs)
 
         blogs_table = dynamodb.Table(
@@ -37,6 +42,7 @@ class AwsBlogsTwitterFeedStack(Stack):
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
             point_in_time_recovery=True,
             stream=dynamodb.StreamViewType.NEW_AND_OLD_IMAGES,
+            time_to_live_attribute="expires_at",
         )
 
         blogs_table.add_global_secondary_index(
@@ -46,6 +52,18 @@ class AwsBlogsTwitterFeedStack(Stack):
             ),
         )
 
+        # Sparse index of the posts that wait for a digest, digest_pending is
+        # their main category until the digest poster posted them
+        blogs_table.add_global_secondary_index(
+            index_name="digest_pending_idx",
+            partition_key=dynamodb.Attribute(
+                name="digest_pending", type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(name="SK", type=dynamodb.AttributeType.STRING),
+            projection_type=dynamodb.ProjectionType.INCLUDE,
+            non_key_attributes=["blog_url", "title", "digest_tweet_id"],
+        )
+
         event_bus = events.EventBus(
             scope=self, id="EventBus", event_bus_name="aws_blogs_event_bus"
         )
@@ -57,6 +75,13 @@ class AwsBlogsTwitterFeedStack(Stack):
             event_pattern=events.EventPattern(account=[Fn.ref("AWS::AccountId")]),
         )
 
+        common_layer = lambda_.LayerVersion(
+            self,
+            "CommonLambdaLayer",
+            code=lambda_.Code.from_asset("resources/layers/common"),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_9],
+        )
+
         DdbStreamListener(
             scope=self,
             construct_id="DdbStreamListener",
@@ -64,12 +89,20 @@ class AwsBlogsTwitterFeedStack(Stack):
             table=blogs_table,
         )
 
-        MastodonPoster(scope=self, construct_id="MastodonPoster", event_bus=event_bus)
+        # Mastodon accounts to post to, e.g. per category:
+        # cdk deploy -c 'mastodon_targets=[{"name": "containers", "api_base_url":
+        #   "https://awscommunity.social/", "ssm_parameter": "mastodon_containers_access_token",
+        #   "categories": ["Containers"]}]'
+        mastodon_targets = self.node.try_get_context("mastodon_targets") or None
+        if isinstance(mastodon_targets, str):
+            mastodon_targets = json.loads(mastodon_targets)
 
         twitter_secret = secretsmanager.Secret(self, "TwitterSecret")
 
         twitter_post_dlq = sqs.Queue(self, "TwitterPostDLQ", fifo=True)
 
+        # New blogs reach the publisher as NewAWSBlogFound events, this queue
+        # takes sort keys to (re)publish by hand or from the DLQ
         twitter_post_queue = sqs.Queue(
             self,
             "TwitterPostQueue",
@@ -91,24 +124,64 @@ class AwsBlogsTwitterFeedStack(Stack):
             delivery_delay=Duration.seconds(15),
         )
 
+        # Directories and locales to fetch besides the English blogs, e.g.
+        # cdk deploy -c 'blog_sources=[
+        #   {"name": "blog-posts", "directory_id": "blog-posts", "locale": "en_US"},
+        #   {"name": "blog-posts-de", "directory_id": "blog-posts", "locale": "de_DE"}]'
+        blog_sources = self.node.try_get_context("blog_sources") or None
+        if isinstance(blog_sources, str):
+            blog_sources = json.loads(blog_sources)
+
         blog_fetcher_service.BlogFetcherService(
             self,
             "BlogFetcher",
             table=blogs_table,
-            twitter_post_queue=twitter_post_queue,
+            event_bus=event_bus,
+            common_layer=common_layer,
+            adaptive_schedule=True,
+            sources=blog_sources,
+        )
+
+        # Categories that are posted as a digest thread instead of one tweet
+        # per post, e.g. cdk deploy -c 'digest_categories=["Containers"]'
+        digest_categories = self.node.try_get_context("digest_categories") or []
+        if isinstance(digest_categories, str):
+            digest_categories = json.loads(digest_categories)
+
+        # Post the excerpt thread together with the tweet instead of after
+        # the delay of the TwitterThreadQueue: cdk deploy -c combined_thread=true
+        combined_thread = (
+            str(self.node.try_get_context("combined_thread")).lower() == "true"
         )
 
-        twitter_poster_service.TwitterPosterService(
+        publisher_service.PublisherService(
             self,
-            "TwitterPoster",
+            "Publisher",
             resources={
                 "table": blogs_table,
+                "event_bus": event_bus,
                 "twitter_post_queue": twitter_post_queue,
                 "twitter_thread_queue": twitter_thread_queue,
                 "twitter_secret": twitter_secret,
+                "common_layer": common_layer,
             },
+            digest_categories=digest_categories,
+            combined_thread=combined_thread,
+            mastodon_targets=mastodon_targets,
         )
 
+        if digest_categories:
+            digest_poster_service.DigestPosterService(
+                self,
+                "DigestPoster",
+                resources={
+                    "table": blogs_table,
+                    "twitter_secret": twitter_secret,
+                    "common_layer": common_layer,
+                },
+                categories=digest_categories,
+            )
+
         excerpt_poster_service.ExcerptPosterService(
             self,
             "ExcerptPoster",
@@ -116,5 +189,31 @@ class AwsBlogsTwitterFeedStack(Stack):
                 "table": blogs_table,
                 "twitter_thread_queue": twitter_thread_queue,
                 "twitter_secret": twitter_secret,
+                "common_layer": common_layer,
+            },
+        )
+
+        feed_generator_service.FeedGeneratorService(
+            self,
+            "FeedGenerator",
+            resources={
+                "table": blogs_table,
+                "event_bus": event_bus,
+                "common_layer": common_layer,
             },
+            per_category=True,
+        )
+
+        # Posts of the months that ended more than this many days ago are
+        # moved to the archive, e.g. cdk deploy -c archive_after_days=180
+        archiver_service.ArchiverService(
+            self,
+            "Archiver",
+            resources={
+                "table": blogs_table,
+                "common_layer": common_layer,
+            },
+            archive_after_days=int(
+                self.node.try_get_context("archive_after_days") or 90
+            ),
         )
@@ -1,29 +1,60 @@
 """Blog Fetcher Service module."""
 
+import json
+from typing import List, Optional
+
 from constructs import Construct
 from aws_cdk import (
     Duration,
+    Stack,
     aws_dynamodb as dynamodb,
     aws_events as events,
     aws_events_targets as events_targets,
+    aws_iam as iam,
     aws_lambda as lambda_,
-    aws_sqs as sqs,
 )
 
 
 class BlogFetcherService(Construct):
     """BlogFetcherService class, responsible for fetching blogs at AWS."""
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments,too-many-locals
         self,
         scope: Construct,
         construct_id: str,
         table: dynamodb.Table,
-        twitter_post_queue: sqs.Queue,
+        event_bus: events.IEventBus,
+        common_layer: lambda_.ILayerVersion,
+        adaptive_schedule: bool = False,
+        max_poll_interval: int = 10,
+        sources: Optional[List[dict]] = None,
     ) -> None:
-        """Construct a new BlogFetcherService."""
+        """
+        Construct a new BlogFetcherService.
+
+        With adaptive_schedule the function retunes its own schedule between
+        every minute and every max_poll_interval minutes, based on when blogs
+        were published in the past weeks. sources are the directories and
+        locales to fetch, by default the English AWS blogs. Edits of stored
+        blogs are published as AWSBlogUpdated events on event_bus.
+        """
         super().__init__(scope, construct_id)
 
+        # The rule gets a fixed name, so the function can refer to it without
+        # a circular dependency between the function and its trigger.
+        stack = Stack.of(self)
+        rule_name = f"{stack.stack_name}-BlogFetcherSchedule"
+        environment = dict(
+            BLOGS_TABLE=table.table_name, EVENT_BUS=event_bus.event_bus_name
+        )
+        if sources:
+            environment.update(BLOG_SOURCES=json.dumps(sources))
+        if adaptive_schedule:
+            environment.update(
+                ADAPTIVE_SCHEDULE_RULE=rule_name,
+                MAX_POLL_INTERVAL=str(max_poll_interval),
+            )
+
         lambda_layer = lambda_.LayerVersion(
             self,
             "BlogFetcherLambdaLayer",
@@ -37,11 +68,8 @@ class BlogFetcherService(Construct):
             runtime=lambda_.Runtime.PYTHON_3_9,
             code=lambda_.Code.from_asset("resources/functions/blog_fetcher"),
             handler="main.lambda_handler",
-            environment=dict(
-                BLOGS_TABLE=table.table_name,
-                TWITTER_POST_QUEUE=twitter_post_queue.queue_url,  # deprecated
-            ),
-            layers=[lambda_layer],
+            environment=environment,
+            layers=[lambda_layer, common_layer],
             timeout=Duration.seconds(30),
             memory_size=256,
             tracing=lambda_.Tracing.ACTIVE,
@@ -52,11 +80,24 @@ class BlogFetcherService(Construct):
         events.Rule(
             self,
             "BlogFetcherEvent",
+            rule_name=rule_name if adaptive_schedule else None,
             description="Scan for new blogs every minute",
             enabled=True,
             schedule=lambda_schedule,
             targets=[event_lambda_target],
         )
 
+        if adaptive_schedule:
+            handler.add_to_role_policy(
+                iam.PolicyStatement(
+                    actions=["events:DescribeRule", "events:PutRule"],
+                    resources=[
+                        stack.format_arn(
+                            service="events", resource="rule", resource_name=rule_name
+                        )
+                    ],
+                )
+            )
+
         table.grant_read_write_data(handler)
-        twitter_post_queue.grant_send_messages(handler)
+        event_bus.grant_put_events_to(handler)
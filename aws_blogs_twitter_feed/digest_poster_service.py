@@ -0,0 +1,67 @@
+"""Digest Poster Service module."""
+
+import json
+from typing import List
+
+from constructs import Construct
+from aws_cdk import (
+    Duration,
+    aws_events as events,
+    aws_events_targets as events_targets,
+    aws_lambda as lambda_,
+)
+
+
+class DigestPosterService(Construct):
+    """DigestPosterService class, responsible for posting per-category digest threads."""
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        scope: Construct,
+        construct_id: str,
+        resources: dict,
+        categories: List[str],
+        window: Duration = Duration.hours(1),
+    ) -> None:
+        """
+        Construct a new DigestPosterService.
+
+        Posts in `categories` are collected and posted as one thread per
+        category every `window`.
+        """
+        super().__init__(scope, construct_id)
+
+        lambda_layer = lambda_.LayerVersion(
+            self,
+            "DigestPostLambdaLayer",
+            code=lambda_.Code.from_asset("resources/layers/twitter_poster/python.zip"),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_9],
+        )
+
+        handler = lambda_.Function(
+            self,
+            "DigestPostFunction",
+            runtime=lambda_.Runtime.PYTHON_3_9,
+            code=lambda_.Code.from_asset("resources/functions/digest_poster"),
+            handler="main.lambda_handler",
+            environment=dict(
+                BLOGS_TABLE=resources["table"].table_name,
+                TWITTER_SECRET=resources["twitter_secret"].secret_name,
+                DIGEST_CATEGORIES=json.dumps(categories),
+            ),
+            layers=[lambda_layer, resources["common_layer"]],
+            timeout=Duration.seconds(60),
+            tracing=lambda_.Tracing.ACTIVE,
+        )
+
+        events.Rule(
+            self,
+            "DigestPostEvent",
+            description="Post the category digests",
+            enabled=True,
+            schedule=events.Schedule.rate(window),
+            targets=[events_targets.LambdaFunction(handler=handler)],
+        )
+
+        resources["table"].grant_read_write_data(handler)
+        resources["twitter_secret"].grant_read(handler)
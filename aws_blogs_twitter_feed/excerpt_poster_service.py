@@ -32,7 +32,7 @@ class ExcerptPosterService(Construct):
                 TWITTER_SECRET=resources["twitter_secret"].secret_name,
                 TWITTER_THREAD_QUEUE=resources["twitter_thread_queue"].queue_url,
             ),
-            layers=[lambda_layer],
+            layers=[lambda_layer, resources["common_layer"]],
             tracing=lambda_.Tracing.ACTIVE,
         )
 
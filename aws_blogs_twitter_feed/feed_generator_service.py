@@ -0,0 +1,112 @@
+"""Feed Generator Service module."""
+
+from constructs import Construct
+from aws_cdk import (
+    Duration,
+    aws_cloudfront as cloudfront,
+    aws_cloudfront_origins as origins,
+    aws_events as events,
+    aws_events_targets as events_targets,
+    aws_lambda_event_sources as lambda_event_sources,
+    aws_lambda as lambda_,
+    aws_s3 as s3,
+    aws_sqs as sqs,
+)
+
+
+class FeedGeneratorService(Construct):
+    """FeedGeneratorService class, responsible for the JSON Feed and Atom feeds."""
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        scope: Construct,
+        construct_id: str,
+        resources: dict,
+        feed_size: int = 50,
+        per_category: bool = False,
+    ) -> None:
+        """
+        Construct a new FeedGeneratorService.
+
+        The feeds are written to the feed bucket, with per_category a feed is
+        also kept for every main category. They follow the new and updated
+        blogs on the event bus, the table stream is left to its pipe. The
+        bucket stays private, the feeds are served by a CloudFront
+        distribution that reads it through an origin access identity.
+        """
+        super().__init__(scope, construct_id)
+
+        self.bucket = s3.Bucket(
+            self,
+            "FeedBucket",
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            enforce_ssl=True,
+        )
+        # Readers poll the feeds, an update shows within the default TTL
+        feed_cache_policy = cloudfront.CachePolicy(
+            self,
+            "FeedCachePolicy",
+            default_ttl=Duration.minutes(5),
+            min_ttl=Duration.seconds(0),
+            max_ttl=Duration.hours(1),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True,
+        )
+        self.distribution = cloudfront.Distribution(
+            self,
+            "FeedDistribution",
+            default_behavior=cloudfront.BehaviorOptions(
+                origin=origins.S3Origin(self.bucket),
+                viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                cache_policy=feed_cache_policy,
+            ),
+        )
+
+        handler = lambda_.Function(
+            self,
+            "FeedGeneratorFunction",
+            runtime=lambda_.Runtime.PYTHON_3_9,
+            code=lambda_.Code.from_asset("resources/functions/feed_generator"),
+            handler="main.lambda_handler",
+            environment=dict(
+                BLOGS_TABLE=resources["table"].table_name,
+                FEED_SINK=f"s3://{self.bucket.bucket_name}/feeds",
+                FEED_BASE_URL=f"https://{self.distribution.distribution_domain_name}/feeds/",
+                FEED_SIZE=str(feed_size),
+                FEED_PER_CATEGORY=str(per_category).lower(),
+            ),
+            layers=[resources["common_layer"]],
+            timeout=Duration.seconds(30),
+            memory_size=256,
+            tracing=lambda_.Tracing.ACTIVE,
+        )
+
+        # A single message group lets one batch at a time patch the feeds,
+        # so concurrent invocations do not overwrite each other's changes.
+        feed_update_dlq = sqs.Queue(self, "FeedUpdateDLQ", fifo=True)
+        feed_update_queue = sqs.Queue(
+            self,
+            "FeedUpdateQueue",
+            fifo=True,
+            content_based_deduplication=True,
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=3, queue=feed_update_dlq
+            ),
+        )
+        events.Rule(
+            self,
+            "FeedUpdateRule",
+            event_bus=resources["event_bus"],
+            event_pattern=events.EventPattern(
+                detail_type=["NewAWSBlogFound", "AWSBlogUpdated"]
+            ),
+            targets=[
+                events_targets.SqsQueue(feed_update_queue, message_group_id="feeds")
+            ],
+        )
+        handler.add_event_source(
+            lambda_event_sources.SqsEventSource(queue=feed_update_queue, batch_size=10)
+        )
+
+        resources["table"].grant_read_data(handler)
+        self.bucket.grant_read_write(handler)
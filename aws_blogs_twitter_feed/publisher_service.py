@@ -0,0 +1,122 @@
+"""Publisher Service module."""
+
+import json
+from typing import List, Optional
+
+from constructs import Construct
+from aws_cdk import (
+    Duration,
+    aws_events as events,
+    aws_events_targets as events_targets,
+    aws_lambda_destinations as lambda_destinations,
+    aws_lambda_event_sources as lambda_event_sources,
+    aws_lambda as lambda_,
+    aws_sqs as sqs,
+    aws_ssm as ssm,
+)
+
+
+class PublisherService(Construct):
+    """PublisherService class, responsible for posting new blogs to Twitter and Mastodon."""
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-locals
+        self,
+        scope: Construct,
+        construct_id: str,
+        resources: dict,
+        digest_categories: Optional[List[str]] = None,
+        combined_thread: bool = False,
+        mastodon_targets: Optional[List[dict]] = None,
+    ) -> None:
+        """
+        Construct a new PublisherService.
+
+        Posts in digest_categories are left to the DigestPosterService. With
+        combined_thread the excerpt thread is posted together with the tweet,
+        instead of by the ExcerptPosterService. Without mastodon_targets,
+        every post goes to the awsblogs Mastodon account.
+        """
+        super().__init__(scope, construct_id)
+
+        twitter_layer = lambda_.LayerVersion(
+            self,
+            "TwitterLayer",
+            code=lambda_.Code.from_asset("resources/layers/twitter_poster/python.zip"),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_9],
+        )
+        mastodon_layer = lambda_.LayerVersion(
+            self,
+            "MastodonLayer",
+            code=lambda_.Code.from_asset("resources/layers/mastodon_poster/python.zip"),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_9],
+        )
+
+        environment = dict(
+            BLOGS_TABLE=resources["table"].table_name,
+            TWITTER_SECRET=resources["twitter_secret"].secret_name,
+            TWITTER_THREAD_QUEUE=resources["twitter_thread_queue"].queue_url,
+            DIGEST_CATEGORIES=json.dumps(digest_categories or []),
+            COMBINED_THREAD=str(combined_thread).lower(),
+        )
+        if mastodon_targets:
+            environment["MASTODON_TARGETS"] = json.dumps(mastodon_targets)
+
+        # New blogs arrive as NewAWSBlogFound events, which invoke the function
+        # asynchronously. An event the function failed on is retried twice by
+        # Lambda and then sent to the DLQ by the failure destination. The rule
+        # target sends the events it could not deliver to the same DLQ.
+        event_dlq = sqs.Queue(self, "PublishEventDLQ")
+
+        handler = lambda_.Function(
+            self,
+            "PublisherFunction",
+            runtime=lambda_.Runtime.PYTHON_3_9,
+            code=lambda_.Code.from_asset("resources/functions/publisher"),
+            handler="main.lambda_handler",
+            environment=environment,
+            layers=[twitter_layer, mastodon_layer, resources["common_layer"]],
+            tracing=lambda_.Tracing.ACTIVE,
+            # A tweet with its image and excerpt thread does not fit in the
+            # default 3 seconds; the queue's visibility timeout is 30 seconds
+            timeout=Duration.seconds(30),
+            memory_size=256,
+            on_failure=lambda_destinations.SqsDestination(event_dlq),
+            retry_attempts=2,
+        )
+
+        events.Rule(
+            self,
+            "NewBlogRule",
+            event_bus=resources["event_bus"],
+            event_pattern=events.EventPattern(detail_type=["NewAWSBlogFound"]),
+            targets=[
+                events_targets.LambdaFunction(
+                    handler=handler, dead_letter_queue=event_dlq, retry_attempts=2
+                )
+            ],
+        )
+
+        # SQS Event Source
+        sqs_event_source = lambda_event_sources.SqsEventSource(
+            queue=resources["twitter_post_queue"],
+            batch_size=1,
+        )
+        handler.add_event_source(sqs_event_source)
+
+        resources["table"].grant_read_write_data(handler)
+        resources["twitter_thread_queue"].grant_send_messages(handler)
+        resources["twitter_post_queue"].grant_consume_messages(handler)
+        resources["twitter_secret"].grant_read(handler)
+
+        parameter_names = [
+            target["ssm_parameter"] for target in mastodon_targets or []
+        ] or ["mastodon_awsblogs_access_token"]
+        for index, parameter_name in enumerate(parameter_names):
+            mastodon_access_key_ssm_parameter = (
+                ssm.StringParameter.from_secure_string_parameter_attributes(
+                    scope=self,
+                    id="SecureString" if index == 0 else f"SecureString{index}",
+                    parameter_name=parameter_name,
+                )
+            )
+            mastodon_access_key_ssm_parameter.grant_read(handler)
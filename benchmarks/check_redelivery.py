@@ -0,0 +1,187 @@
+"""
+End-to-end check of failed deliveries of the publisher.
+
+Runs the publisher against the stand-ins in harness.py while Twitter fails,
+then delivers the post again the way a redrive from the DLQ does, with a new
+message ID, and checks that the post is tweeted exactly once:
+
+- fail_then_redrive: the first delivery fails to tweet, the redrive tweets
+- stale_claim: a delivery died holding its claim, the next one takes it over
+- dlq_redrive: a delivery timed out holding its claim and its message went to
+  the TwitterPostDLQ, tools/redrive_dlq.py moves it back right away
+- event_redrive: every attempt of a NewAWSBlogFound event failed and the
+  failure destination sent it to the PublishEventDLQ, the tool moves it back
+
+Requires the packages in requirements.txt, plus moto.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+import harness
+
+
+def fail_then_redrive(
+    server: harness.FakeApiServer, _aws: harness.AwsEnvironment, sort_key: str
+) -> None:
+    """Fail the first delivery of a post on Twitter, then deliver it again with a new message ID."""
+    publisher = harness.load_handler("publisher", "main")
+    server.fail_next("twitter")
+    try:
+        publisher.lambda_handler(
+            {"Records": [{"messageId": "first", "body": sort_key}]}, None
+        )
+    except Exception:  # pylint: disable=broad-except
+        pass
+    else:
+        raise AssertionError("the first delivery did not fail")
+    publisher.lambda_handler(
+        {"Records": [{"messageId": "redrive", "body": sort_key}]}, None
+    )
+
+
+def stale_claim(
+    _server: harness.FakeApiServer, aws: harness.AwsEnvironment, sort_key: str
+) -> None:
+    """Leave the claim of a delivery that died, without an expiry, then deliver the post again."""
+    ddb_item = aws.get_blog_post(sort_key)
+    harness.aws_clients.get_client("dynamodb").update_item(
+        TableName=harness.TABLE_NAME,
+        Key={"PK": ddb_item["PK"], "SK": ddb_item["SK"]},
+        UpdateExpression="SET tweet_claim = :delivery_id",
+        ExpressionAttributeValues={":delivery_id": {"S": "died"}},
+    )
+    publisher = harness.load_handler("publisher", "main")
+    publisher.lambda_handler(
+        {"Records": [{"messageId": "redrive", "body": sort_key}]}, None
+    )
+
+
+def dlq_redrive(
+    _server: harness.FakeApiServer, aws: harness.AwsEnvironment, sort_key: str
+) -> None:
+    """Leave a claim that has not expired yet, then redrive its message from the DLQ."""
+    ddb_item = aws.get_blog_post(sort_key)
+    harness.aws_clients.get_client("dynamodb").update_item(
+        TableName=harness.TABLE_NAME,
+        Key={"PK": ddb_item["PK"], "SK": ddb_item["SK"]},
+        UpdateExpression="SET tweet_claim = :delivery_id, tweet_claim_expires = :expires",
+        ExpressionAttributeValues={
+            ":delivery_id": {"S": "timed-out"},
+            ":expires": {"N": str(int(time.time()) + 300)},
+        },
+    )
+    redrive_and_publish("publish", "TwitterPostDLQ", sort_key)
+
+
+def event_redrive(
+    server: harness.FakeApiServer, aws: harness.AwsEnvironment, sort_key: str
+) -> None:
+    """Fail every attempt of an event, then redrive the failure destination record."""
+    event = harness.build_pipe_event(aws.get_blog_post(sort_key))
+    publisher = harness.load_handler("publisher", "main")
+    server.fail_next("twitter", times=3)
+    # Lambda retries a failed asynchronous invocation twice
+    for _ in range(3):
+        try:
+            publisher.lambda_handler(event, None)
+        except Exception:  # pylint: disable=broad-except
+            pass
+        else:
+            raise AssertionError("an attempt did not fail")
+    record = {
+        "version": "1.0",
+        "requestContext": {
+            "condition": "RetriesExhausted",
+            "approximateInvokeCount": 3,
+        },
+        "requestPayload": event,
+        "responsePayload": {"errorMessage": "Over capacity"},
+    }
+    redrive_and_publish("publish-event", "PublishEventDLQ", json.dumps(record))
+
+
+def redrive_and_publish(kind: str, dlq_name: str, body: str) -> None:
+    """Put a message in a DLQ, redrive it with tools/redrive_dlq.py and deliver what was moved."""
+    sys.path.append(os.path.join(harness.ROOT_DIR, "tools"))
+    import redrive_dlq  # pylint: disable=import-outside-toplevel,import-error
+
+    sqs = harness.aws_clients.get_client("sqs")
+    fifo = {"FifoQueue": "true", "ContentBasedDeduplication": "true"}
+    target_url = sqs.create_queue(QueueName="TwitterPostQueue.fifo", Attributes=fifo)
+    target_url = target_url["QueueUrl"]
+    # The PublishEventDLQ is a standard queue, a failure destination cannot be FIFO
+    if dlq_name == "PublishEventDLQ":
+        dlq_url = sqs.create_queue(QueueName=dlq_name)["QueueUrl"]
+        sqs.send_message(QueueUrl=dlq_url, MessageBody=body)
+    else:
+        dlq_url = sqs.create_queue(QueueName=f"{dlq_name}.fifo", Attributes=fifo)
+        dlq_url = dlq_url["QueueUrl"]
+        sqs.send_message(QueueUrl=dlq_url, MessageBody=body, MessageGroupId=body)
+    redrive_dlq.redrive(
+        argparse.Namespace(
+            kind=kind,
+            table=harness.TABLE_NAME,
+            dlq=dlq_url,
+            target=target_url,
+            rate=None,
+            mastodon_targets=redrive_dlq.DEFAULT_MASTODON_TARGETS,
+            batch_size=10,
+            max_messages=10,
+            dry_run=False,
+        )
+    )
+    messages = sqs.receive_message(QueueUrl=target_url).get("Messages", [])
+    publisher = harness.load_handler("publisher", "main")
+    publisher.lambda_handler(
+        {
+            "Records": [
+                {"messageId": m["MessageId"], "body": m["Body"]} for m in messages
+            ]
+        },
+        None,
+    )
+
+
+CHECKS: Dict[str, Callable] = {
+    "fail_then_redrive": fail_then_redrive,
+    "stale_claim": stale_claim,
+    "dlq_redrive": dlq_redrive,
+    "event_redrive": event_redrive,
+}
+
+
+def run_check(check: Callable) -> list:
+    """Run a check for a new post, return a description of every problem it found."""
+    items = harness.generate_directory_items(1)
+    with harness.FakeApiServer(items) as server, harness.AwsEnvironment(server) as aws:
+        aws.seed_blog_post(items[0])
+        sort_key = harness.sort_key_for(items[0])
+        harness.quiet(check)(server, aws, sort_key)
+        ddb_item = aws.get_blog_post(sort_key)
+        problems = []
+        if "tweet_id" not in ddb_item:
+            problems.append("the post was not tweeted")
+        if "tweet_claim" in ddb_item:
+            problems.append(f"the claim of {ddb_item['tweet_claim']['S']} was kept")
+        if server.counts["twitter"] != 1:
+            problems.append(f"the post was tweeted {server.counts['twitter']} times")
+        return problems
+
+
+def main():
+    """Run every check and exit with an error when one of them failed."""
+    failed = False
+    for name, check in CHECKS.items():
+        problems = run_check(check)
+        print(f"{name:<20}{'; '.join(problems) or 'ok'}")
+        failed = failed or bool(problems)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
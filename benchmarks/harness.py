@@ -0,0 +1,584 @@
+"""
+Offline stand-ins for AWS, the AWS blogs directory API, Twitter and Mastodon.
+
+AWS is emulated in-process with moto. The directory API, Twitter and Mastodon
+are served by a local HTTP server that replays pages built from the recorded
+item in fixtures/directory_item.json, so the handlers run their real HTTP code
+paths without leaving the machine. The server also serves the featured images
+of the posts, which point at it instead of the CDN.
+"""
+import collections
+import contextlib
+import copy
+import hashlib
+import importlib.util
+import json
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNCTIONS_DIR = os.path.join(ROOT_DIR, "resources", "functions")
+COMMON_LAYER_DIR = os.path.join(ROOT_DIR, "resources", "layers", "common", "python")
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+sys.path.insert(0, COMMON_LAYER_DIR)
+
+import aws_clients  # noqa: E402 pylint: disable=wrong-import-position
+import blog_posts  # noqa: E402 pylint: disable=wrong-import-position
+import media  # noqa: E402 pylint: disable=wrong-import-position
+
+REGION = "eu-west-1"
+TABLE_NAME = "BenchmarkBlogsTable"
+EVENT_BUS_NAME = "BenchmarkEventBus"
+PAGE_SIZE = 10
+CATEGORY_IDS = [
+    "compute",
+    "aws",
+    "architecture",
+    "containers",
+    "database",
+    "machine-learning",
+    "security",
+    "publicsector",
+]
+
+
+def load_directory_item_template() -> dict:
+    """Load the recorded directory API item."""
+    with open(
+        os.path.join(FIXTURES_DIR, "directory_item.json"), encoding="utf-8"
+    ) as fixture_file:
+        return json.load(fixture_file)
+
+
+def make_directory_item(template: dict, number: int, created: datetime) -> dict:
+    """Build a unique directory API item from the template, created at `created`."""
+    item = copy.deepcopy(template)
+    category_id = CATEGORY_IDS[number % len(CATEGORY_IDS)]
+    created_str = created.strftime("%Y-%m-%dT%H:%M:%S+0000")
+    fields = item["item"]["additionalFields"]
+    link = f"https://aws.amazon.com/blogs/{category_id}/benchmark-post-{number}/"
+    fields["link"] = link
+    fields["title"] = f"{fields['title']} (part {number})"
+    fields["createdDate"] = created_str
+    item["item"]["dateCreated"] = created_str
+    item["item"]["dateUpdated"] = created_str
+    return item
+
+
+def generate_directory_items(count: int, newest: datetime = None) -> List[dict]:
+    """Build `count` directory API items, newest first, three minutes apart."""
+    template = load_directory_item_template()
+    newest = newest or datetime(2026, 11, 30, 17, 0, tzinfo=timezone.utc)
+    return [
+        make_directory_item(
+            template, count - index, newest - timedelta(minutes=3 * index)
+        )
+        for index in range(count)
+    ]
+
+
+def generate_png(width: int = 120, height: int = 63) -> bytes:
+    """Build a gradient PNG image with the standard library."""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    rows = b"".join(
+        b"\x00" + b"".join(bytes((x * 2 % 256, y * 4 % 256, 128)) for x in range(width))
+        for y in range(height)
+    )
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+def sort_key_for(directory_item: dict) -> str:
+    """Return the DynamoDB sort key the blog fetcher uses for a directory item."""
+    item_url = directory_item["item"]["additionalFields"]["link"]
+    item_unique_id = hashlib.md5(item_url.encode()).hexdigest()
+    return f"{directory_item['item']['dateCreated']}#{item_unique_id}"
+
+
+class FakeApiServer:  # pylint: disable=too-many-instance-attributes
+    """Local HTTP server for the directory API, Twitter and Mastodon."""
+
+    def __init__(self, directory_items: List[dict], latency: float = 0.0):
+        """Serve `directory_items` (newest first), delaying every response by `latency`."""
+        self.directory_items = directory_items
+        self.latency = latency
+        self.counts: Dict[str, int] = collections.Counter()
+        self.requests: List[dict] = []
+        self.failures: Dict[str, int] = collections.Counter()
+        self._next_id = 1000
+        self._lock = threading.Lock()
+        self._image = generate_png()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Return the base URL of the server."""
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def directory_url(self) -> str:
+        """Return the directory API search URL, every directory and locale serves the same items."""
+        return f"{self.url}/api/dirs/items/search"
+
+    def __enter__(self):
+        """Start serving in a background thread."""
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_args):
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def localise_image(self, directory_item: dict) -> dict:
+        """Point the featured image of a directory item at this server, return the item."""
+        fields = directory_item["item"]["additionalFields"]
+        slug = fields["link"].rstrip("/").rsplit("/", 1)[-1]
+        fields["featuredImageUrl"] = f"{self.url}/images/{slug}.png"
+        return directory_item
+
+    def fail_next(self, endpoint: str, times: int = 1) -> None:
+        """Answer the next `times` requests to an endpoint with a 503, like an outage."""
+        with self._lock:
+            self.failures[endpoint] += times
+
+    def total_calls(self) -> int:
+        """Return the number of requests served so far."""
+        return sum(self.counts.values())
+
+    def _record(self, endpoint: str, payload: dict) -> int:
+        """Count a request and return a new unique ID for created resources."""
+        with self._lock:
+            self.counts[endpoint] += 1
+            self._next_id += 1
+            self.requests.append(
+                {"endpoint": endpoint, "time": time.monotonic(), "payload": payload}
+            )
+            return self._next_id
+
+    def _take_failure(self, endpoint: str) -> bool:
+        """Return whether a request to an endpoint fails, counting it as a failed call."""
+        with self._lock:
+            if not self.failures[endpoint]:
+                return False
+            self.failures[endpoint] -= 1
+            self.counts[f"{endpoint}_failed"] += 1
+            return True
+
+    def _respond(  # pylint: disable=too-many-return-statements
+        self, path: str, query: dict, payload: dict
+    ):
+        """Return the status code and body for a request."""
+        if path == "/api/dirs/items/search":
+            page = int(query.get("page", ["0"])[0])
+            self._record("directory", {"page": page})
+            first = page * PAGE_SIZE
+            items = [
+                self.localise_image(item)
+                for item in self.directory_items[first:][:PAGE_SIZE]
+            ]
+            return 200, {
+                "metadata": {
+                    "count": len(items),
+                    "totalHits": len(self.directory_items),
+                },
+                "items": items,
+            }
+        if path.endswith("/statuses/update.json"):
+            if self._take_failure("twitter"):
+                return 503, {"errors": [{"code": 130, "message": "Over capacity"}]}
+            new_id = self._record("twitter", payload)
+            return 200, {
+                "id": new_id,
+                "id_str": str(new_id),
+                "text": payload.get("status"),
+            }
+        if path.startswith("/images/"):
+            self._record("image", {"path": path})
+            return 200, self._image
+        if path.endswith("/media/upload.json"):
+            new_id = self._record("twitter_media", payload)
+            if payload.get("command") in ("INIT", "FINALIZE"):
+                media_id = payload.get("media_id", str(new_id))
+                return 200, {"media_id": int(media_id), "media_id_string": media_id}
+            return 204, None  # APPEND, the chunk is sent as multipart form data
+        if path == "/api/v2/media":
+            new_id = self._record("mastodon_media", payload)
+            return 200, {
+                "id": str(new_id),
+                "type": "image",
+                "url": f"{self.url}/media/{new_id}",
+            }
+        if path.rstrip("/") == "/api/v1/instance":
+            self._record("mastodon_instance", payload)
+            return 200, {"uri": "localhost", "version": "4.1.0"}
+        if path == "/api/v1/statuses":
+            new_id = self._record("mastodon", payload)
+            return 200, {"id": str(new_id), "content": payload.get("status")}
+        return 404, {"errors": [{"code": 34, "message": f"Unknown path {path}"}]}
+
+    def _handler_class(self):
+        """Build the request handler class bound to this server."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Request handler delegating to FakeApiServer._respond."""
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """Handle a GET request."""
+                self._handle({})
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                """Handle a POST request with a form, JSON or multipart body."""
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                content_type = self.headers.get("Content-Type", "")
+                if content_type.startswith("multipart/form-data"):
+                    payload = {
+                        "multipart_bytes": length
+                    }  # binary uploads are only counted
+                elif content_type.startswith("application/json"):
+                    payload = json.loads(raw.decode() or "{}")
+                else:
+                    payload = {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+                self._handle(payload)
+
+            def _handle(self, payload: dict):
+                """Write the response for the request."""
+                if server.latency:
+                    time.sleep(server.latency)
+                parsed = urlparse(self.path)
+                status, body = server._respond(  # pylint: disable=protected-access
+                    parsed.path, {**parse_qs(parsed.query)}, payload
+                )
+                if isinstance(body, bytes):
+                    data, content_type = body, "image/png"
+                else:
+                    data = json.dumps(body).encode() if body is not None else b""
+                    content_type = "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *_args):  # pylint: disable=arguments-differ
+                """Keep the benchmark output clean."""
+
+        return Handler
+
+
+class AwsCallCounter:  # pylint: disable=too-few-public-methods
+    """Count AWS API calls per operation through botocore's before-call event."""
+
+    def __init__(self):
+        """Register the counter on all current and future clients."""
+        self.counts: Dict[str, int] = collections.Counter()
+        aws_clients.register_event_handler("before-call", self._count)
+
+    def _count(self, event_name: str, **_kwargs):
+        """Count a call, the event name is before-call.<service>.<operation>."""
+        _, service, operation = event_name.split(".", 2)
+        self.counts[f"{service}.{operation}"] += 1
+
+    def total(self) -> int:
+        """Return the number of calls counted so far."""
+        return sum(self.counts.values())
+
+
+class AwsEnvironment:
+    """Moto backed AWS account with the resources the stack creates."""
+
+    def __init__(self, api_server: FakeApiServer):
+        """Prepare the environment, resources are created on enter."""
+        from moto import mock_aws  # pylint: disable=import-outside-toplevel
+
+        self.api_server = api_server
+        self._mock = mock_aws()
+        self.queue_urls: Dict[str, str] = {}
+        self._shard_iterators: List[str] = []
+        self._fetcher = None
+        self._media_cache = None
+
+    def __enter__(self):
+        """Start moto, create the resources and point the handlers at them."""
+        os.environ.update(
+            {
+                "AWS_ACCESS_KEY_ID": "testing",
+                "AWS_SECRET_ACCESS_KEY": "testing",
+                "AWS_DEFAULT_REGION": REGION,
+            }
+        )
+        self._mock.start()
+        aws_clients.reset_clients()
+
+        ddb = aws_clients.get_client("dynamodb")
+        ddb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {"AttributeName": "PK", "KeyType": "HASH"},
+                {"AttributeName": "SK", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "PK", "AttributeType": "S"},
+                {"AttributeName": "SK", "AttributeType": "S"},
+                {"AttributeName": "main_category", "AttributeType": "S"},
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "main_category_idx",
+                    "KeySchema": [
+                        {"AttributeName": "main_category", "KeyType": "HASH"}
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+            ],
+            BillingMode="PAY_PER_REQUEST",
+            StreamSpecification={
+                "StreamEnabled": True,
+                "StreamViewType": "NEW_AND_OLD_IMAGES",
+            },
+        )
+
+        sqs = aws_clients.get_client("sqs")
+        for queue_name in ("TwitterThreadQueue",):
+            self.queue_urls[queue_name] = sqs.create_queue(
+                QueueName=f"{queue_name}.fifo", Attributes={"FifoQueue": "true"}
+            )["QueueUrl"]
+
+        event_bus = aws_clients.get_client("events").create_event_bus(
+            Name=EVENT_BUS_NAME
+        )
+
+        secret = aws_clients.get_client("secretsmanager").create_secret(
+            Name="TwitterSecret",
+            SecretString=json.dumps(
+                {
+                    "consumer_key": "key",
+                    "consumer_secret": "secret",
+                    "access_token_key": "token",
+                    "access_token_secret": "token-secret",
+                }
+            ),
+        )
+        aws_clients.get_client("ssm").put_parameter(
+            Name="mastodon_awsblogs_access_token",
+            Value="mastodon-token",
+            Type="SecureString",
+        )
+
+        os.environ.update(
+            {
+                "BLOGS_TABLE": TABLE_NAME,
+                "EVENT_BUS": event_bus["EventBusArn"],
+                "TWITTER_THREAD_QUEUE": self.queue_urls["TwitterThreadQueue"],
+                "TWITTER_SECRET": secret["Name"],
+                "MASTODON_API_BASE_URL": self.api_server.url,
+                # The platforms limit the posting rate, the fake API server does not
+                "TWITTER_POSTS_PER_MINUTE": "1000000",
+                "MASTODON_POSTS_PER_MINUTE": "1000000",
+            }
+        )
+        # Every environment starts with a cold image cache, like a new container
+        self._media_cache = tempfile.TemporaryDirectory()
+        media.CACHE_DIR = self._media_cache.name
+        patch_twitter_api(self.api_server.url)
+        return self
+
+    def __exit__(self, *_args):
+        """Stop moto and drop the clients bound to it."""
+        self._mock.stop()
+        aws_clients.reset_clients()
+        self._media_cache.cleanup()
+
+    def seed_blog_post(self, directory_item: dict) -> None:
+        """Store a directory item as an already processed BlogPost, like the fetcher does."""
+        if self._fetcher is None:
+            self._fetcher = load_handler("blog_fetcher", "main")
+        self.api_server.localise_image(directory_item)
+        blog = self._fetcher.parse_blog_items({"items": [directory_item]})[0]
+        aws_clients.get_client("dynamodb").put_item(
+            TableName=TABLE_NAME, Item=self._fetcher.build_ddb_item(blog)
+        )
+
+    def seed_watermark(self, directory_items: List[dict]) -> None:
+        """Store the fetcher's watermark for already processed directory items, newest first."""
+        if self._fetcher is None:
+            self._fetcher = load_handler("blog_fetcher", "main")
+        blogs = self._fetcher.parse_blog_items({"items": directory_items[:PAGE_SIZE]})
+        content_hashes = {}
+        for blog in blogs:
+            ddb_item = self._fetcher.build_ddb_item(blog)
+            content_hashes[ddb_item["SK"]["S"]] = ddb_item["content_hash"]
+        aws_clients.get_client("dynamodb").put_item(
+            TableName=TABLE_NAME,
+            Item={
+                "PK": {"S": "FetcherWatermark"},
+                "SK": {"S": self._fetcher.DEFAULT_SOURCE["name"]},
+                "blog_url": {"S": blogs[0]["item_url"]},
+                "content_hashes": {"M": content_hashes},
+            },
+        )
+
+    def watch_stream(self) -> None:
+        """Start reading the table's stream from now on, call after seeding."""
+        table = aws_clients.get_client("dynamodb").describe_table(TableName=TABLE_NAME)[
+            "Table"
+        ]
+        streams = aws_clients.get_client("dynamodbstreams")
+        stream_arn = table["LatestStreamArn"]
+        self._shard_iterators = [
+            streams.get_shard_iterator(
+                StreamArn=stream_arn,
+                ShardId=shard["ShardId"],
+                ShardIteratorType="LATEST",
+            )["ShardIterator"]
+            for shard in streams.describe_stream(StreamArn=stream_arn)[
+                "StreamDescription"
+            ]["Shards"]
+        ]
+
+    def new_blog_events(self) -> List[dict]:
+        """Return the NewAWSBlogFound events of the stream records since the last call."""
+        streams = aws_clients.get_client("dynamodbstreams")
+        events = []
+        for index, shard_iterator in enumerate(self._shard_iterators):
+            response = streams.get_records(ShardIterator=shard_iterator)
+            self._shard_iterators[index] = response["NextShardIterator"]
+            for record in response["Records"]:
+                image = record["dynamodb"].get("NewImage", {})
+                if (
+                    record["eventName"] == "INSERT"
+                    and blog_posts.is_blog_post(record["dynamodb"]["Keys"]["PK"]["S"])
+                    and "backfilled" not in image
+                ):
+                    events.append(build_pipe_event(image, record["eventID"]))
+        return events
+
+    def drain_queue(self, queue_name: str) -> List[str]:
+        """Receive and delete every message on a queue, return the bodies in order."""
+        sqs = aws_clients.get_client("sqs")
+        bodies = []
+        while True:
+            messages = sqs.receive_message(
+                QueueUrl=self.queue_urls[queue_name], MaxNumberOfMessages=10
+            ).get("Messages", [])
+            if not messages:
+                return bodies
+            for message in messages:
+                bodies.append(message["Body"])
+                sqs.delete_message(
+                    QueueUrl=self.queue_urls[queue_name],
+                    ReceiptHandle=message["ReceiptHandle"],
+                )
+
+    def get_blog_post(self, sort_key: str) -> dict:
+        """Return the BlogPost item for a sort key."""
+        return blog_posts.get_item(TABLE_NAME, sort_key)
+
+
+def patch_twitter_api(base_url: str) -> None:
+    """Send all TwitterAPI requests to the fake server instead of api.twitter.com."""
+    from TwitterAPI import TwitterAPI  # pylint: disable=import-outside-toplevel
+
+    def prepare_url(self, _subdomain, path):
+        return f"{base_url}/{self.version}/{path}.json"
+
+    TwitterAPI._prepare_url = prepare_url  # pylint: disable=protected-access
+
+
+def build_pipe_event(ddb_item: dict, event_id: str = None) -> dict:
+    """Build the NewAWSBlogFound event the DdbStreamListener pipe emits for an item."""
+    return {
+        "version": "0",
+        "detail-type": "NewAWSBlogFound",
+        "source": "Pipe DdbStreamListener",
+        "region": REGION,
+        "resources": [],
+        "detail": {
+            "metadata": {
+                "event_id": event_id or ddb_item["SK"]["S"],
+                "event_version": 1,
+            },
+            "data": {
+                "sort_key": ddb_item["SK"]["S"],
+                "blog_url": ddb_item["blog_url"]["S"],
+                "date_created": ddb_item["date_created"]["S"],
+                "date_updated": ddb_item["date_updated"]["S"],
+                "title": ddb_item["title"]["S"],
+                "post_excerpt": ddb_item["post_excerpt"].get("S", ""),
+                "main_category": ddb_item["main_category"]["S"],
+                "featured_image_url": ddb_item.get("featured_image_url", {}).get(
+                    "S", ""
+                ),
+                "categories": ddb_item["categories"]["SS"],
+                "authors": ddb_item["authors"]["SS"],
+            },
+        },
+    }
+
+
+def load_handler(function_name: str, module_name: str):
+    """Import a handler module under a unique name, like a new container would."""
+    directory = os.path.join(FUNCTIONS_DIR, function_name)
+    if directory not in sys.path:
+        sys.path.append(directory)  # for the function's own helper modules
+    # Helper modules with per-container state, like clients, are imported again
+    for name, loaded in list(sys.modules.items()):
+        if os.path.dirname(getattr(loaded, "__file__", None) or "") == directory:
+            del sys.modules[name]
+    path = os.path.join(directory, f"{module_name}.py")
+    spec = importlib.util.spec_from_file_location(
+        f"{function_name}_{module_name}", path
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@contextlib.contextmanager
+def function_dir(function_name: str):
+    """Run code from inside a function directory, like the Lambda runtime does."""
+    previous = os.getcwd()
+    os.chdir(os.path.join(FUNCTIONS_DIR, function_name))
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def quiet(func: Callable) -> Callable:
+    """Run `func` with stdout discarded, the handlers log generously."""
+
+    def wrapper(*args, **kwargs):
+        with open(
+            os.devnull, "w", encoding="utf-8"
+        ) as devnull, contextlib.redirect_stdout(devnull):
+            return func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,213 @@
+"""
+Offline benchmark of every Lambda handler.
+
+Runs the blog fetcher, publisher and excerpt poster against the stand-ins
+in harness.py for a set of scenarios, reports wall time, CPU time, peak
+memory and the number of AWS and external API calls per handler, and
+compares the results against the stored baseline.
+
+Requires the packages in requirements.txt, plus moto.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+import harness
+
+BASELINE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baseline.json"
+)
+OLDER_POSTS = 20  # Posts in the directory API that precede the watermark
+SCENARIOS = {
+    "quiet_minute": 0,
+    "burst_10": 10,
+    "catch_up_60": 60,
+}
+METRICS = ("wall_ms", "cpu_ms", "peak_kib", "aws_calls", "api_calls")
+COUNT_METRICS = ("aws_calls", "api_calls")
+
+
+def measure(func: Callable, aws_counter: harness.AwsCallCounter, server) -> dict:
+    """Run `func` once and collect its resource usage and outbound calls."""
+    aws_before = dict(aws_counter.counts)
+    api_before = server.total_calls()
+    tracemalloc.start()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    harness.quiet(func)()
+    cpu_ms = (time.process_time() - cpu_start) * 1000
+    wall_ms = (time.perf_counter() - wall_start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    operations = {
+        operation: count - aws_before.get(operation, 0)
+        for operation, count in aws_counter.counts.items()
+        if count - aws_before.get(operation, 0)
+    }
+    return {
+        "wall_ms": round(wall_ms, 1),
+        "cpu_ms": round(cpu_ms, 1),
+        "peak_kib": round(peak / 1024, 1),
+        "aws_calls": sum(operations.values()),
+        "api_calls": server.total_calls() - api_before,
+        "aws_operations": operations,
+    }
+
+
+def run_scenario(new_posts: int) -> Dict[str, dict]:
+    """Run every handler for a scenario with `new_posts` unseen posts."""
+    items = harness.generate_directory_items(new_posts + OLDER_POSTS)
+    results = {}
+    with harness.FakeApiServer(items) as server, harness.AwsEnvironment(server) as aws:
+        for item in items[new_posts:]:
+            aws.seed_blog_post(item)
+        aws.seed_watermark(items[new_posts:])
+        aws.watch_stream()
+        aws_counter = harness.AwsCallCounter()
+        for service in ("dynamodb", "sqs", "secretsmanager", "ssm"):
+            harness.aws_clients.get_client(service)  # measure warm containers
+
+        fetcher = harness.load_handler("blog_fetcher", "main")
+        fetcher.DIRECTORY_API_URL = server.directory_url
+        with harness.function_dir("blog_fetcher"):
+            results["blog_fetcher"] = measure(
+                lambda: fetcher.lambda_handler({}, None), aws_counter, server
+            )
+
+        events = aws.new_blog_events()
+        if not events:
+            return results
+
+        publisher = harness.load_handler("publisher", "main")
+        results["publisher"] = measure(
+            lambda: [publisher.lambda_handler(event, None) for event in events],
+            aws_counter,
+            server,
+        )
+
+        thread_keys = aws.drain_queue("TwitterThreadQueue")
+        excerpt_poster = harness.load_handler("excerpt_poster", "main")
+        results["excerpt_poster"] = measure(
+            lambda: [
+                excerpt_poster.lambda_handler({"Records": [{"body": key}]}, None)
+                for key in thread_keys
+            ],
+            aws_counter,
+            server,
+        )
+
+    return results
+
+
+def best_of(runs: list) -> Dict[str, dict]:
+    """Combine repeated runs, keeping the fastest result per handler."""
+    combined = {}
+    for handler in runs[0]:
+        combined[handler] = min(
+            (run[handler] for run in runs), key=lambda x: x["wall_ms"]
+        )
+    return combined
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return a description of every metric that regressed against the baseline."""
+    regressions = []
+    for scenario, handlers in results.items():
+        for handler, metrics in handlers.items():
+            expected = baseline.get(scenario, {}).get(handler)
+            if not expected:
+                continue
+            for metric in METRICS:
+                allowed = expected[metric]
+                if metric not in COUNT_METRICS:
+                    allowed *= 1 + tolerance
+                if metrics[metric] > allowed:
+                    regressions.append(
+                        f"{scenario}/{handler} {metric}: {metrics[metric]} > {expected[metric]}"
+                    )
+    return regressions
+
+
+def print_results(results: dict, baseline: dict, verbose: bool) -> None:
+    """Print the results as a table, with the baseline value in brackets."""
+    header = f"{'scenario':<14}{'handler':<17}" + "".join(f"{m:>20}" for m in METRICS)
+    print(header)
+    print("-" * len(header))
+    for scenario, handlers in results.items():
+        for handler, metrics in handlers.items():
+            expected = baseline.get(scenario, {}).get(handler, {})
+            cells = [
+                f"{metrics[m]} ({expected[m]})" if m in expected else f"{metrics[m]}"
+                for m in METRICS
+            ]
+            print(f"{scenario:<14}{handler:<17}" + "".join(f"{c:>20}" for c in cells))
+            if verbose:
+                for operation, count in sorted(metrics["aws_operations"].items()):
+                    print(f"{'':<31}{count:>4} x {operation}")
+
+
+def main():
+    """Run the benchmarks and compare them with the baseline."""
+    parser = argparse.ArgumentParser(description="Offline benchmark of every handler")
+    parser.add_argument(
+        "-s", "--scenario", action="append", choices=SCENARIOS, help="Scenario to run"
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=3, help="Runs per scenario, best is kept"
+    )
+    parser.add_argument(
+        "-t",
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="Allowed relative regression of time and memory against the baseline",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Show AWS calls per operation"
+    )
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="Store the results as baseline"
+    )
+    arguments = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = {}
+    for scenario in arguments.scenario or SCENARIOS:
+        runs = [run_scenario(SCENARIOS[scenario]) for _ in range(arguments.repeat)]
+        results[scenario] = best_of(runs)
+
+    print_results(results, baseline, arguments.verbose)
+
+    if arguments.update_baseline:
+        stored = {
+            scenario: {
+                handler: {m: metrics[m] for m in METRICS}
+                for handler, metrics in handlers.items()
+            }
+            for scenario, handlers in results.items()
+        }
+        with open(BASELINE_FILE, "w", encoding="utf-8") as baseline_file:
+            json.dump({**baseline, **stored}, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        print(f"Stored baseline in {BASELINE_FILE}")
+        return
+
+    regressions = compare(results, baseline, arguments.tolerance)
+    if regressions:
+        print("Regressions against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""
+End-to-end burst simulator for the fetch-to-post pipeline.
+
+Replays a synthetic publishing burst through the real handlers, connected by
+in-process stand-ins for the pieces AWS runs between them: the one minute
+fetch schedule, the DynamoDB stream pipe, the asynchronous EventBridge
+invocations of the publisher and the TwitterThreadQueue (FIFO, with its 15
+second delivery delay).
+
+Time is virtual. Every handler invocation runs for real against the
+stand-ins in harness.py, and its duration is modelled from the calls it made,
+so an hour-long burst runs in minutes. The report shows latency percentiles
+from publication to tweet, thread and toot, and the queue depths over time.
+With --combined-thread the publisher posts the excerpt thread itself.
+"""
+import argparse
+import heapq
+import itertools
+import random
+import statistics
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+import harness
+
+BURST_START = datetime(2026, 11, 30, 16, 0, tzinfo=timezone.utc)
+OLDER_POSTS = 20
+FETCH_INTERVAL = 60.0
+THREAD_QUEUE_DELAY = 15.0
+FIFO_DEDUPLICATION_WINDOW = 300.0
+
+
+class VirtualQueue:
+    """
+    FIFO queue in virtual time, messages become visible after a delay.
+
+    Like SQS FIFO queues, a message body sent again within the deduplication
+    window is accepted but not delivered twice.
+    """
+
+    def __init__(
+        self, name: str, delay: float = 0.0, deduplication_window: float = 0.0
+    ):
+        """Create an empty queue with a delivery delay in seconds."""
+        self.name = name
+        self.delay = delay
+        self.deduplication_window = deduplication_window
+        self.messages: List[tuple] = []  # (sent_at, available_at, body)
+        self.duplicates = 0
+        self._last_sent: Dict[str, float] = {}
+
+    def send(self, body, sent_at: float) -> Optional[float]:
+        """Add a message sent at `sent_at` and return the time it becomes visible."""
+        previous = self._last_sent.get(body)
+        if previous is not None and sent_at - previous < self.deduplication_window:
+            self.duplicates += 1
+            return None
+        self._last_sent[body] = sent_at
+        available_at = sent_at + self.delay
+        self.messages.append((sent_at, available_at, body))
+        return available_at
+
+    def receive(self, now: float):
+        """Remove and return the oldest visible message, or None."""
+        for index, (_, available_at, body) in enumerate(self.messages):
+            if available_at <= now:
+                del self.messages[index]
+                return body
+        return None
+
+    def depth(self, now: float) -> Dict[str, int]:
+        """Return the number of visible and delayed messages sent so far."""
+        sent = [
+            available_at for sent_at, available_at, _ in self.messages if sent_at <= now
+        ]
+        visible = sum(1 for available_at in sent if available_at <= now)
+        return {"visible": visible, "delayed": len(sent) - visible}
+
+
+class Consumer:
+    """Lambda function consuming a VirtualQueue with limited concurrency."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(
+        self, name: str, queue: VirtualQueue, concurrency: int, invoke: Callable
+    ):
+        """Invoke `invoke(body)` for messages on `queue`, at most `concurrency` at once."""
+        self.name = name
+        self.queue = queue
+        self.concurrency = concurrency
+        self.invoke = invoke
+        self.running = 0
+        self.errors = 0
+
+
+class BurstSimulation:
+    """Discrete event simulation of the pipeline driven by the real handlers."""
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, arguments, server, aws):
+        """Wire the handlers and stand-ins together."""
+        self.arguments = arguments
+        self.server = server
+        self.aws = aws
+        self.aws_counter = harness.AwsCallCounter()
+        self.now = 0.0
+        self._events: List[tuple] = []
+        self._sequence = itertools.count()
+        self.published: Dict[str, float] = {}
+        self.completed: Dict[str, Dict[str, float]] = {}
+        self.pipe_events: Dict[str, dict] = {}
+        self.queue_depths: List[dict] = []
+        self._peak_depths: Dict[str, int] = {}
+        self.pipe_free_at = 0.0
+
+        self.fetcher = harness.load_handler("blog_fetcher", "main")
+        self.fetcher.DIRECTORY_API_URL = server.directory_url
+        self.publisher = harness.load_handler("publisher", "main")
+        self.publisher.twitter_adapter.combined_thread = arguments.combined_thread
+        self.excerpt_poster = harness.load_handler("excerpt_poster", "main")
+
+        concurrency = arguments.concurrency
+        self.consumers = [
+            Consumer(
+                "publisher",
+                VirtualQueue("PublisherAsyncQueue"),
+                concurrency,
+                self._publish,
+            ),
+            Consumer(
+                "excerpt_poster",
+                VirtualQueue(
+                    "TwitterThreadQueue", THREAD_QUEUE_DELAY, FIFO_DEDUPLICATION_WINDOW
+                ),
+                concurrency,
+                self._post_thread,
+            ),
+        ]
+        self.consumer_by_name = {consumer.name: consumer for consumer in self.consumers}
+
+    def schedule(self, when: float, action: Callable, *args) -> None:
+        """Schedule `action(*args)` at virtual time `when`."""
+        heapq.heappush(self._events, (when, next(self._sequence), action, args))
+
+    def run(self, publications: List[tuple], end: float) -> None:
+        """Run until every post went through the pipeline or `end` is reached."""
+        for published_at, item in publications:
+            self.published[harness.sort_key_for(item)] = published_at
+        tick = 0.0
+        while tick <= end:
+            self.schedule(tick, self._fetch, publications)
+            tick += FETCH_INTERVAL
+        sample = 0.0
+        while sample <= end:
+            self.schedule(sample, self._sample_queues)
+            sample += self.arguments.sample_interval
+
+        while self._events:
+            when, _, action, args = heapq.heappop(self._events)
+            if when > end:
+                break
+            self.now = when
+            action(*args)
+            self._dispatch()
+            self._track_peak_depths()
+
+    def _timed(self, func: Callable) -> tuple:
+        """Run a handler, return its modelled duration in seconds and any exception."""
+        aws_before = self.aws_counter.total()
+        api_before = self.server.total_calls()
+        error = None
+        try:
+            harness.quiet(func)()
+        except Exception as exc:  # pylint: disable=broad-except
+            error = exc
+        aws_calls = self.aws_counter.total() - aws_before
+        api_calls = self.server.total_calls() - api_before
+        return (
+            self.arguments.base_ms
+            + aws_calls * self.arguments.aws_call_ms
+            + api_calls * self.arguments.api_call_ms
+        ) / 1000, error
+
+    def _fetch(self, publications: List[tuple]) -> None:
+        """Run the blog fetcher on the posts published so far."""
+        visible = [
+            item for published_at, item in publications if published_at <= self.now
+        ]
+        self.server.directory_items = list(reversed(visible))
+        with harness.function_dir("blog_fetcher"):
+            duration, _ = self._timed(lambda: self.fetcher.lambda_handler({}, None))
+
+        done = self.now + duration
+        for event in self.aws.new_blog_events():
+            sort_key = event["detail"]["data"]["sort_key"]
+            self.pipe_events[sort_key] = event
+            self.completed[sort_key] = {"stored": done}
+            # The pipe reads the stream one record at a time (batch size 1)
+            self.pipe_free_at = (
+                max(self.pipe_free_at, done) + self.arguments.pipe_ms / 1000
+            )
+            self._enqueue("publisher", sort_key, self.pipe_free_at)
+
+    def _enqueue(self, consumer_name: str, body, when: float) -> None:
+        """Send a message to a consumer's queue at virtual time `when`."""
+        queue = self.consumer_by_name[consumer_name].queue
+        available_at = queue.send(body, when)
+        if available_at is not None:
+            self.schedule(available_at, lambda: None)  # wake up the dispatcher
+
+    def _dispatch(self) -> None:
+        """Start invocations for visible messages while concurrency allows."""
+        for consumer in self.consumers:
+            while consumer.running < consumer.concurrency:
+                body = consumer.queue.receive(self.now)
+                if body is None:
+                    break
+                consumer.running += 1
+                duration, error, on_done = consumer.invoke(body)
+                self.schedule(
+                    self.now + duration, self._finish, consumer, error, on_done
+                )
+
+    def _finish(
+        self, consumer: Consumer, error: Optional[Exception], on_done: Callable
+    ) -> None:
+        """Complete an invocation, freeing its concurrency slot."""
+        consumer.running -= 1
+        if error:
+            consumer.errors += 1
+        else:
+            on_done()
+
+    def _publish(self, sort_key: str):
+        """Invoke the publisher for the event the pipe emitted."""
+        event = self.pipe_events[sort_key]
+        duration, error = self._timed(
+            lambda: self.publisher.lambda_handler(event, None)
+        )
+        thread_keys = self.aws.drain_queue("TwitterThreadQueue")
+
+        def on_done():
+            self.completed[sort_key]["tweeted"] = self.now
+            self.completed[sort_key]["tooted"] = self.now
+            if self.arguments.combined_thread:
+                self.completed[sort_key]["threaded"] = self.now
+            for thread_key in thread_keys:
+                self._enqueue("excerpt_poster", thread_key, self.now)
+
+        return duration, error, on_done
+
+    def _post_thread(self, sort_key: str):
+        """Invoke the excerpt poster for one SQS message."""
+        duration, error = self._timed(
+            lambda: self.excerpt_poster.lambda_handler(
+                {"Records": [{"body": sort_key}]}, None
+            )
+        )
+        return (
+            duration,
+            error,
+            lambda: self.completed[sort_key].update(threaded=self.now),
+        )
+
+    def _track_peak_depths(self) -> None:
+        """Track the deepest each queue got since the last sample."""
+        for consumer in self.consumers:
+            depth = consumer.queue.depth(self.now)
+            total = depth["visible"] + depth["delayed"]
+            name = consumer.queue.name
+            self._peak_depths[name] = max(self._peak_depths.get(name, 0), total)
+
+    def _sample_queues(self) -> None:
+        """Record the current and peak depth of every queue, and running invocations."""
+        sample = {"time": self.now}
+        for consumer in self.consumers:
+            depth = consumer.queue.depth(self.now)
+            name = consumer.queue.name
+            sample[
+                f"{name} now/peak"
+            ] = f"{depth['visible'] + depth['delayed']}/{self._peak_depths.get(name, 0)}"
+            sample[f"{consumer.name} running"] = consumer.running
+        self._peak_depths = {}
+        self.queue_depths.append(sample)
+
+
+def build_publications(posts: int, window: float, seed: int) -> List[tuple]:
+    """
+    Spread `posts` publications over `window` seconds, oldest first.
+
+    Publications cluster around the start of each hour and at a few random
+    moments, the way launch posts land together during re:Invent.
+    """
+    rng = random.Random(seed)
+    peaks = [0.0] + [rng.uniform(0, window) for _ in range(3)]
+    times = []
+    for _ in range(posts):
+        if rng.random() < 0.6:
+            times.append(
+                min(window, max(0.0, rng.choice(peaks) + rng.expovariate(1 / 90)))
+            )
+        else:
+            times.append(rng.uniform(0, window))
+    times.sort()
+
+    template = harness.load_directory_item_template()
+    return [
+        (
+            offset,
+            harness.make_directory_item(
+                template,
+                OLDER_POSTS + number + 1,
+                BURST_START + timedelta(seconds=offset),
+            ),
+        )
+        for number, offset in enumerate(times)
+    ]
+
+
+def percentiles(values: List[float]) -> str:
+    """Format p50, p90, p99 and max of a list of latencies in seconds."""
+    if not values:
+        return "n/a"
+    if len(values) == 1:
+        values = values * 2
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return (
+        f"p50 {cuts[49]:7.1f}s  p90 {cuts[89]:7.1f}s  "
+        f"p99 {cuts[98]:7.1f}s  max {max(values):7.1f}s"
+    )
+
+
+def print_report(simulation: BurstSimulation, posts: int) -> None:
+    """Print latency percentiles per stage and the queue depths over time."""
+    print(f"Posts published: {posts}")
+    for stage in ("stored", "tweeted", "threaded", "tooted"):
+        latencies = [
+            stages[stage] - simulation.published[sort_key]
+            for sort_key, stages in simulation.completed.items()
+            if stage in stages
+        ]
+        print(f"  {stage:<9} {len(latencies):>5} posts  {percentiles(latencies)}")
+    for consumer in simulation.consumers:
+        print(
+            f"  {consumer.name}: {consumer.errors} failed invocations, "
+            f"{consumer.queue.duplicates} deduplicated messages"
+        )
+
+    print()
+    columns = [key for key in simulation.queue_depths[0] if key != "time"]
+    print(f"{'minute':>7}" + "".join(f"{column:>30}" for column in columns))
+    for sample in simulation.queue_depths:
+        print(
+            f"{sample['time'] / 60:>7.0f}"
+            + "".join(f"{sample[column]:>30}" for column in columns)
+        )
+
+
+def main():
+    """Run the burst simulation."""
+    parser = argparse.ArgumentParser(description="End-to-end burst simulator")
+    parser.add_argument(
+        "-p", "--posts", type=int, default=300, help="Posts in the burst"
+    )
+    parser.add_argument(
+        "-w", "--window", type=float, default=3600, help="Burst duration in seconds"
+    )
+    parser.add_argument(
+        "-d",
+        "--drain",
+        type=float,
+        default=1800,
+        help="Seconds to simulate after the burst",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=10,
+        help="Concurrency per poster function",
+    )
+    parser.add_argument(
+        "--base-ms", type=float, default=20, help="Overhead per invocation"
+    )
+    parser.add_argument(
+        "--aws-call-ms", type=float, default=8, help="Latency per AWS call"
+    )
+    parser.add_argument(
+        "--api-call-ms", type=float, default=250, help="Latency per external API call"
+    )
+    parser.add_argument(
+        "--pipe-ms", type=float, default=500, help="Pipe latency per stream record"
+    )
+    parser.add_argument(
+        "--sample-interval", type=float, default=300, help="Queue depth sample interval"
+    )
+    parser.add_argument("--seed", type=int, default=2026, help="Random seed")
+    parser.add_argument(
+        "--combined-thread",
+        action="store_true",
+        help="Post the excerpt thread in the Twitter poster invocation",
+    )
+    arguments = parser.parse_args()
+
+    publications = build_publications(arguments.posts, arguments.window, arguments.seed)
+    older = harness.generate_directory_items(
+        OLDER_POSTS, BURST_START - timedelta(hours=1)
+    )
+    # Older posts are already processed, they are published before the burst
+    publications = [
+        (-3600.0 + index, item) for index, item in enumerate(reversed(older))
+    ] + publications
+
+    with harness.FakeApiServer([]) as server, harness.AwsEnvironment(server) as aws:
+        for item in older:
+            aws.seed_blog_post(item)
+        aws.seed_watermark(older)
+        aws.watch_stream()
+        simulation = BurstSimulation(arguments, server, aws)
+        simulation.run(publications, arguments.window + arguments.drain)
+
+    print_report(simulation, arguments.posts)
+
+
+if __name__ == "__main__":
+    main()
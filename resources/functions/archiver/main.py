@@ -0,0 +1,143 @@
+"""
+Archiver Lambda module.
+
+Runs once a day and rolls the BlogPosts of every month that ended more than
+ARCHIVE_AFTER_DAYS ago into archive segments, oldest month first, see the
+archive module. The archived BlogPost items get an expires_at of now, so the
+TTL of the table deletes them. The feeds keep them, the feed generator only
+follows new and updated posts. Posts that wait for a digest stay in the
+table.
+
+A month that was archived before is packed again together with the posts
+found in it since, so a run that stopped halfway is completed by the next
+one. Months that do not fit in the invocation are left to the next run.
+"""
+import cold_start  # pylint: disable=wrong-import-order
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import archive
+import blog_posts
+import instrumentation
+import log
+from aws_clients import get_client
+from budget import ExecutionBudget
+
+MONTH_ESTIMATE_MS = 10000
+EXPIRE_CONCURRENCY = 8
+BATCH_WRITE_SIZE = 25
+MAX_RETRIES = 8
+
+table_name = os.environ.get("BLOGS_TABLE")
+archive_after_days = int(os.environ.get("ARCHIVE_AFTER_DAYS", "90"))
+
+
+@cold_start.profiled
+@instrumentation.instrumented
+@log.logged()
+def lambda_handler(_event, context):
+    """Run the Lambda function."""
+    stage = ExecutionBudget(context).stage("archive", 1.0, MONTH_ESTIMATE_MS)
+    # Sort keys of the months before the cutoff sort before the month itself
+    until = (datetime.now(timezone.utc) - timedelta(days=archive_after_days)).strftime(
+        "%Y-%m"
+    )
+    since = None
+    archived = 0
+    while True:
+        oldest = blog_posts.oldest(table_name, since, until, ProjectionExpression="SK")
+        if oldest is None:
+            break
+        month = oldest["SK"]["S"][:7]
+        if not stage.has_time_for_unit():
+            log.info("Archiving %s and later is left to the next run", month)
+            break
+        with stage.unit():
+            archived += archive_month(month)
+        since = next_month(month)
+    log.info("Archived %d posts from before %s", archived, until)
+
+
+def next_month(month: str) -> str:
+    """Return the month after a month like 2026-11."""
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+
+
+def archive_month(month: str) -> int:
+    """Roll the posts of a month into segments and expire them, return how many were archived."""
+    # Posts with an expires_at were archived already and wait for the TTL
+    posts = [
+        item
+        for item in blog_posts.query(
+            table_name, month, f"{month}~", ConsistentRead=True
+        )
+        if "digest_pending" not in item and "expires_at" not in item
+    ]
+    if not posts:
+        return 0
+
+    old_segments = list(
+        archive.segments(table_name, month, f"{month}~", with_posts=True)
+    )
+    archived = {
+        item["SK"]["S"]: item
+        for segment in old_segments
+        for item in archive.decode(segment["posts"]["B"])
+        if item["SK"]["S"].startswith(month)
+    }
+    archived.update((item["SK"]["S"], item) for item in posts)
+    segments = archive.pack([archived[sort_key] for sort_key in sorted(archived)])
+
+    # The new segments are written before the old ones are removed and the
+    # posts expire, so every post is in the table or the archive at any time
+    new_keys = {segment["SK"]["S"] for segment in segments}
+    batch_write(
+        [{"PutRequest": {"Item": segment}} for segment in segments]
+        + [
+            {"DeleteRequest": {"Key": {"PK": segment["PK"], "SK": segment["SK"]}}}
+            for segment in old_segments
+            if segment["SK"]["S"] not in new_keys
+        ]
+    )
+    expires_at = str(int(time.time()))
+    with ThreadPoolExecutor(max_workers=EXPIRE_CONCURRENCY) as pool:
+        list(pool.map(lambda item: expire_post(item, expires_at), posts))
+    log.info("Archived %d posts of %s in %d segments", len(posts), month, len(segments))
+    return len(posts)
+
+
+def batch_write(requests: List[dict]) -> None:
+    """Write and delete items in batches, retrying unprocessed items with backoff."""
+    for index in range(0, len(requests), BATCH_WRITE_SIZE):
+        request = {table_name: requests[index:][:BATCH_WRITE_SIZE]}
+        for attempt in range(MAX_RETRIES):
+            response = get_client("dynamodb").batch_write_item(RequestItems=request)
+            request = response.get("UnprocessedItems")
+            if not request:
+                break
+            time.sleep(0.05 * 2**attempt)
+        else:
+            raise RuntimeError("Could not write all segments, giving up")
+
+
+def expire_post(ddb_item: dict, expires_at: str) -> None:
+    """Let the TTL of the table delete an archived post."""
+    # pylint: disable-next=import-outside-toplevel
+    from botocore.exceptions import ClientError
+
+    try:
+        get_client("dynamodb").update_item(
+            TableName=table_name,
+            Key={"PK": ddb_item["PK"], "SK": ddb_item["SK"]},
+            UpdateExpression="SET expires_at = :expires_at",
+            ConditionExpression="attribute_exists(PK)",
+            ExpressionAttributeValues={":expires_at": {"N": expires_at}},
+        )
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
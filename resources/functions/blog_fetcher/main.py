@@ -1,70 +1,331 @@
-"""Blog fetcher Lambda module."""
+"""
+Blog fetcher Lambda module.
+
+The fetcher reads one or more sources, directories and locales of the AWS
+directory API, configured in BLOG_SOURCES. The sources are fetched
+concurrently over one HTTP session, each back to its own watermark: the
+latest blog of the source that was processed, kept in a FetcherWatermark
+item. The new blogs of all sources are stored together; the DynamoDB
+stream announces them as NewAWSBlogFound events to the posters. Edits of
+stored blogs are announced by the fetcher itself, as AWSBlogUpdated events
+on EVENT_BUS.
+"""
+import cold_start  # pylint: disable=wrong-import-order
+
+import contextlib
 import hashlib
 import html
 import json
 import os
-from typing import List
-from botocore.exceptions import ClientError
-from boto3.dynamodb.conditions import Key
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
-import boto3
-import requests
-import yaml
+import blog_posts
+import instrumentation
+import latency
+import log
+import scheduler
+from aws_clients import get_client
+from budget import BudgetExhausted, ExecutionBudget, StageBudget
 
 MAX_BLOG_PAGES = 6
-HTTP_BLOG_URL = (
-    "https://aws.amazon.com/api/dirs/items/search"
-    "?item.directoryId=blog-posts&sort_by=item.additionalFields.createdDate"
-    "&sort_order=desc&size=10&item.locale=en_US"
-)
+PAGE_SIZE = 10
+MAX_PAGE_TIMEOUT = 10  # seconds
+FETCH_SHARE = 0.5  # of the invocation's remaining time
+PAGE_ESTIMATE_MS = 1500
+BLOG_ESTIMATE_MS = 200
+# Errors of DynamoDB that a later run can get past, any other error of a blog
+# is raised again on every run
+TRANSIENT_ERROR_CODES = {
+    "InternalServerError",
+    "LimitExceededException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "ServiceUnavailable",
+    "ThrottlingException",
+    "TransactionConflictException",
+}
+UNCATEGORIZED = "Uncategorized"
+DEFAULT_AUTHOR = "AWS"
+CONTENT_FIELDS = [
+    "title",
+    "post_excerpt",
+    "main_category",
+    "categories",
+    "authors",
+    "featured_image_url",
+]
+DIRECTORY_API_URL = "https://aws.amazon.com/api/dirs/items/search"
+# A source is a directory in a locale. Optionally it has the tag namespace of
+# its categories (default <directory_id>#category), a category mapping file
+# next to this module, and an author for items that have none.
+DEFAULT_SOURCE = {"name": "blog-posts", "directory_id": "blog-posts", "locale": "en_US"}
+DEFAULT_CATEGORY_MAPPING = "category_mapping.yaml"
 
 table_name = os.environ.get("BLOGS_TABLE")
-queue_url = os.environ.get("TWITTER_POST_QUEUE")
-ddb_client = boto3.client("dynamodb")
-ssm_client = boto3.client("ssm")
-sqs_client = boto3.client("sqs")
+event_bus_name = os.environ.get("EVENT_BUS")
+blog_sources = json.loads(os.environ.get("BLOG_SOURCES", "[]")) or [DEFAULT_SOURCE]
+category_mappings: Dict[str, dict] = {}  # mapping file -> mapping, per container
+known_content_hashes: Dict[str, str] = {}  # sort key -> content hash, per container
+http_session = None  # pylint: disable=invalid-name
 
 
-def lambda_handler(event, _context):
-    """Run the Lambda function."""
-    print(json.dumps(event))
+@cold_start.profiled
+@instrumentation.instrumented
+@log.logged()
+def lambda_handler(_event, context):
+    """
+    Run the Lambda function.
+
+    The invocation's remaining time is split between fetching the pages and
+    storing the blogs. Every source gets the fetch share for
+    itself, they are fetched in parallel. A source that fails or runs out of
+    time is left to the next run, the others go ahead. The blogs of a source
+    are only stored when every page back to its watermark was fetched, and
+    always oldest first, so its watermark only moves over stored blogs.
+    """
+    budget = ExecutionBudget(context)
 
-    latest_blog_in_ddb = fetch_latest_item()
-    aws_blogs = retrieve_blogs_from_aws(latest_blog_in_ddb)
-    aws_blogs.reverse()
-    store_blogs_in_ddb_and_sqs(aws_blogs)
+    watermarks = fetch_watermarks()
+    if watermarks is None:
+        return
+    source_runs = fetch_sources(watermarks, budget)
 
+    # Oldest first across the sources, a stable sort keeps the order of a source
+    aws_blogs = sorted(
+        (blog for run in source_runs for blog in run["new_blogs"]),
+        key=lambda x: x["date_created"],
+    )
+    store_stage = budget.stage("store", 1.0, BLOG_ESTIMATE_MS)
+    processed = store_blogs_in_ddb(aws_blogs, store_stage)
+    if len(processed) == len(aws_blogs):
+        update_changed_blogs(
+            [blog for run in source_runs for blog in run["seen_blogs"]], store_stage
+        )
+    for run in source_runs:
+        save_watermark(
+            run, [blog for blog in processed if blog["source"] == run["source"]["name"]]
+        )
+
+    try:
+        scheduler.update_schedule(table_name)
+    except Exception as exc:  # pylint: disable=broad-except
+        log.warning("Failed to update the schedule: %r", exc)
 
-def store_blogs_in_ddb_and_sqs(aws_blogs):
-    """Store the blog entries in DynamoDB. When successful, send it to SQS."""
-    print(f"Storing {len(aws_blogs)} items in DDB and SQS.")
-    for blog in aws_blogs:
+
+def fetch_sources(watermarks: Dict[str, dict], budget: ExecutionBudget) -> List[dict]:
+    """Fetch the new blogs of every source concurrently, return a run per source that succeeded."""
+    session = get_http_session()
+    with ThreadPoolExecutor(max_workers=len(blog_sources)) as pool:
+        futures = [
+            (
+                source,
+                pool.submit(
+                    fetch_source,
+                    source,
+                    watermarks.get(source["name"]),
+                    budget.stage(
+                        f"fetch {source['name']}", FETCH_SHARE, PAGE_ESTIMATE_MS
+                    ),
+                    session,
+                ),
+            )
+            for source in blog_sources
+        ]
+    source_runs = []
+    for source, future in futures:
         try:
-            date_created = blog["date_created"]
-            item_unique_id = hashlib.md5(blog["item_url"].encode()).hexdigest()
-            sort_key = f"{date_created}#{item_unique_id}"
-            store_blog_in_ddb(blog)
-            send_sort_key_to_sqs(sort_key)  # deprecated
-        except Exception as exc:  # pylint:disable=broad-except
-            print(exc)  # Print the exception and continue to the next blog
+            source_runs.append(future.result())
+        except BudgetExhausted as exc:
+            log.warning(
+                "Stopped fetching %s, nothing of it is stored and the next run retries: %s",
+                source["name"],
+                exc,
+            )
+        except Exception as exc:  # pylint: disable=broad-except
+            log.warning(
+                "Failed to fetch %s, the next run retries: %r", source["name"], exc
+            )
+    return source_runs
 
 
-def store_blog_in_ddb(blog: dict):
-    """Take a dictionary and store it in DynamoDB."""
-    item_url = blog.get("item_url")
-    main_category = blog.get("main_category")
-    date_created = blog.get("date_created")
-    item_unique_id = hashlib.md5(item_url.encode()).hexdigest()
-    authors = blog.get("authors")
+def fetch_source(
+    source: dict, watermark: Optional[dict], stage_budget: StageBudget, session
+) -> dict:
+    """
+    Fetch the blogs of a source published after its watermark.
+
+    A new source without a watermark starts at its latest blog, its history
+    is not posted. The blogs source was tracked by the latest stored blog
+    before watermarks were kept per source, it continues from there.
+    """
+    run = {"source": source, "watermark": watermark, "new_blogs": [], "seen_blogs": []}
+    if watermark is not None:
+        latest_blog_in_ddb = watermark["blog_url"]
+    elif source["name"] == DEFAULT_SOURCE["name"]:
+        latest_blog_in_ddb = fetch_latest_item()
+    else:
+        stage_budget.ensure_time_for_unit()
+        with stage_budget.unit():
+            latest = fetch_blog_page(
+                0, session, min(MAX_PAGE_TIMEOUT, stage_budget.remaining_s()), source
+            )
+        if latest:
+            log.info("Starting source %s at %s", source["name"], latest[0]["item_url"])
+            run["start_url"] = latest[0]["item_url"]
+        return run
+
+    aws_blogs = retrieve_blogs_from_aws(
+        latest_blog_in_ddb,
+        stage_budget=stage_budget,
+        seen_blogs=run["seen_blogs"],
+        source=source,
+        session=session,
+    )
+    aws_blogs.reverse()
+    run["new_blogs"] = aws_blogs
+    return run
+
+
+def get_http_session():
+    """Return the HTTP session shared by the sources for the container lifetime."""
+    global http_session  # pylint: disable=global-statement,invalid-name
+    if http_session is None:
+        import requests  # pylint: disable=import-outside-toplevel
+
+        http_session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(10, len(blog_sources)))
+        http_session.mount("https://", adapter)
+        http_session.mount("http://", adapter)
+    return http_session
+
+
+def store_blogs_in_ddb(
+    aws_blogs, stage_budget: Optional[StageBudget] = None
+) -> List[dict]:
+    """
+    Store the blog entries in DynamoDB.
+
+    A blog is only started when its store is expected to fit in the stage
+    budget, and storing stops at the first blog that fails with a transient
+    error. The blogs that are left are newer than the watermark and picked up
+    by the next run. A blog that fails with any other error would fail on
+    every run, so it is logged and skipped, and the watermark moves past it.
+    Returns the blogs that were processed, including the skipped ones.
+    """
+    log.info("Storing %d items in DDB.", len(aws_blogs))
+    # Not a second copy of a post the previous fetcher stored in the legacy partition
+    partitions = blog_posts.stored_partitions(
+        table_name, [blog_sort_key(blog) for blog in aws_blogs]
+    )
+    for index, blog in enumerate(aws_blogs):
+        if stage_budget and not stage_budget.has_time_for_unit():
+            log.warning(
+                "Stopped after %d of %d items to meet the deadline, "
+                "the next run continues from there.",
+                index,
+                len(aws_blogs),
+            )
+            return aws_blogs[:index]
+        with stage_budget.unit() if stage_budget else contextlib.nullcontext():
+            try:
+                store_blog_in_ddb(blog, partitions[blog_sort_key(blog)])
+            except Exception as exc:  # pylint:disable=broad-except
+                if not is_transient(exc):
+                    log.exception(
+                        "Skipped %s, it cannot be stored", blog.get("item_url")
+                    )
+                    continue
+                # The watermark must stay behind the blog, so the next run retries it
+                log.exception(
+                    "Failed to store %s, the next run continues from there.",
+                    blog.get("item_url"),
+                )
+                return aws_blogs[:index]
+    return aws_blogs
+
+
+def is_transient(exc: Exception) -> bool:
+    """Return whether storing a blog failed on an error a later run can get past."""
+    # pylint: disable-next=import-outside-toplevel
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    if isinstance(exc, ClientError):
+        error = exc.response.get("Error", {})
+        status_code = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return error.get("Code") in TRANSIENT_ERROR_CODES or status_code >= 500
+    # Connection errors and timeouts
+    return isinstance(exc, BotoCoreError)
+
+
+def update_changed_blogs(seen_blogs, stage_budget: Optional[StageBudget] = None):
+    """
+    Apply edits to blogs that were stored before.
 
+    Blogs whose content hash is known to be unchanged in this container are
+    skipped without calling DynamoDB. The others are updated in the partition
+    they are stored in.
+    """
+    ddb_items = []
+    for blog in seen_blogs:
+        ddb_item = build_ddb_item(blog)
+        sort_key = ddb_item["SK"]["S"]
+        if known_content_hashes.get(sort_key) != ddb_item["content_hash"]["S"]:
+            ddb_items.append(ddb_item)
+    partitions = blog_posts.stored_partitions(
+        table_name, [ddb_item["SK"]["S"] for ddb_item in ddb_items]
+    )
+    for ddb_item in ddb_items:
+        ddb_item["PK"] = {"S": partitions[ddb_item["SK"]["S"]]}
+        if stage_budget and not stage_budget.has_time_for_unit():
+            log.warning("Stopped checking for updated blogs to meet the deadline.")
+            return
+        with stage_budget.unit() if stage_budget else contextlib.nullcontext():
+            try:
+                update_blog_in_ddb(ddb_item)
+            except Exception:  # pylint:disable=broad-except
+                # Log the exception and continue to the next blog
+                log.exception("Failed to update %s", ddb_item["blog_url"]["S"])
+
+
+def blog_sort_key(blog: dict) -> str:
+    """Return the sort key of a blog: its creation date and a hash of its URL."""
+    item_unique_id = hashlib.md5(blog["item_url"].encode()).hexdigest()
+    return f"{blog['date_created']}#{item_unique_id}"
+
+
+def content_hash(ddb_item: dict) -> str:
+    """Return a compact hash of the content fields of a BlogPost item."""
+    content = {}
+    for field in CONTENT_FIELDS:
+        value = ddb_item[field]
+        if "SS" in value:
+            value = {"SS": sorted(value["SS"])}
+        content[field] = value
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def build_ddb_item(blog: dict) -> dict:
+    """
+    Convert a parsed blog to a BlogPost item in DynamoDB JSON.
+
+    DynamoDB rejects empty string sets, and the posters need a main category
+    and authors. A blog without a main category is UNCATEGORIZED, without
+    categories it has its main category, and without authors DEFAULT_AUTHOR.
+    """
+    sort_key = blog_sort_key(blog)
+    main_category = blog.get("main_category") or UNCATEGORIZED
     ddb_item = {
-        "blog_url": {"S": item_url},
-        "date_created": {"S": date_created},
+        "PK": {"S": blog_posts.partition_key(sort_key)},
+        "SK": {"S": sort_key},
+        "blog_url": {"S": blog.get("item_url")},
+        "date_created": {"S": blog.get("date_created")},
         "title": {"S": blog.get("title")},
         "main_category": {"S": main_category},
-        "categories": {"SS": blog.get("categories")},
-        "authors": {"SS": authors},
+        "categories": {"SS": string_set(blog.get("categories")) or [main_category]},
+        "authors": {"SS": string_set(blog.get("authors")) or [DEFAULT_AUTHOR]},
         "date_updated": {"S": blog.get("date_updated")},
+        "source": {"S": blog.get("source", DEFAULT_SOURCE["name"])},
     }
 
     if blog.get("featured_image_url"):
@@ -77,27 +338,62 @@ def store_blog_in_ddb(blog: dict):
     else:
         ddb_item["post_excerpt"] = {"NULL": True}
 
+    ddb_item["content_hash"] = {"S": content_hash(ddb_item)}
+    return ddb_item
+
+
+def string_set(values: Optional[List[str]]) -> List[str]:
+    """Return the distinct non-empty values of a list, in order, for a string set."""
+    return list(dict.fromkeys(value for value in values or [] if value))
+
+
+def add_stage_times(blog: dict, ddb_item: dict) -> Dict[str, str]:
+    """Add the times a blog was fetched and is stored to its item, return them by stage."""
+    stage_times = {"stored": latency.now()}
+    if blog.get("fetched_at"):
+        stage_times["fetched"] = blog["fetched_at"]
+    for stage, timestamp in stage_times.items():
+        ddb_item[latency.attribute(stage)] = {"S": timestamp}
+    return stage_times
+
+
+def store_blog_in_ddb(blog: dict, partition: Optional[str] = None):
+    """
+    Take a dictionary and store it in DynamoDB, with the times it was fetched and stored.
+
+    The item is written to `partition` when given, by default to the
+    partition of its sort key.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from botocore.exceptions import ClientError
+
+    item_url = blog.get("item_url")
+    ddb_item = build_ddb_item(blog)
+    stage_times = add_stage_times(blog, ddb_item)
+    if partition:
+        ddb_item["PK"] = {"S": partition}
+
     try:
-        ddb_client.put_item(
+        get_client("dynamodb").put_item(
             TableName=table_name,
-            Item={
-                "PK": {"S": "BlogPost"},
-                "SK": {"S": f"{date_created}#{item_unique_id}"},
-                **ddb_item,
-            },
+            Item=ddb_item,
             ConditionExpression="attribute_not_exists(PK) AND attribute_not_exists(SK)",
         )
+        known_content_hashes[ddb_item["SK"]["S"]] = ddb_item["content_hash"]["S"]
+        for stage, timestamp in stage_times.items():
+            latency.record(stage, blog.get("date_created"), timestamp)
     except ClientError as exc:
         if exc.response["Error"]["Code"] == "ConditionalCheckFailedException":
-            print(
-                f"Tried to insert an item that already exists in table v2: {item_url}"
+            log.info(
+                "Tried to insert an item that already exists in table v2: %s", item_url
             )
+            update_blog_in_ddb(ddb_item)
         else:
             raise exc
 
-    for author in authors:  # deprecated
+    for author in ddb_item["authors"]["SS"]:  # deprecated
         try:
-            ddb_client.put_item(
+            get_client("dynamodb").put_item(
                 TableName=table_name,
                 Item={
                     "PK": {"S": "Author"},
@@ -109,33 +405,212 @@ def store_blog_in_ddb(blog: dict):
             if exc.response["Error"]["Code"] == "ConditionalCheckFailedException":
                 pass
             else:
-                print(f"Got ClientError while adding Author {author}: {exc}")
+                log.warning("Got ClientError while adding Author %s: %s", author, exc)
+
 
+def update_blog_in_ddb(ddb_item: dict) -> List[str]:
+    """
+    Update a stored BlogPost when its content hash differs, return the changed fields.
+
+    The update is conditional on the stored hash, so an unchanged blog costs
+    one rejected write and no read. Fields that really changed are found from
+    the old values DynamoDB returns, and announced with an update signal.
+    Without a read the changed fields are not known before the write, so it
+    sets every content field: values that did not change are written as they
+    are, at no extra write capacity, and only the changed ones are announced.
+    A blog that is listed by several sources is only updated by the source
+    that stored it, items from before sources were recorded belong to the
+    default source.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from botocore.exceptions import ClientError
+
+    sort_key = ddb_item["SK"]["S"]
+    new_hash = ddb_item["content_hash"]["S"]
+    fields = CONTENT_FIELDS + ["date_updated", "content_hash"]
+    same_source = "#source = :source"
+    if ddb_item["source"]["S"] == DEFAULT_SOURCE["name"]:
+        same_source = f"(attribute_not_exists(#source) OR {same_source})"
+    try:
+        response = get_client("dynamodb").update_item(
+            TableName=table_name,
+            Key={"PK": ddb_item["PK"], "SK": ddb_item["SK"]},
+            UpdateExpression="SET "
+            + ", ".join(f"#{field} = :{field}" for field in fields),
+            ConditionExpression=(
+                f"attribute_exists(SK) AND {same_source} AND "
+                "(attribute_not_exists(content_hash) OR content_hash <> :content_hash)"
+            ),
+            ExpressionAttributeNames={
+                f"#{field}": field for field in fields + ["source"]
+            },
+            ExpressionAttributeValues={
+                f":{field}": ddb_item[field] for field in fields + ["source"]
+            },
+            ReturnValues="UPDATED_OLD",
+        )
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            known_content_hashes[sort_key] = new_hash
+            return []
+        raise exc
+    known_content_hashes[sort_key] = new_hash
+
+    # Fields that did not exist before, like on items stored before the hash
+    # was introduced, are not reported as changed.
+    old_item = response.get("Attributes", {})
+    changed_fields = [
+        field
+        for field in CONTENT_FIELDS
+        if field in old_item and not same_value(old_item[field], ddb_item[field])
+    ]
+    if changed_fields:
+        send_update_signal(ddb_item, changed_fields, old_item)
+    return changed_fields
+
+
+def same_value(old_value: dict, new_value: dict) -> bool:
+    """Compare two DynamoDB JSON values, ignoring the order of string sets."""
+    if "SS" in old_value and "SS" in new_value:
+        return sorted(old_value["SS"]) == sorted(new_value["SS"])
+    return old_value == new_value
+
+
+def send_update_signal(ddb_item: dict, changed_fields: List[str], old_item: dict):
+    """
+    Publish an AWSBlogUpdated event on the event bus.
 
-def send_sort_key_to_sqs(sort_key: str):
-    """Send the Sort Key to SQS for further processing."""
-    sqs_client.send_message(
-        QueueUrl=queue_url,
-        MessageBody=sort_key,
-        MessageGroupId=sort_key,
-        MessageDeduplicationId=sort_key,
+    The event ID includes the content hash, so consumers can recognise the
+    event of an edit that was delivered twice. A post that moved to another
+    main category has the previous one in the event, for the feeds.
+    """
+    sort_key = ddb_item["SK"]["S"]
+    log.info(
+        "Blog %s changed: %s",
+        ddb_item["blog_url"]["S"],
+        ", ".join(changed_fields),
+        sort_key=sort_key,
     )
+    detail = {
+        "metadata": {
+            "event_id": f"{sort_key}#{ddb_item['content_hash']['S']}",
+            "event_time": latency.now(),
+            "event_version": 1,
+        },
+        "data": {
+            "blog_sort_key": sort_key,
+            "blog_url": ddb_item["blog_url"]["S"],
+            "title": ddb_item["title"]["S"],
+            "date_updated": ddb_item["date_updated"]["S"],
+            "changed_fields": changed_fields,
+        },
+    }
+    if "main_category" in changed_fields:
+        detail["data"]["previous_main_category"] = old_item["main_category"]["S"]
+    response = get_client("events").put_events(
+        Entries=[
+            {
+                "EventBusName": event_bus_name,
+                "Source": "blog_fetcher",
+                "DetailType": "AWSBlogUpdated",
+                "Detail": json.dumps(detail),
+            }
+        ]
+    )
+    if response["FailedEntryCount"]:
+        raise RuntimeError(
+            f"Publishing the update of {sort_key} failed: {response['Entries']}"
+        )
 
 
-def retrieve_blogs_from_aws(latest_blog_in_ddb, page=0):
+def retrieve_blogs_from_aws(  # pylint: disable=too-many-arguments
+    latest_blog_in_ddb,
+    page=0,
+    stage_budget: Optional[StageBudget] = None,
+    seen_blogs: Optional[List[dict]] = None,
+    source: Optional[dict] = None,
+    session=None,
+):
     """
-    Retrieve blogs from the AWS API.
+    Retrieve blogs of a source from the AWS API.
 
     The function stops when the latest_blog_in_ddb is encountered or when
-    the max number of pages has been reached.
+    the max number of pages has been reached. It raises BudgetExhausted when
+    the stage budget runs out before that. The already stored blogs on the
+    last page, starting with latest_blog_in_ddb, are added to seen_blogs.
     """
     if page >= MAX_BLOG_PAGES:
-        return {}
+        return []
 
-    api_url = HTTP_BLOG_URL + f"&page={page}"
-    response = requests.get(api_url)
-    blog_data = response.json()
+    source = source or DEFAULT_SOURCE
+    timeout = MAX_PAGE_TIMEOUT
+    if stage_budget:
+        stage_budget.ensure_time_for_unit()
+        timeout = min(timeout, stage_budget.remaining_s())
+    with stage_budget.unit() if stage_budget else contextlib.nullcontext():
+        parsed_items = fetch_blog_page(page, session, timeout, source)
 
+    if not latest_blog_in_ddb or latest_blog_in_ddb not in [
+        x["item_url"] for x in parsed_items
+    ]:
+        parsed_items += retrieve_blogs_from_aws(
+            latest_blog_in_ddb, page + 1, stage_budget, seen_blogs, source, session
+        )
+    elif latest_blog_in_ddb in [x["item_url"] for x in parsed_items]:
+        latest_blog_index = next(
+            (
+                index
+                for (index, d) in enumerate(parsed_items)
+                if d["item_url"] == latest_blog_in_ddb
+            ),
+            None,
+        )
+        if seen_blogs is not None:
+            seen_blogs += parsed_items[latest_blog_index:]
+        return parsed_items[0:latest_blog_index]
+
+    return parsed_items
+
+
+def source_url(source: dict) -> str:
+    """Return the directory API URL of a source, without the page parameter."""
+    return (
+        f"{DIRECTORY_API_URL}?item.directoryId={source['directory_id']}"
+        "&sort_by=item.additionalFields.createdDate"
+        f"&sort_order=desc&size={PAGE_SIZE}&item.locale={source['locale']}"
+    )
+
+
+def fetch_blog_page(
+    page: int,
+    session=None,
+    timeout: float = MAX_PAGE_TIMEOUT,
+    source: Optional[dict] = None,
+) -> List[dict]:
+    """Fetch and parse one page of a source, optionally over a requests.Session."""
+    import requests  # pylint: disable=import-outside-toplevel
+
+    source = source or DEFAULT_SOURCE
+    api_url = source_url(source) + f"&page={page}"
+    with instrumentation.track("aws-blogs", "Search") as call:
+        response = (session or requests).get(api_url, timeout=timeout)
+        call.status(response.status_code)
+    blogs = parse_blog_items(response.json(), source)
+    fetched_at = latency.now()
+    for blog in blogs:
+        blog["fetched_at"] = fetched_at
+    return blogs
+
+
+def parse_blog_items(blog_data: dict, source: Optional[dict] = None) -> List[dict]:
+    """Parse the items of a page of the AWS blogs API, skipping incomplete ones."""
+    source = source or DEFAULT_SOURCE
+    category_namespace = source.get(
+        "category_namespace", f"{source['directory_id']}#category"
+    )
+    mapping = load_category_mapping(
+        source.get("category_mapping", DEFAULT_CATEGORY_MAPPING)
+    )
     parsed_items = []
     for item in blog_data["items"]:
         blog_item = item["item"]
@@ -143,79 +618,159 @@ def retrieve_blogs_from_aws(latest_blog_in_ddb, page=0):
 
         categories = []
         for tag in item["tags"]:
-            if tag["tagNamespaceId"] == "blog-posts#category":
+            if tag["tagNamespaceId"] == category_namespace:
                 description = json.loads(tag["description"])
                 if not description["name"].startswith("*"):
                     categories.append(html.unescape(description["name"]))
 
         try:
             item_url = additional_fields["link"]
+            if "author" in blog_item or "default_author" not in source:
+                authors = html.unescape(json.loads(blog_item["author"]))
+            else:
+                authors = [source["default_author"]]
             parsed_items.append(
                 {
                     "item_url": item_url,
                     "title": html.unescape(additional_fields["title"]),
-                    "main_category": lookup_category(item_url, categories),
+                    "main_category": lookup_category(item_url, categories, mapping),
                     "categories": categories,
                     "post_excerpt": html.unescape(
                         additional_fields.get("postExcerpt", "")
                     ),
                     "featured_image_url": additional_fields.get("featuredImageUrl"),
-                    "authors": html.unescape(json.loads(blog_item["author"])),
+                    "authors": authors,
                     "date_created": blog_item["dateCreated"],
                     "date_updated": blog_item["dateUpdated"],
+                    "source": source["name"],
                 }
             )
         except KeyError:
             continue
 
-    if not latest_blog_in_ddb or latest_blog_in_ddb not in [
-        x["item_url"] for x in parsed_items
-    ]:
-        parsed_items += retrieve_blogs_from_aws(latest_blog_in_ddb, page + 1)
-    elif latest_blog_in_ddb in [x["item_url"] for x in parsed_items]:
-        latest_blog_index = next(
-            (
-                index
-                for (index, d) in enumerate(parsed_items)
-                if d["item_url"] == latest_blog_in_ddb
-            ),
-            None,
-        )
-        return parsed_items[0:latest_blog_index]
-
     return parsed_items
 
 
-def lookup_category(item_url: str, categories: List[str]):
+def lookup_category(
+    item_url: str, categories: List[str], mapping: Optional[dict] = None
+):
     """Lookup the main category from the URL. If none is found, use the first category in tags."""
-    with open("category_mapping.yaml") as category_mapping_file:
-        category_mapping = yaml.load(category_mapping_file, Loader=yaml.FullLoader)
+    if mapping is None:
+        mapping = load_category_mapping()
 
     url_path_components = item_url.split("/")
-    blog_category_id = url_path_components[4]
     try:
-        return category_mapping[blog_category_id]
-    except KeyError:
+        blog_category_id = url_path_components[4]
+        return mapping[blog_category_id]
+    except (IndexError, KeyError):
         pass
 
     if categories:
         return categories[0]
+    return None
+
+
+def load_category_mapping(file_name: str = DEFAULT_CATEGORY_MAPPING) -> dict:
+    """Load a category mapping once per container; yaml is only imported here."""
+    if file_name not in category_mappings:
+        import yaml  # pylint: disable=import-outside-toplevel
+
+        mapping_path = os.path.join(os.path.dirname(__file__), file_name)
+        with open(mapping_path, encoding="utf-8") as category_mapping_file:
+            category_mappings[file_name] = yaml.load(
+                category_mapping_file, Loader=yaml.FullLoader
+            )
+    return category_mappings[file_name]
+
+
+def fetch_watermarks() -> Optional[Dict[str, dict]]:
+    """
+    Return the watermark of every source that has one, or None when they cannot be read.
+
+    A watermark item also holds the content hashes of the latest blogs of
+    its source, which are what the update check sees in a quiet run.
+    """
+    try:
+        response = get_client("dynamodb").query(
+            TableName=table_name,
+            KeyConditionExpression="PK = :pk",
+            ExpressionAttributeValues={":pk": {"S": "FetcherWatermark"}},
+            ConsistentRead=True,
+        )
+    except Exception as exc:  # pylint: disable=broad-except
+        log.error("Failed to fetch the watermarks, the next run retries: %r", exc)
+        return None
+
+    watermarks = {}
+    for item in response["Items"]:
+        content_hashes = {
+            key: value["S"]
+            for key, value in item.get("content_hashes", {}).get("M", {}).items()
+        }
+        known_content_hashes.update(content_hashes)
+        watermarks[item["SK"]["S"]] = {
+            "blog_url": item["blog_url"]["S"],
+            "content_hashes": content_hashes,
+        }
+    return watermarks
+
+
+def save_watermark(run: dict, processed: List[dict]) -> None:
+    """Move the watermark of a source to its latest processed blog, if anything changed."""
+    if processed:
+        blog_url = processed[-1]["item_url"]
+    elif run.get("start_url"):
+        blog_url = run["start_url"]
+    elif run["watermark"]:
+        blog_url = run["watermark"]["blog_url"]
+    else:
+        return
+
+    # The latest blogs of the source, newest first
+    latest_sort_keys = [blog_sort_key(blog) for blog in reversed(processed)]
+    latest_sort_keys += [blog_sort_key(blog) for blog in run["seen_blogs"]]
+    content_hashes = {
+        sort_key: known_content_hashes[sort_key]
+        for sort_key in latest_sort_keys[:PAGE_SIZE]
+        if sort_key in known_content_hashes
+    }
+    if run["watermark"] == {"blog_url": blog_url, "content_hashes": content_hashes}:
+        return
+
+    try:
+        get_client("dynamodb").put_item(
+            TableName=table_name,
+            Item={
+                "PK": {"S": "FetcherWatermark"},
+                "SK": {"S": run["source"]["name"]},
+                "blog_url": {"S": blog_url},
+                "content_hashes": {
+                    "M": {key: {"S": value} for key, value in content_hashes.items()}
+                },
+            },
+        )
+    except Exception as exc:  # pylint: disable=broad-except
+        log.error("Failed to save the watermark of %s: %r", run["source"]["name"], exc)
 
 
 def fetch_latest_item():
-    """Fetch the last processed blog post from the SSM Parameter Store."""
+    """Fetch the last processed blog post, the watermark before it was kept per source."""
     latest_item = None
     try:
-        posts_table = boto3.resource("dynamodb").Table(table_name)
-        response = posts_table.query(
-            KeyConditionExpression=Key("PK").eq("BlogPost"),
+        items = blog_posts.latest(
+            table_name,
+            PAGE_SIZE,
+            ProjectionExpression="SK, blog_url, content_hash",
             ConsistentRead=True,
-            ScanIndexForward=False,
-            Limit=1,
         )
-        latest_item = response["Items"][0]["blog_url"]
-        print(f"Got latest item from DDB: {latest_item}")
+        # The latest page of blogs is what the update check sees in a quiet
+        # run, so their hashes come along with the watermark.
+        for item in items:
+            if "content_hash" in item:
+                known_content_hashes[item["SK"]["S"]] = item["content_hash"]["S"]
+        latest_item = items[0]["blog_url"]["S"]
+        log.info("Got latest item from DDB: %s", latest_item)
     except Exception as exc:  # pylint: disable=broad-except
-        print(f"Failed to fetch latest item: {exc}")
+        log.error("Failed to fetch latest item: %r", exc)
 
     return latest_item
@@ -0,0 +1,123 @@
+"""
+Adaptive polling schedule for the blog fetcher.
+
+AWS blogs are published in weekday, business-hour waves. This module learns
+how many posts are published per weekday and hour from the date_created of
+the stored BlogPost items, and retunes the rate of the fetcher's own
+EventBridge rule: every minute while posts are expected, backing off to
+MAX_POLL_INTERVAL minutes overnight and at weekends. MAX_POLL_INTERVAL is the
+hard upper bound on the time between a publication and its detection.
+
+A container reads the rule again when its copy of the schedule expression is
+older than RULE_MAX_AGE seconds, as other containers and deployments change
+the rule too.
+"""
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import blog_posts
+import log
+from aws_clients import get_client
+
+RULE_NAME = os.environ.get("ADAPTIVE_SCHEDULE_RULE")
+MIN_POLL_INTERVAL = 1  # minutes
+MAX_POLL_INTERVAL = int(os.environ.get("MAX_POLL_INTERVAL", "10"))  # minutes
+POLLS_PER_POST = 10  # polls per expected time between two posts
+HISTORY_WEEKS = 4
+PROFILE_MAX_AGE = 24 * 3600  # seconds
+RULE_MAX_AGE = 300  # seconds
+
+_profile: Optional[Dict[Tuple[int, int], float]] = None
+_profile_built_at = 0.0  # pylint: disable=invalid-name
+_current_expression: Optional[str] = None
+_expression_read_at = 0.0  # pylint: disable=invalid-name
+
+
+def build_profile(
+    date_created_values: List[str], weeks: int
+) -> Dict[Tuple[int, int], float]:
+    """Return the average number of posts per (weekday, hour) in UTC."""
+    counts: Dict[Tuple[int, int], float] = {}
+    for date_created in date_created_values:
+        created = datetime.strptime(date_created, "%Y-%m-%dT%H:%M:%S%z").astimezone(
+            timezone.utc
+        )
+        slot = (created.weekday(), created.hour)
+        counts[slot] = counts.get(slot, 0) + 1
+    return {slot: count / weeks for slot, count in counts.items()}
+
+
+def poll_interval(profile: Dict[Tuple[int, int], float], now: datetime) -> int:
+    """
+    Return the poll interval in minutes for `now`.
+
+    The rate of the current and the next hour are considered, so polling
+    speeds up before a busy hour starts.
+    """
+    next_hour = now + timedelta(hours=1)
+    rate = max(
+        profile.get((now.weekday(), now.hour), 0.0),
+        profile.get((next_hour.weekday(), next_hour.hour), 0.0),
+    )
+    if rate <= 0:
+        return MAX_POLL_INTERVAL
+    interval = int(60 / (rate * POLLS_PER_POST))
+    return max(MIN_POLL_INTERVAL, min(MAX_POLL_INTERVAL, interval))
+
+
+def schedule_expression(interval: int) -> str:
+    """Return the EventBridge rate expression for an interval in minutes."""
+    return f"rate({interval} minute{'s' if interval > 1 else ''})"
+
+
+def fetch_publication_dates(table_name: str, weeks: int) -> List[str]:
+    """Query the date_created of every BlogPost from the last `weeks` weeks."""
+    since = (datetime.now(timezone.utc) - timedelta(weeks=weeks)).strftime(
+        "%Y-%m-%dT%H:%M:%S"
+    )
+    return [
+        item["date_created"]["S"]
+        for item in blog_posts.query(
+            table_name, since=since, ProjectionExpression="date_created"
+        )
+    ]
+
+
+def get_profile(table_name: str) -> Dict[Tuple[int, int], float]:
+    """Return the publication profile, rebuilt at most once a day per container."""
+    global _profile, _profile_built_at  # pylint: disable=global-statement,invalid-name
+    if _profile is None or time.time() - _profile_built_at > PROFILE_MAX_AGE:
+        _profile = build_profile(
+            fetch_publication_dates(table_name, HISTORY_WEEKS), HISTORY_WEEKS
+        )
+        _profile_built_at = time.time()
+    return _profile
+
+
+def update_schedule(table_name: str) -> None:
+    """Retune the fetcher's EventBridge rule when the desired interval changed."""
+    global _current_expression, _expression_read_at  # pylint: disable=global-statement,invalid-name
+    if not RULE_NAME:
+        return
+
+    events_client = get_client("events")
+    if _current_expression is None or time.time() - _expression_read_at > RULE_MAX_AGE:
+        rule = events_client.describe_rule(Name=RULE_NAME)
+        _current_expression = rule["ScheduleExpression"]
+        _expression_read_at = time.time()
+
+    interval = poll_interval(get_profile(table_name), datetime.now(timezone.utc))
+    expression = schedule_expression(interval)
+    if expression == _current_expression:
+        return
+
+    events_client.put_rule(
+        Name=RULE_NAME,
+        ScheduleExpression=expression,
+        State="ENABLED",
+        Description="Scan for new blogs on an adaptive schedule",
+    )
+    log.info("Changed the schedule from %s to %s", _current_expression, expression)
+    _current_expression = expression
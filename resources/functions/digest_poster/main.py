@@ -0,0 +1,254 @@
+"""
+Digest Poster Lambda module.
+
+Posts in the categories of DIGEST_CATEGORIES are not tweeted one by one; the
+publisher sets their digest_pending to their main category instead. This
+function runs once per digest window. It finds the pending posts of every
+digest category on the sparse digest_pending_idx index, which only holds the
+pending posts, sorted by sort key. One query per category runs in parallel,
+and one thread per category is posted. The posts are packed into as few
+tweets as fit, starting with a head tweet that counts them. A thread that
+failed halfway is finished first, below its last tweet, and the posts that
+became pending since get a new thread of their own.
+"""
+import cold_start  # pylint: disable=wrong-import-order
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+import instrumentation
+import log
+from aws_clients import get_client
+
+if TYPE_CHECKING:
+    from TwitterAPI import TwitterAPI
+
+DIGEST_INDEX = "digest_pending_idx"
+MAX_TWEET_LEN = 280
+URL_LEN = 23  # Twitter counts every URL as 23 characters
+MAX_TITLE_LEN = 120
+
+table_name = os.environ.get("BLOGS_TABLE")
+digest_categories = json.loads(os.environ.get("DIGEST_CATEGORIES", "[]"))
+
+
+@cold_start.profiled
+@instrumentation.instrumented
+@log.logged()
+def lambda_handler(_event, _context):
+    """Run the Lambda function."""
+    pending = collect_pending_posts(digest_categories)
+    if not any(pending.values()):
+        log.info("No pending digest posts")
+        return
+
+    twitter_api = get_twitter_api()
+    for category in digest_categories:
+        if pending[category]:
+            post_digest(category, pending[category], twitter_api)
+
+
+def get_twitter_api():
+    """Retrieve the Twitter Consumer key & secret from AWS Secrets Manager."""
+    from TwitterAPI import TwitterAPI  # pylint: disable=import-outside-toplevel
+
+    get_secret_value_response = get_client("secretsmanager").get_secret_value(
+        SecretId=os.environ.get("TWITTER_SECRET")
+    )
+    secret_dict = json.loads(get_secret_value_response["SecretString"])
+
+    return TwitterAPI(
+        secret_dict["consumer_key"],
+        secret_dict["consumer_secret"],
+        secret_dict["access_token_key"],
+        secret_dict["access_token_secret"],
+    )
+
+
+def collect_pending_posts(categories: List[str]) -> Dict[str, List[dict]]:
+    """Query the pending posts of every category in parallel, oldest first."""
+    if not categories:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(categories)) as pool:
+        results = pool.map(lambda category: list(pending_posts(category)), categories)
+        return dict(zip(categories, results))
+
+
+def pending_posts(category: str) -> Iterator[dict]:
+    """Yield the pending posts of a category oldest first, one page at a time."""
+    params = {
+        "TableName": table_name,
+        "IndexName": DIGEST_INDEX,
+        "KeyConditionExpression": "digest_pending = :category",
+        "ExpressionAttributeValues": {":category": {"S": category}},
+        "ProjectionExpression": "PK, SK, blog_url, title, digest_tweet_id",
+    }
+    while True:
+        response = get_client("dynamodb").query(**params)
+        yield from response["Items"]
+        if "LastEvaluatedKey" not in response:
+            return
+        params = dict(params, ExclusiveStartKey=response["LastEvaluatedKey"])
+
+
+def post_digest(category: str, posts: List[dict], twitter_api: "TwitterAPI"):
+    """
+    Post the digest of a category.
+
+    The posts of a thread that failed halfway remember its head tweet as
+    digest_tweet_id; that thread is finished first. The other posts are
+    posted in a new thread.
+    """
+    threads: Dict[Optional[str], List[dict]] = {}
+    for post in posts:
+        head_id = post["digest_tweet_id"]["S"] if "digest_tweet_id" in post else None
+        threads.setdefault(head_id, []).append(post)
+    new_posts = threads.pop(None, [])
+    for head_id, thread_posts in threads.items():
+        post_thread(category, thread_posts, twitter_api, head_id)
+    if new_posts:
+        post_thread(category, new_posts, twitter_api)
+
+
+def post_thread(
+    category: str,
+    posts: List[dict],
+    twitter_api: "TwitterAPI",
+    head_id: Optional[str] = None,
+):
+    """
+    Post a digest thread, or continue the thread below `head_id`.
+
+    Every post is marked with the tweet that contains it as soon as that
+    tweet is sent. Before that, the first post of the next tweet remembers
+    the tweet as digest_tail_id, so a run that fails halfway is continued
+    below the last tweet of the thread.
+    """
+    header = None if head_id else f"{len(posts)} new {category} posts:"
+    reply_to = thread_tail_id(posts, head_id) if head_id else None
+    tweets = pack_tweets(posts, header)
+    for index, (text, chunk) in enumerate(tweets):
+        body = send_tweet(text, twitter_api, reply_to)
+        reply_to = body["id_str"]
+        if head_id is None:
+            head_id = reply_to
+            for post in posts[len(chunk) :]:  # noqa: E203
+                set_digest_tweet_id(post, head_id)
+        if index + 1 < len(tweets):
+            set_digest_tail_id(tweets[index + 1][1][0], reply_to)
+        for post in chunk:
+            mark_posted(post, reply_to, head_id)
+    log.info(
+        "Posted a digest of %d %s posts in thread %s", len(posts), category, head_id
+    )
+
+
+def thread_tail_id(posts: List[dict], head_id: str) -> str:
+    """
+    Return the last tweet of the thread the pending `posts` belong to.
+
+    The first pending post normally holds it. When a run failed while marking
+    the posts of a tweet, those come first and are posted again below the
+    tail that the post after them holds.
+    """
+    for post in posts:
+        item = (
+            get_client("dynamodb")
+            .get_item(
+                TableName=table_name,
+                Key={"PK": post["PK"], "SK": post["SK"]},
+                ProjectionExpression="digest_tail_id",
+                ConsistentRead=True,
+            )
+            .get("Item", {})
+        )
+        if "digest_tail_id" in item:
+            return item["digest_tail_id"]["S"]
+    return head_id
+
+
+def pack_tweets(posts: List[dict], header: Optional[str]) -> List[tuple]:
+    """Pack the posts into tweets, return (text, posts) per tweet."""
+    tweets = []
+    lines = [header] if header else []
+    length = len(header) if header else 0
+    chunk: List[dict] = []
+    for post in posts:
+        line = digest_line(post)
+        line_length = len(line) - len(post["blog_url"]["S"]) + URL_LEN
+        separator = 2 if lines else 0
+        if chunk and length + separator + line_length > MAX_TWEET_LEN:
+            tweets.append(("\n\n".join(lines), chunk))
+            lines, length, chunk, separator = [], 0, [], 0
+        lines.append(line)
+        length += separator + line_length
+        chunk.append(post)
+    if chunk:
+        tweets.append(("\n\n".join(lines), chunk))
+    return tweets
+
+
+def digest_line(post: dict) -> str:
+    """Return the lines of one post in a digest: its title and URL."""
+    title = post["title"]["S"]
+    if len(title) > MAX_TITLE_LEN:
+        title = title[: MAX_TITLE_LEN - 4].rsplit(" ", 1)[0] + " […]"
+    return f"{title}\n{post['blog_url']['S']}"
+
+
+def send_tweet(text: str, twitter_api: "TwitterAPI", in_reply_to: Optional[str] = None):
+    """Use the Twitter API to send a tweet, optionally as a reply."""
+    params = {"status": text}
+    if in_reply_to:
+        params.update(
+            in_reply_to_status_id=in_reply_to, auto_populate_reply_metadata=True
+        )
+    with instrumentation.track("twitter", "StatusesUpdate") as call:
+        response = twitter_api.request("statuses/update", params)
+        call.status(response.status_code)
+    body = response.json()
+    if response.status_code != 200:
+        error_strs = [f'{x["code"]}: {x["message"]}' for x in body["errors"]]
+        errors = f'[{", ".join(error_strs)}]'
+        raise Exception(
+            f"Post Status failed with status code {response.status_code}. "
+            f"Errors: {errors}"
+        )
+    return body
+
+
+def set_digest_tweet_id(post: dict, head_id: str) -> None:
+    """Remember the head tweet of the thread a pending post will be part of."""
+    get_client("dynamodb").update_item(
+        TableName=table_name,
+        Key={"PK": post["PK"], "SK": post["SK"]},
+        UpdateExpression="SET digest_tweet_id = :head_id",
+        ExpressionAttributeValues={":head_id": {"S": head_id}},
+    )
+
+
+def set_digest_tail_id(post: dict, tail_id: str) -> None:
+    """Remember the tweet that the tweet containing a pending post will reply to."""
+    get_client("dynamodb").update_item(
+        TableName=table_name,
+        Key={"PK": post["PK"], "SK": post["SK"]},
+        UpdateExpression="SET digest_tail_id = :tail_id",
+        ExpressionAttributeValues={":tail_id": {"S": tail_id}},
+    )
+
+
+def mark_posted(post: dict, tweet_id: str, head_id: str) -> None:
+    """Store the tweet that contains a post and take it off the digest index."""
+    get_client("dynamodb").update_item(
+        TableName=table_name,
+        Key={"PK": post["PK"], "SK": post["SK"]},
+        UpdateExpression=(
+            "SET tweet_id = :tweet_id, digest_tweet_id = :head_id REMOVE digest_pending"
+        ),
+        ExpressionAttributeValues={
+            ":tweet_id": {"S": tweet_id},
+            ":head_id": {"S": head_id},
+        },
+    )
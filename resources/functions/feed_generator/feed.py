@@ -0,0 +1,150 @@
+"""
+JSON Feed and Atom documents of the latest blog posts.
+
+The JSON Feed document is the state of a feed: it is patched in place with
+new and changed posts and the Atom document is rendered from it, so neither
+needs the table to be queried again.
+"""
+import json
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+JSON_FEED_VERSION = "https://jsonfeed.org/version/1.1"
+HOME_PAGE_URL = "https://aws.amazon.com/blogs/"
+
+
+def feed_slug(main_category: str) -> str:
+    """Return the file name part of a category feed."""
+    return re.sub(r"[^a-z0-9]+", "-", main_category.lower()).strip("-")
+
+
+def rfc3339(date_value: str) -> str:
+    """Convert a date of the AWS blogs API, like 2023-01-02T03:04:05+0000, to RFC 3339 in UTC."""
+    return (
+        datetime.strptime(date_value, "%Y-%m-%dT%H:%M:%S%z")
+        .astimezone(timezone.utc)
+        .isoformat()
+    )
+
+
+def attribute(ddb_item: dict, name: str, data_type: str):
+    """Return an attribute value of an item in DynamoDB JSON, or None."""
+    return ddb_item.get(name, {}).get(data_type)
+
+
+def feed_item(ddb_item: dict) -> dict:
+    """Convert a BlogPost item in DynamoDB JSON to a JSON Feed item."""
+    blog_url = attribute(ddb_item, "blog_url", "S")
+    item = {
+        "id": blog_url,
+        "url": blog_url,
+        "title": attribute(ddb_item, "title", "S"),
+        "date_published": rfc3339(attribute(ddb_item, "date_created", "S")),
+        "authors": [
+            {"name": name}
+            for name in sorted(attribute(ddb_item, "authors", "SS") or [])
+        ],
+        "tags": sorted(attribute(ddb_item, "categories", "SS") or []),
+    }
+    if attribute(ddb_item, "date_updated", "S"):
+        item["date_modified"] = rfc3339(attribute(ddb_item, "date_updated", "S"))
+    if attribute(ddb_item, "post_excerpt", "S"):
+        item["summary"] = attribute(ddb_item, "post_excerpt", "S")
+    if attribute(ddb_item, "featured_image_url", "S"):
+        item["image"] = attribute(ddb_item, "featured_image_url", "S")
+    return item
+
+
+def new_feed(title: str, feed_url: str, items: List[dict]) -> dict:
+    """Create a JSON Feed document."""
+    return {
+        "version": JSON_FEED_VERSION,
+        "title": title,
+        "home_page_url": HOME_PAGE_URL,
+        "feed_url": feed_url,
+        "items": items,
+    }
+
+
+def patch_feed(feed: dict, upserts: List[dict], removals: List[str], size: int) -> bool:
+    """
+    Patch the head of a feed, return whether it changed.
+
+    Items are replaced by id and inserted by their publication date, so the
+    feed stays newest first. The feed is cut to `size` items; a removal does
+    not pull an older item back in.
+    """
+    items: Dict[str, dict] = {item["id"]: item for item in feed["items"]}
+    for item_id in removals:
+        items.pop(item_id, None)
+    for item in upserts:
+        items[item["id"]] = item
+    patched = sorted(
+        items.values(),
+        key=lambda item: (item["date_published"], item["id"]),
+        reverse=True,
+    )[:size]
+    if patched == feed["items"]:
+        return False
+    feed["items"] = patched
+    return True
+
+
+def render_json(feed: dict) -> bytes:
+    """Render a feed as JSON Feed, deterministically so equal feeds get equal hashes."""
+    return json.dumps(feed, indent=2, sort_keys=True, ensure_ascii=False).encode()
+
+
+def render_atom(feed: dict, atom_url: str) -> bytes:
+    """Render a feed as Atom."""
+    updated = max(
+        (item.get("date_modified", item["date_published"]) for item in feed["items"]),
+        default="1970-01-01T00:00:00+00:00",
+    )
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom">',
+        f"  <id>{escape(atom_url)}</id>",
+        f"  <title>{escape(feed['title'])}</title>",
+        f"  <updated>{updated}</updated>",
+        f'  <link rel="self" href="{escape_attribute(atom_url)}"/>',
+        f'  <link rel="alternate" href="{escape_attribute(feed["home_page_url"])}"/>',
+    ]
+    for item in feed["items"]:
+        lines += [
+            "  <entry>",
+            f"    <id>{escape(item['id'])}</id>",
+            f"    <title>{escape(item['title'] or '')}</title>",
+            f'    <link rel="alternate" href="{escape_attribute(item["url"])}"/>',
+            f"    <published>{item['date_published']}</published>",
+            f"    <updated>{item.get('date_modified', item['date_published'])}</updated>",
+        ]
+        lines += [
+            f"    <author><name>{escape(author['name'])}</name></author>"
+            for author in item["authors"]
+        ]
+        lines += [
+            f'    <category term="{escape_attribute(tag)}"/>' for tag in item["tags"]
+        ]
+        if item.get("summary"):
+            lines.append(f"    <summary>{escape(item['summary'])}</summary>")
+        lines.append("  </entry>")
+    lines.append("</feed>")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def escape_attribute(value: str) -> str:
+    """Escape a value for a double quoted XML attribute."""
+    return escape(value, {'"': "&quot;"})
+
+
+def feed_names(
+    main_category: Optional[str], per_category: bool
+) -> List[Tuple[str, Optional[str]]]:
+    """Return the (name, category) of the feeds a post with this main category belongs to."""
+    names: List[Tuple[str, Optional[str]]] = [("all", None)]
+    if per_category and main_category:
+        names.append((f"category/{feed_slug(main_category)}", main_category))
+    return names
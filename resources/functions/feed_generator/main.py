@@ -0,0 +1,179 @@
+"""
+Feed generator Lambda module.
+
+Keeps a JSON Feed and an Atom document of the latest FEED_SIZE blog posts up
+to date from the NewAWSBlogFound and AWSBlogUpdated events on the event bus,
+and optionally one of each per main category. The events reach the function
+through a FIFO queue with a single message group, so one batch is applied at
+a time. A batch of events is turned into a patch of the head of every
+affected feed, from the posts as they are stored now, so a late event never
+takes a feed back in time. The table is only queried for the posts of the
+batch, and for a feed that does not exist yet.
+"""
+import cold_start  # pylint: disable=wrong-import-order
+
+import heapq
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+import blog_posts
+import feed
+import instrumentation
+import log
+import sinks
+from aws_clients import get_client
+
+CATEGORY_INDEX = "main_category_idx"
+
+table_name = os.environ.get("BLOGS_TABLE")
+feed_sink_url = os.environ.get("FEED_SINK", "feeds")
+feed_base_url = os.environ.get("FEED_BASE_URL", "")
+feed_size = int(os.environ.get("FEED_SIZE", "50"))
+per_category = os.environ.get("FEED_PER_CATEGORY", "false").lower() == "true"
+sink = None  # pylint: disable=invalid-name
+
+
+@cold_start.profiled
+@instrumentation.instrumented
+@log.logged()
+def lambda_handler(event, _context):
+    """Run the Lambda function for an SQS batch of events."""
+    changes = collect_changes(
+        [json.loads(record["body"]) for record in event["Records"]]
+    )
+    for name, change in sorted(changes.items()):
+        update_feed(name, change["category"], change["upserts"], change["removals"])
+
+
+def get_sink():
+    """Return the feed sink, created once per container."""
+    global sink  # pylint: disable=global-statement,invalid-name
+    if sink is None:
+        sink = sinks.from_url(feed_sink_url)
+    return sink
+
+
+def collect_changes(blog_events: List[dict]) -> Dict[str, dict]:
+    """
+    Group NewAWSBlogFound and AWSBlogUpdated events by the feeds they change.
+
+    A post is read from the table once per batch. A post that moved to
+    another main category is removed from the feed of its previous one.
+    Posts that no longer exist are skipped.
+    """
+    changes: Dict[str, dict] = {}
+
+    def change_for(name: str, category: Optional[str]) -> dict:
+        return changes.setdefault(
+            name, {"category": category, "upserts": [], "removals": []}
+        )
+
+    previous_categories: Dict[str, set] = {}
+    for blog_event in blog_events:
+        data = blog_event["detail"]["data"]
+        sort_key = data.get("sort_key") or data["blog_sort_key"]
+        previous = previous_categories.setdefault(sort_key, set())
+        if data.get("previous_main_category"):
+            previous.add(data["previous_main_category"])
+
+    for sort_key, previous in sorted(previous_categories.items()):
+        ddb_item = blog_posts.get_item(table_name, sort_key, ConsistentRead=True)
+        if ddb_item is None:
+            log.warning("No blog post %s, nothing to update", sort_key)
+            continue
+        new_item = feed.feed_item(ddb_item)
+        new_feeds = feed.feed_names(
+            feed.attribute(ddb_item, "main_category", "S"), per_category
+        )
+        for old_category in previous:
+            for name, category in feed.feed_names(old_category, per_category):
+                if (name, category) not in new_feeds:
+                    change_for(name, category)["removals"].append(new_item["id"])
+        for name, category in new_feeds:
+            change_for(name, category)["upserts"].append(new_item)
+    return changes
+
+
+def update_feed(
+    name: str, category: Optional[str], upserts: List[dict], removals: List[str]
+):
+    """Patch the head of one feed and write its documents when they changed."""
+    body = get_sink().read(f"{name}.json")
+    if body is None:
+        document = feed.new_feed(
+            feed_title(category), f"{feed_base_url}{name}.json", []
+        )
+        latest = [feed.feed_item(item) for item in latest_items(category)]
+        feed.patch_feed(document, latest, [], feed_size)
+    else:
+        document = json.loads(body)
+    # Feeds written before FEED_BASE_URL was set have a relative feed_url
+    feed_url = f"{feed_base_url}{name}.json"
+    moved = document["feed_url"] != feed_url
+    document["feed_url"] = feed_url
+
+    changed = feed.patch_feed(document, upserts, removals, feed_size)
+    if not changed and not moved and body is not None:
+        return
+    write_feed(name, document)
+
+
+def write_feed(name: str, document: dict):
+    """Write the JSON Feed and Atom documents of a feed."""
+    written = get_sink().write(
+        f"{name}.json", feed.render_json(document), "application/feed+json"
+    )
+    get_sink().write(
+        f"{name}.atom",
+        feed.render_atom(document, f"{feed_base_url}{name}.atom"),
+        "application/atom+xml",
+    )
+    if written:
+        log.info("Updated feed %s with %d items", name, len(document["items"]))
+
+
+def feed_title(category: Optional[str]) -> str:
+    """Return the title of a feed."""
+    return f"AWS Blogs: {category}" if category else "AWS Blogs"
+
+
+def latest_items(category: Optional[str]) -> List[dict]:
+    """Return the latest feed_size BlogPost items, for all posts or one main category."""
+    if category is None:
+        return blog_posts.latest(table_name, feed_size)
+
+    # The index has no sort key, so every item of the category is read and
+    # only the newest feed_size are kept while the pages come in.
+    return heapq.nlargest(
+        feed_size,
+        query_pages(
+            {
+                "TableName": table_name,
+                "IndexName": CATEGORY_INDEX,
+                "KeyConditionExpression": "main_category = :category",
+                "FilterExpression": "PK = :pk OR begins_with(PK, :prefix)",
+                "ExpressionAttributeValues": {
+                    ":category": {"S": category},
+                    ":pk": {"S": blog_posts.LEGACY_PARTITION},
+                    ":prefix": {"S": blog_posts.PARTITION_PREFIX},
+                },
+            }
+        ),
+        key=lambda item: item["SK"]["S"],
+    )
+
+
+def query_pages(params: dict, limit: Optional[int] = None) -> Iterator[dict]:
+    """Yield the items of a query, fetching the next page only when it is needed."""
+    returned = 0
+    while True:
+        response = get_client("dynamodb").query(**params)
+        for item in response["Items"]:
+            if limit is not None and returned >= limit:
+                return
+            returned += 1
+            yield item
+        if "LastEvaluatedKey" not in response:
+            return
+        params = dict(params, ExclusiveStartKey=response["LastEvaluatedKey"])
@@ -0,0 +1,110 @@
+"""
+Places the feed documents are written to.
+
+A sink stores named documents. Every document is identified by the MD5 of
+its body, which is also the ETag S3 gives a single part upload, so unchanged
+documents are never written and an S3 sink can revalidate its cached copy
+with a conditional GET instead of downloading it again.
+"""
+import base64
+import hashlib
+import os
+from typing import Dict, Optional, Tuple
+
+from aws_clients import get_client
+
+CACHE_CONTROL = "public, max-age=60"
+
+
+def content_hash(body: bytes) -> str:
+    """Return the hex MD5 of a document, the ETag of a single part S3 object."""
+    return hashlib.md5(body).hexdigest()
+
+
+class FileSink:
+    """Write documents to a local directory."""
+
+    def __init__(self, directory: str):
+        """Write below `directory`."""
+        self.directory = directory
+
+    def read(self, name: str) -> Optional[bytes]:
+        """Return a document, or None when it does not exist."""
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as document:
+            return document.read()
+
+    def write(self, name: str, body: bytes, _content_type: str) -> bool:
+        """Write a document when its content changed, return whether it was written."""
+        existing = self.read(name)
+        if existing is not None and content_hash(existing) == content_hash(body):
+            return False
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "wb") as document:
+            document.write(body)
+        os.replace(f"{path}.tmp", path)
+        return True
+
+
+class S3Sink:
+    """Write documents to an S3 bucket, caching what was read or written per container."""
+
+    def __init__(self, bucket: str, prefix: str = ""):
+        """Write below `prefix` in `bucket`."""
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._cache: Dict[str, Tuple[str, bytes]] = {}  # name -> (ETag, body)
+
+    def _key(self, name: str) -> str:
+        """Return the object key of a document."""
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def read(self, name: str) -> Optional[bytes]:
+        """Return a document, or None when it does not exist."""
+        # pylint: disable-next=import-outside-toplevel
+        from botocore.exceptions import ClientError
+
+        params = {"Bucket": self.bucket, "Key": self._key(name)}
+        cached = self._cache.get(name)
+        if cached:
+            params["IfNoneMatch"] = f'"{cached[0]}"'
+        try:
+            response = get_client("s3").get_object(**params)
+        except ClientError as exc:
+            code = exc.response["Error"]["Code"]
+            if code == "304":
+                return cached[1]
+            if code in ("NoSuchKey", "404"):
+                return None
+            raise exc
+        body = response["Body"].read()
+        self._cache[name] = (response["ETag"].strip('"'), body)
+        return body
+
+    def write(self, name: str, body: bytes, content_type: str) -> bool:
+        """Write a document when its content changed, return whether it was written."""
+        etag = content_hash(body)
+        cached = self._cache.get(name)
+        if cached and cached[0] == etag:
+            return False
+        get_client("s3").put_object(
+            Bucket=self.bucket,
+            Key=self._key(name),
+            Body=body,
+            ContentType=content_type,
+            ContentMD5=base64.b64encode(hashlib.md5(body).digest()).decode(),
+            CacheControl=CACHE_CONTROL,
+        )
+        self._cache[name] = (etag, body)
+        return True
+
+
+def from_url(url: str):
+    """Return the sink for s3://bucket/prefix or a local directory."""
+    if url.startswith("s3://"):
+        bucket, _, prefix = url.replace("s3://", "", 1).partition("/")
+        return S3Sink(bucket, prefix)
+    return FileSink(url)
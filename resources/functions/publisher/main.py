@@ -0,0 +1,54 @@
+"""
+Publisher Lambda module.
+
+Publishes new blog posts to every platform. Posts arrive as NewAWSBlogFound
+events, or as sort keys sent to the TwitterPostQueue by hand or from its
+DLQ. Either way the post is read from DynamoDB once, with the state of every
+platform, and dispatched to the platform adapters concurrently, see the
+publisher module. Adding a platform means adding an adapter to ADAPTERS.
+"""
+import cold_start  # pylint: disable=wrong-import-order
+
+import os
+from typing import Optional
+
+import blog_posts
+import instrumentation
+import log
+import mastodon_adapter
+import publisher
+import twitter_adapter
+
+table_name = os.environ.get("BLOGS_TABLE")
+
+# Created once per container, so clients and rate limits carry over between invocations
+ADAPTERS = [twitter_adapter.TwitterAdapter(), *mastodon_adapter.adapters()]
+
+
+@cold_start.profiled
+@instrumentation.instrumented
+@log.logged(log.event_sort_key)
+def lambda_handler(event, _context):
+    """Run the Lambda function for a NewAWSBlogFound event or an SQS batch of sort keys."""
+    if "Records" not in event:
+        publish(
+            event["detail"]["data"]["sort_key"], event["detail"]["metadata"]["event_id"]
+        )
+        return
+    for record in event["Records"]:
+        with log.context(sort_key=record["body"]):
+            publish(record["body"], record["messageId"])
+
+
+def publish(sort_key: str, delivery_id: str) -> None:
+    """Load a blog post and publish it on the platforms it is missing from."""
+    ddb_item = get_ddb_item(sort_key)
+    if ddb_item is None:
+        log.warning("No blog post %s, nothing to publish", sort_key)
+        return
+    publisher.dispatch(ddb_item, ADAPTERS, delivery_id)
+
+
+def get_ddb_item(sort_key: str) -> Optional[dict]:
+    """Get a blog post by its sort key, or None when it does not exist."""
+    return blog_posts.get_item(table_name, sort_key, ConsistentRead=True)
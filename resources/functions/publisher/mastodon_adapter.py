@@ -0,0 +1,227 @@
+"""
+Mastodon adapter of the publisher.
+
+Every account in MASTODON_TARGETS is an adapter of its own, with its own
+rate limit and categories, and records its status on the blog post item as
+toot_id_<name>. The first account that posts a blog also stores the time as
+tooted_at. The idempotency key of a status is the sort key of the post, so
+the instance does not post it twice when recording the status failed.
+"""
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List
+
+import instrumentation
+import latency
+import log
+import media
+import publisher
+from aws_clients import get_client
+
+if TYPE_CHECKING:
+    import requests
+    from mastodon import Mastodon
+
+
+# Set the name of the parameter to retrieve
+SSM_PARAMETER_NAME = "mastodon_awsblogs_access_token"
+MASTODON_API_BASE_URL = os.environ.get(
+    "MASTODON_API_BASE_URL", "https://awscommunity.social/"
+)
+# The accounts to post to, a JSON list of objects with a name, api_base_url
+# and ssm_parameter holding the access token, and optionally the categories
+# (main_category) to post, max_post_len and posts_per_minute. Without it,
+# every post goes to the account in SSM_PARAMETER_NAME on MASTODON_API_BASE_URL.
+MASTODON_TARGETS = json.loads(os.environ.get("MASTODON_TARGETS", "[]")) or [
+    {
+        "name": "default",
+        "api_base_url": MASTODON_API_BASE_URL,
+        "ssm_parameter": SSM_PARAMETER_NAME,
+    }
+]
+REQUEST_TIMEOUT = 10  # seconds, per request to an instance
+table_name = os.environ.get("BLOGS_TABLE")
+posts_per_minute = float(os.environ.get("MASTODON_POSTS_PER_MINUTE", "30"))
+POSTS_BURST = 5
+
+# HTTP sessions per instance, for the container lifetime
+SESSIONS: Dict[str, "requests.Session"] = {}
+_sessions_lock = threading.Lock()
+
+MAX_POST_LEN = 500  # max length of a Mastodon Post
+# The image size limit of the instance, see configuration.media_attachments in /api/v2/instance
+MAX_IMAGE_BYTES = int(os.environ.get("MASTODON_MAX_IMAGE_BYTES", 8 * 1024 * 1024))
+MAX_PROCESSING_WAIT = 10  # seconds
+PROCESSING_POLL_INTERVAL = 0.5  # seconds
+
+
+class MastodonAdapter(publisher.Adapter):
+    """Posts blog posts to one Mastodon account."""
+
+    def __init__(self, target: dict):
+        """Create the adapter of an account, its client is created on first use."""
+        super().__init__(target.get("posts_per_minute", posts_per_minute), POSTS_BURST)
+        self.target = target
+        self.name = f"mastodon-{target['name']}"
+        self.published_attribute = f"toot_id_{target['name']}"
+        self._mastodon = None
+
+    def accepts(self, ddb_item: dict) -> bool:
+        """Return whether the account posts blogs in the main category of the post."""
+        return (
+            "categories" not in self.target
+            or ddb_item["main_category"].get("S") in self.target["categories"]
+        )
+
+    def is_published(self, ddb_item: dict) -> bool:
+        """Return whether the account posted the blog already."""
+        # Posts stored before the stage times were recorded were tooted from
+        # their event, the statuses of those were not recorded. Every writer of
+        # BlogPost items records stored_at since, the backfill tool included.
+        return (
+            self.published_attribute in ddb_item
+            or latency.attribute("stored") not in ddb_item
+        )
+
+    def publish(self, ddb_item: dict, _delivery_id: str) -> None:
+        """Post a blog to the account and record its status."""
+        post_text = prepare_mastodon_text(
+            ddb_item, self.target.get("max_post_len", MAX_POST_LEN)
+        )
+        mastodon = self.mastodon()
+        media_ids = upload_featured_image(
+            ddb_item, mastodon, self.target.get("max_image_bytes", MAX_IMAGE_BYTES)
+        )
+        with instrumentation.track("mastodon", "StatusPost"):
+            status = mastodon.status_post(
+                post_text,
+                media_ids=media_ids,
+                idempotency_key=ddb_item["SK"]["S"],
+            )
+        log.info("Posted to %s: %s", self.target["name"], status.get("url"))
+        log.debug("Mastodon status of %s", self.target["name"], status=status)
+        self.record_status(ddb_item, status)
+
+    def record_status(self, ddb_item: dict, status: dict) -> None:
+        """Store the status ID on the item, and the time when it is the first toot of the post."""
+        tooted_at = latency.now()
+        response = get_client("dynamodb").update_item(
+            TableName=table_name,
+            Key={"PK": ddb_item["PK"], "SK": ddb_item["SK"]},
+            UpdateExpression=(
+                "SET #status_id = :status_id, "
+                "tooted_at = if_not_exists(tooted_at, :tooted_at)"
+            ),
+            ConditionExpression="attribute_exists(PK)",
+            ExpressionAttributeNames={"#status_id": self.published_attribute},
+            ExpressionAttributeValues={
+                ":status_id": {"S": str(status["id"])},
+                ":tooted_at": {"S": tooted_at},
+            },
+            ReturnValues="UPDATED_OLD",
+        )
+        if "tooted_at" not in response.get("Attributes", {}):
+            latency.record(
+                "tooted", publisher.item_string(ddb_item, "date_created"), tooted_at
+            )
+
+    def mastodon(self) -> "Mastodon":
+        """Return the client of the account, created once per container."""
+        if self._mastodon is None:
+            self._mastodon = get_mastodon(self.target)
+        return self._mastodon
+
+
+def adapters() -> List[MastodonAdapter]:
+    """Return an adapter for every account in MASTODON_TARGETS."""
+    return [MastodonAdapter(target) for target in MASTODON_TARGETS]
+
+
+def upload_featured_image(ddb_item: dict, mastodon, max_bytes: int = MAX_IMAGE_BYTES):
+    """Upload the featured image of the blog post, return the media IDs to attach."""
+    image = media.image_for_post(
+        publisher.item_string(ddb_item, "featured_image_url", None), max_bytes
+    )
+    if image is None:
+        return None
+    try:
+        # Mastodon has no chunked upload, the whole file is sent from the cache
+        with instrumentation.track("mastodon", "MediaPost"):
+            attachment = mastodon.media_post(
+                image.path,
+                mime_type=image.mime_type,
+                description=ddb_item["title"]["S"],
+            )
+        wait_for_processing(attachment, mastodon)
+    except Exception as exc:  # pylint: disable=broad-except
+        log.warning("Uploading %s failed, posting without image: %r", image.path, exc)
+        return None
+    return [attachment["id"]]
+
+
+def wait_for_processing(attachment, mastodon):
+    """
+    Wait until the instance has processed an attachment, it cannot be posted before.
+
+    Small images are usually processed during the upload. Mastodon.py's own
+    synchronous mode checks the instance version and sleeps five seconds per
+    poll, so the polling is done here instead.
+    """
+    deadline = time.monotonic() + MAX_PROCESSING_WAIT
+    while attachment.get("url") is None:
+        if time.monotonic() > deadline:
+            raise Exception(f"Attachment {attachment['id']} is still processing")
+        time.sleep(PROCESSING_POLL_INTERVAL)
+        with instrumentation.track("mastodon", "Media"):
+            attachment = mastodon.media(attachment["id"])
+
+
+def get_mastodon(target: dict):
+    """Create the Mastodon client of an account."""
+    from mastodon import Mastodon  # pylint: disable=import-outside-toplevel
+
+    # Use the get_parameter() function to retrieve the parameter
+    parameter_response = get_client("ssm").get_parameter(
+        Name=target["ssm_parameter"], WithDecryption=True
+    )
+
+    # Extract the value of the parameter from the response
+    access_token = parameter_response["Parameter"]["Value"]
+    # The client retrieves the instance version on creation. A rate
+    # limited account fails instead of waiting, the others go ahead.
+    with instrumentation.track("mastodon", "Instance"):
+        return Mastodon(
+            api_base_url=target["api_base_url"],
+            access_token=access_token,
+            request_timeout=REQUEST_TIMEOUT,
+            ratelimit_method="throw",
+            session=get_session(target["api_base_url"]),
+        )
+
+
+def get_session(api_base_url: str):
+    """Return the HTTP session of an instance, shared by the accounts on the instance."""
+    with _sessions_lock:
+        if api_base_url not in SESSIONS:
+            import requests  # pylint: disable=import-outside-toplevel
+
+            SESSIONS[api_base_url] = requests.Session()
+        return SESSIONS[api_base_url]
+
+
+def prepare_mastodon_text(ddb_item: dict, max_post_len: int = MAX_POST_LEN):
+    """Prepare the text to send, based on the blog post."""
+    main_category = ddb_item["main_category"]["S"]
+    title = ddb_item["title"]["S"]
+    blog_url = ddb_item["blog_url"]["S"]
+    authors = publisher.format_authors(ddb_item["authors"]["SS"])
+
+    base = f"New {main_category} post by {authors}:\n\n{title}\n\n"
+    # The excerpt gets the room that is left next to the URL, which has 2 new lines before it
+    post_excerpt = publisher.shorten(
+        publisher.item_string(ddb_item, "post_excerpt"),
+        max_post_len - len(base) - len(blog_url) - 2,
+    )
+    return f"{base}{post_excerpt}\n\n{blog_url}"
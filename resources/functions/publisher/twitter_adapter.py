@@ -0,0 +1,387 @@
+"""
+Twitter adapter of the publisher.
+
+Tweets a blog post with its featured image. A conditional write claims the
+post for the delivery that asked for it before it is tweeted, so concurrent
+deliveries of a post do not both tweet it. A delivery that fails before the
+tweet is sent releases its claim, and a claim that is older than
+CLAIM_TIMEOUT can be taken over, so a redrive of the post tweets it. Posts in
+DIGEST_CATEGORIES are left to the Digest Poster instead.
+
+The excerpt thread below the tweet is posted by the Excerpt Poster after a
+delay on the TwitterThreadQueue, or, with COMBINED_THREAD, right away with
+the item and Twitter client at hand.
+"""
+import json
+import os
+import time
+from typing import TYPE_CHECKING, List, Optional
+
+import excerpt_thread
+import instrumentation
+import latency
+import log
+import media
+import publisher
+from aws_clients import get_client
+
+if TYPE_CHECKING:
+    from TwitterAPI import TwitterAPI
+
+MAX_IMAGE_BYTES = 5 * 1024 * 1024  # Twitter's limit for images
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_PROCESSING_WAIT = 10  # seconds
+URL_LENGTH = 23  # Twitter shortens every URL to this length
+CLAIM_TIMEOUT = 300  # seconds, well over the timeout of the function
+
+table_name = os.environ.get("BLOGS_TABLE")
+queue_url = os.environ.get("TWITTER_THREAD_QUEUE")
+digest_categories = json.loads(os.environ.get("DIGEST_CATEGORIES", "[]"))
+combined_thread = os.environ.get("COMBINED_THREAD", "false").lower() == "true"
+posts_per_minute = float(os.environ.get("TWITTER_POSTS_PER_MINUTE", "10"))
+
+
+class TwitterAdapter(publisher.Adapter):
+    """Tweets blog posts, or leaves them to the digest, and records the tweet_id."""
+
+    name = "twitter"
+    published_attribute = "tweet_id"
+
+    def __init__(self):
+        """Create the adapter, the Twitter client is created on first use."""
+        super().__init__(posts_per_minute)
+        self._twitter_api = None
+
+    def is_published(self, ddb_item: dict) -> bool:
+        """Return whether the post was tweeted with its thread, or left to the digest."""
+        if "digest_pending" in ddb_item or "digest_tweet_id" in ddb_item:
+            return True
+        if "tweet_id" not in ddb_item:
+            return False
+        # A previous attempt may have tweeted without finishing the thread
+        return not combined_thread or excerpt_thread.is_complete(ddb_item)
+
+    def publish(self, ddb_item: dict, delivery_id: str) -> None:
+        """Tweet a blog post, finish its thread, or mark it for the digest."""
+        if "tweet_id" in ddb_item:
+            post_excerpt_thread(ddb_item, self.twitter_api())
+            return
+        if ddb_item["main_category"].get("S") in digest_categories:
+            mark_for_digest(ddb_item)
+            return
+        # The client is created before the claim, a failure here leaves no claim behind
+        twitter_api = self.twitter_api()
+        if not claim_blog_post(ddb_item, delivery_id):
+            log.info(
+                "%s was tweeted or claimed by another delivery", ddb_item["SK"]["S"]
+            )
+            return
+        tweet_blog_post(ddb_item, twitter_api, delivery_id)
+
+    def twitter_api(self) -> "TwitterAPI":
+        """Return the Twitter client, created once per container."""
+        if self._twitter_api is None:
+            self._twitter_api = get_twitter_api()
+        return self._twitter_api
+
+
+def get_twitter_api():
+    """Retrieve the Twitter Consumer key & secret from AWS Secrets Manager."""
+    from TwitterAPI import TwitterAPI  # pylint: disable=import-outside-toplevel
+
+    get_secret_value_response = get_client("secretsmanager").get_secret_value(
+        SecretId=os.environ.get("TWITTER_SECRET")
+    )
+    secret_dict = json.loads(get_secret_value_response["SecretString"])
+
+    return TwitterAPI(
+        secret_dict["consumer_key"],
+        secret_dict["consumer_secret"],
+        secret_dict["access_token_key"],
+        secret_dict["access_token_secret"],
+    )
+
+
+def send_sort_key_to_tweet_thread_sqs(sort_key: str):
+    """Send the URL to SQS for further processing."""
+    get_client("sqs").send_message(
+        QueueUrl=queue_url,
+        MessageBody=sort_key,
+        MessageGroupId=sort_key,
+        MessageDeduplicationId=sort_key,
+    )
+
+
+def claim_blog_post(ddb_item: dict, delivery_id: str) -> bool:
+    """
+    Claim a blog post for the delivery that asked for it, return whether that succeeded.
+
+    The claim fails when the post has a tweet or is claimed by another
+    delivery. A retry of the same delivery keeps its claim, and a claim that
+    expired, or that was made before claims expired, is taken over.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from botocore.exceptions import ClientError
+
+    now = int(time.time())
+    try:
+        get_client("dynamodb").update_item(
+            TableName=table_name,
+            Key={"PK": ddb_item["PK"], "SK": ddb_item["SK"]},
+            UpdateExpression="SET tweet_claim = :delivery_id, tweet_claim_expires = :expires",
+            ConditionExpression=(
+                "attribute_exists(PK) AND attribute_not_exists(tweet_id) "
+                "AND (attribute_not_exists(tweet_claim) OR tweet_claim = :delivery_id "
+                "OR attribute_not_exists(tweet_claim_expires) OR tweet_claim_expires < :now)"
+            ),
+            ExpressionAttributeValues={
+                ":delivery_id": {"S": delivery_id},
+                ":expires": {"N": str(now + CLAIM_TIMEOUT)},
+                ":now": {"N": str(now)},
+            },
+        )
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        return False
+    return True
+
+
+def release_claim(ddb_item: dict, delivery_id: str) -> None:
+    """Release the claim of a delivery on a post it did not tweet, so another one can."""
+    # pylint: disable-next=import-outside-toplevel
+    from botocore.exceptions import ClientError
+
+    try:
+        get_client("dynamodb").update_item(
+            TableName=table_name,
+            Key={"PK": ddb_item["PK"], "SK": ddb_item["SK"]},
+            UpdateExpression="REMOVE tweet_claim, tweet_claim_expires",
+            ConditionExpression="tweet_claim = :delivery_id AND attribute_not_exists(tweet_id)",
+            ExpressionAttributeValues={":delivery_id": {"S": delivery_id}},
+        )
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+
+
+def tweet_blog_post(ddb_item: dict, twitter_api: "TwitterAPI", delivery_id: str):
+    """
+    Tweet a blog post, then post or queue its excerpt thread.
+
+    When the tweet is not sent the claim is released. Once it is sent the
+    claim is kept until the tweet ID is recorded, a failure in between is
+    left to the claim to expire rather than risk a second tweet right away.
+    """
+    sort_key = ddb_item["SK"]["S"]
+    try:
+        twitter_text = prepare_twitter_text(ddb_item)
+        media_id = upload_featured_image(ddb_item, twitter_api)
+        tweet_response = send_tweet(twitter_text, twitter_api, media_id)
+    except Exception:
+        release_claim(ddb_item, delivery_id)
+        raise
+    update_ddb_item_with_tweet_id(ddb_item, tweet_response)
+    if combined_thread:
+        ddb_item["tweet_id"] = {"S": tweet_response["id_str"]}
+        post_excerpt_thread(ddb_item, twitter_api)
+    else:
+        send_sort_key_to_tweet_thread_sqs(sort_key)
+
+
+def post_excerpt_thread(ddb_item: dict, twitter_api: "TwitterAPI") -> None:
+    """Post the excerpt thread below the tweet of a blog post, if it has an excerpt."""
+    if not excerpt_thread.post_thread(ddb_item, twitter_api, table_name):
+        log.info("No excerpt to post for %s", ddb_item["blog_url"]["S"])
+
+
+def mark_for_digest(ddb_item: dict) -> None:
+    """Leave a post in a digest category to the digest poster, unless it was posted already."""
+    # pylint: disable-next=import-outside-toplevel
+    from botocore.exceptions import ClientError
+
+    sort_key = ddb_item["SK"]["S"]
+    try:
+        get_client("dynamodb").update_item(
+            TableName=table_name,
+            Key={"PK": ddb_item["PK"], "SK": ddb_item["SK"]},
+            # The category puts the post on the sparse index of the digest poster
+            UpdateExpression="SET digest_pending = :category",
+            ConditionExpression="attribute_exists(PK) AND attribute_not_exists(tweet_id)",
+            ExpressionAttributeValues={":category": ddb_item["main_category"]},
+        )
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        log.info("%s was already posted in a digest", sort_key)
+        return
+    log.info("Left %s to the digest", sort_key)
+
+
+def update_ddb_item_with_tweet_id(ddb_item: dict, tweet_response: dict) -> None:
+    """
+    Update the item in DDB with the tweet ID and time and release its claim.
+
+    The write fails when the item has a tweet ID already, so a tweet that
+    was sent twice never replaces the one the thread and digest refer to.
+    """
+    tweet_id = tweet_response["id_str"]
+    tweeted_at = latency.now()
+    get_client("dynamodb").update_item(
+        TableName=table_name,
+        Key={"PK": ddb_item["PK"], "SK": ddb_item["SK"]},
+        UpdateExpression=(
+            "SET tweet_id = :tweet_id, tweeted_at = :tweeted_at "
+            "REMOVE tweet_claim, tweet_claim_expires"
+        ),
+        ConditionExpression="attribute_not_exists(tweet_id)",
+        ExpressionAttributeValues={
+            ":tweet_id": {"S": tweet_id},
+            ":tweeted_at": {"S": tweeted_at},
+        },
+    )
+    latency.record("tweeted", ddb_item.get("date_created", {}).get("S"), tweeted_at)
+
+
+def send_tweet(
+    twitter_text: str, twitter_api: "TwitterAPI", media_id: Optional[str] = None
+):
+    """Use the Twitter API to send a tweet, optionally with an uploaded image."""
+    params = {"status": twitter_text}
+    if media_id:
+        params["media_ids"] = media_id
+    with instrumentation.track("twitter", "StatusesUpdate") as call:
+        response = twitter_api.request("statuses/update", params)
+        call.status(response.status_code)
+    body = response.json()
+    if response.status_code != 200:
+        error_strs = [f'{x["code"]}: {x["message"]}' for x in body["errors"]]
+        errors = f'[{", ".join(error_strs)}]'
+        raise Exception(
+            f"Post Status failed with status code {response.status_code}. "
+            f"Errors: {errors}"
+        )
+    return body
+
+
+def upload_featured_image(ddb_item: dict, twitter_api: "TwitterAPI") -> Optional[str]:
+    """
+    Upload the featured image of a blog post, return its media ID.
+
+    The tweet is more important than its image: when the image cannot be
+    downloaded or uploaded, the post is tweeted without it.
+    """
+    image = media.image_for_post(
+        ddb_item.get("featured_image_url", {}).get("S"), MAX_IMAGE_BYTES
+    )
+    if image is None:
+        return None
+    try:
+        return upload_media(image, twitter_api)
+    except Exception as exc:  # pylint: disable=broad-except
+        log.warning("Uploading %s failed, tweeting without image: %r", image.path, exc)
+        return None
+
+
+def upload_media(image: media.MediaFile, twitter_api: "TwitterAPI") -> str:
+    """Upload an image with the chunked INIT / APPEND / FINALIZE media upload."""
+    body = media_upload_request(
+        twitter_api,
+        "Init",
+        {"command": "INIT", "media_type": image.mime_type, "total_bytes": image.size},
+    )
+    media_id = body["media_id_string"]
+
+    with open(image.path, "rb") as image_file:
+        segment = 0
+        while chunk := image_file.read(UPLOAD_CHUNK_SIZE):
+            media_upload_request(
+                twitter_api,
+                "Append",
+                {"command": "APPEND", "media_id": media_id, "segment_index": segment},
+                files={"media": chunk},
+            )
+            segment += 1
+
+    body = media_upload_request(
+        twitter_api, "Finalize", {"command": "FINALIZE", "media_id": media_id}
+    )
+    deadline = time.monotonic() + MAX_PROCESSING_WAIT
+    while body.get("processing_info", {}).get("state") in ("pending", "in_progress"):
+        if time.monotonic() > deadline:
+            raise Exception(f"Media {media_id} is still processing")
+        time.sleep(body["processing_info"].get("check_after_secs", 1))
+        body = media_upload_request(
+            twitter_api, "Status", {"command": "STATUS", "media_id": media_id}
+        )
+    if body.get("processing_info", {}).get("state") == "failed":
+        raise Exception(
+            f"Processing media {media_id} failed: {body['processing_info']}"
+        )
+    return media_id
+
+
+def media_upload_request(
+    twitter_api: "TwitterAPI", operation: str, params: dict, files=None
+) -> dict:
+    """Send one media/upload command, return its (possibly empty) JSON body."""
+    with instrumentation.track("twitter", f"MediaUpload{operation}") as call:
+        if operation == "Status":
+            response = twitter_api.request(
+                "media/upload", params, method_override="GET"
+            )
+        else:
+            response = twitter_api.request("media/upload", params, files)
+        call.status(response.status_code)
+    if response.status_code >= 300:
+        raise Exception(
+            f"Media upload {operation} failed with status code "
+            f"{response.status_code}: {response.text}"
+        )
+    return response.json() if response.text else {}
+
+
+def prepare_twitter_text(ddb_item):
+    """Prepare the text to send, based on content from DDB."""
+    main_category = ddb_item["main_category"]["S"]
+    blog_url = ddb_item["blog_url"]["S"]
+    authors = prepare_authors(ddb_item["authors"]["SS"])
+
+    base = f"New {main_category} post by {authors}:\n\n"
+    # The title gets the room that is left next to the URL on its own line
+    title = publisher.shorten(
+        ddb_item["title"]["S"],
+        excerpt_thread.MAX_TWEET_LENGTH - len(base) - 1 - URL_LENGTH,
+    )
+    if title != ddb_item["title"]["S"]:
+        log.info("Shortened title: %s", title)
+
+    return f"{base}{title}\n{blog_url}"
+
+
+def prepare_authors(authors: List[str]):
+    """Take a list of authors, convert them to twitter handles, add commas."""
+    mapped_authors = []
+    for author in authors:
+        mapped_author = author  # Default to the provided name
+
+        # Fetch the author from DDB
+        ddb_result = get_client("dynamodb").get_item(
+            TableName=table_name,
+            Key={"PK": {"S": "Author"}, "SK": {"S": author}},
+            ConsistentRead=True,
+        )
+        if "Item" in ddb_result:
+            ddb_author = ddb_result["Item"]
+            if "twitter_handle" in ddb_author:
+                # If the field 'twitter_handle' is set, check if it
+                # starts with an @. Add it if it doesn't, then return
+                # the twitter handle.
+                twitter_handle = ddb_author["twitter_handle"]["S"]
+                if twitter_handle.startswith("@"):
+                    mapped_author = twitter_handle
+                else:
+                    mapped_author = f"@{twitter_handle}"
+        mapped_authors.append(mapped_author)
+
+    return publisher.format_authors(mapped_authors)
@@ -0,0 +1,179 @@
+"""
+Archive of old BlogPost items.
+
+The archiver function rolls the posts of old months into archive segments:
+items of the BlogPostArchive partition that hold the posts of one month as
+gzip-compressed JSON lines in DynamoDB JSON. A month that does not fit in
+MAX_SEGMENT_BYTES is split over several segments.
+
+A segment is keyed by the sort key of its first post and records the last
+one, so the segment keys are a small index of the archive: the segment that
+can hold a post is the last one that starts at or before its sort key. The
+index is read without the posts, and a lookup reads a single segment.
+
+get_item() and query() read the hot BlogPost items first and fall back to
+the archive, for lookups of posts of any age. The hot path of the functions
+only needs recent posts and reads blog_posts directly.
+"""
+import gzip
+import heapq
+import json
+from typing import Iterator, List, Optional
+
+import blog_posts
+from aws_clients import get_client
+
+ARCHIVE_PARTITION = "BlogPostArchive"
+# Compressed posts per segment, an item is limited to 400 KB
+MAX_SEGMENT_BYTES = 300 * 1024
+INDEX_ATTRIBUTES = "SK, last_sort_key, post_count"
+
+
+def encode(items: List[dict]) -> bytes:
+    """Compress items in DynamoDB JSON to gzip-compressed JSON lines."""
+    lines = "\n".join(
+        json.dumps(item, sort_keys=True, separators=(",", ":")) for item in items
+    )
+    return gzip.compress(lines.encode())
+
+
+def decode(data: bytes) -> List[dict]:
+    """Decompress the items of a segment."""
+    return [json.loads(line) for line in gzip.decompress(data).decode().splitlines()]
+
+
+def pack(items: List[dict]) -> List[dict]:
+    """Pack posts sorted by sort key into segment items, halving them until every segment fits."""
+    data = encode(items)
+    if len(data) <= MAX_SEGMENT_BYTES or len(items) == 1:
+        return [
+            {
+                "PK": {"S": ARCHIVE_PARTITION},
+                "SK": items[0]["SK"],
+                "last_sort_key": items[-1]["SK"],
+                "post_count": {"N": str(len(items))},
+                "posts": {"B": data},
+            }
+        ]
+    middle = len(items) // 2
+    return pack(items[:middle]) + pack(items[middle:])
+
+
+def segments(
+    table_name: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    with_posts: bool = False,
+) -> Iterator[dict]:
+    """
+    Yield the segments that can hold posts created from `since` to `until`, in sort key order.
+
+    Both bounds are inclusive dates or sort keys. Without with_posts only the
+    index attributes of the segments are read.
+    """
+    params = {"TableName": table_name}
+    if not with_posts:
+        params["ProjectionExpression"] = INDEX_ATTRIBUTES
+    if since is not None:
+        # The segment that starts before `since` can end after it
+        for segment in _query(
+            dict(params, Limit=1, ScanIndexForward=False), "SK < :since", since=since
+        ):
+            if segment["last_sort_key"]["S"] >= since:
+                yield segment
+            break
+    conditions = {
+        (True, True): "SK BETWEEN :since AND :until",
+        (True, False): "SK >= :since",
+        (False, True): "SK <= :until",
+        (False, False): None,
+    }
+    yield from _query(
+        params,
+        conditions[(since is not None, until is not None)],
+        since=since,
+        until=until,
+    )
+
+
+def get_archived(table_name: str, sort_key: str) -> Optional[dict]:
+    """Get a BlogPost from the archive by its sort key, or None when it is not archived."""
+    for segment in _query(
+        {"TableName": table_name, "Limit": 1, "ScanIndexForward": False},
+        "SK <= :until",
+        until=sort_key,
+    ):
+        if segment["last_sort_key"]["S"] < sort_key:
+            return None
+        return next(
+            (
+                item
+                for item in decode(segment["posts"]["B"])
+                if item["SK"]["S"] == sort_key
+            ),
+            None,
+        )
+    return None
+
+
+def get_item(table_name: str, sort_key: str, **params) -> Optional[dict]:
+    """Get a BlogPost from the table or else the archive, or None when it does not exist."""
+    item = blog_posts.get_item(table_name, sort_key, **params)
+    return item or get_archived(table_name, sort_key)
+
+
+def query(
+    table_name: str, since: Optional[str] = None, until: Optional[str] = None, **params
+) -> Iterator[dict]:
+    """
+    Yield the BlogPosts created from `since` to `until` in sort key order.
+
+    The posts are read from the table and the archive. Both bounds are
+    inclusive dates or sort keys, params are added to the queries of the
+    table. A post that is in both is returned once, from the table.
+    Archived posts are returned with all their attributes. The posts are
+    returned oldest first only, ScanIndexForward=False is rejected.
+    """
+    if not params.get("ScanIndexForward", True):
+        raise ValueError("The archive is only queried oldest first")
+    archived = (
+        item
+        for segment in segments(table_name, since, until, with_posts=True)
+        for item in decode(segment["posts"]["B"])
+        if (since is None or item["SK"]["S"] >= since)
+        and (until is None or item["SK"]["S"] <= until)
+    )
+    previous = None
+    # On equal sort keys the items of the table come first
+    for item in heapq.merge(
+        blog_posts.query(table_name, since, until, **params), archived, key=_sort_key
+    ):
+        if _sort_key(item) != previous:
+            yield item
+        previous = _sort_key(item)
+
+
+def _query(
+    params: dict, condition: Optional[str], **bounds: Optional[str]
+) -> Iterator[dict]:
+    """Yield the segments of a query of the archive partition, one page at a time."""
+    params = dict(
+        params,
+        KeyConditionExpression="PK = :pk" + (f" AND {condition}" if condition else ""),
+        ExpressionAttributeValues={":pk": {"S": ARCHIVE_PARTITION}},
+    )
+    for name, value in bounds.items():
+        if value is not None:
+            params["ExpressionAttributeValues"][f":{name}"] = {"S": value}
+    while True:
+        response = get_client("dynamodb").query(**params)
+        yield from response["Items"]
+        # A query with a Limit only wants its first page
+        if "LastEvaluatedKey" not in response or "Limit" in params:
+            return
+        params = dict(params, ExclusiveStartKey=response["LastEvaluatedKey"])
+
+
+def _sort_key(item: dict) -> str:
+    """Return the sort key of an item, to merge the table and the archive by."""
+    return item["SK"]["S"]
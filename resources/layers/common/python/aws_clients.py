@@ -0,0 +1,83 @@
+"""Shared boto3 client factory for the Lambda functions."""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict
+
+import log
+
+CLIENT_CONFIG = {
+    "connect_timeout": int(os.environ.get("BOTO_CONNECT_TIMEOUT", "2")),
+    "read_timeout": int(os.environ.get("BOTO_READ_TIMEOUT", "10")),
+    "max_pool_connections": int(os.environ.get("BOTO_MAX_POOL_CONNECTIONS", "25")),
+    "tcp_keepalive": True,
+    "retries": {"mode": "adaptive", "max_attempts": 5},
+}
+
+_lock = threading.Lock()
+_session = None  # pylint: disable=invalid-name
+_clients: Dict[str, Any] = {}
+construction_times: Dict[str, float] = {}
+
+
+def get_client(service_name: str) -> Any:
+    """
+    Return the boto3 client for a service, creating it on first use.
+
+    Clients are memoised per service for the lifetime of the container, so
+    every invocation after the first reuses the same connection pool.
+    """
+    client = _clients.get(service_name)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(service_name)
+        if client is None:
+            start = time.perf_counter()
+            client = _get_session().client(service_name, config=_get_config())
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            construction_times[service_name] = elapsed_ms
+            log.info("Constructed %s client in %.1f ms", service_name, elapsed_ms)
+            _clients[service_name] = client
+
+    return client
+
+
+def register_event_handler(event_name: str, handler: Callable) -> None:
+    """
+    Register a botocore event handler on every client, current and future.
+
+    Clients copy the event emitter of the session when they are created, so
+    the handler is added to the session and to the clients created so far.
+    """
+    with _lock:
+        _get_session().events.register(event_name, handler)
+        for client in _clients.values():
+            client.meta.events.register(event_name, handler)
+
+
+def reset_clients() -> None:
+    """Drop all memoised clients, for example after patching the environment."""
+    global _session  # pylint: disable=global-statement,invalid-name
+    with _lock:
+        _clients.clear()
+        construction_times.clear()
+        _session = None
+
+
+def _get_session() -> Any:
+    """Return the shared boto3 session. boto3 is only imported on first use."""
+    global _session  # pylint: disable=global-statement,invalid-name
+    if _session is None:
+        import boto3  # pylint: disable=import-outside-toplevel
+
+        _session = boto3.session.Session()
+    return _session
+
+
+def _get_config() -> Any:
+    """Build the botocore Config from CLIENT_CONFIG."""
+    from botocore.config import Config  # pylint: disable=import-outside-toplevel
+
+    return Config(**CLIENT_CONFIG)
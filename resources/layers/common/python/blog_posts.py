@@ -0,0 +1,249 @@
+"""
+Keys and queries of the BlogPost items.
+
+BlogPost items are partitioned by the month they were created in, like
+BlogPost#2026-11, so the writes and the growth of the table spread over
+partitions instead of all going to one. Sort keys start with the creation
+date, so the partition of a post follows from its sort key.
+
+Posts created before SHARDED_SINCE stay in the single BlogPost partition
+they were written to. Lookups fall back to that partition, and queries read
+it together with the month partitions, so posts the previous version of the
+fetcher stored after SHARDED_SINCE are found as well; writes to an existing
+post use the partition stored_partitions() finds. Queries over several
+partitions read their first pages in parallel and merge the items by sort
+key lazily, reading the later pages of a partition only when they are needed.
+"""
+import heapq
+import itertools
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from aws_clients import get_client
+
+LEGACY_PARTITION = "BlogPost"
+PARTITION_PREFIX = "BlogPost#"
+SHARDED_SINCE = "2026-11"  # the first month stored in month partitions
+FANOUT = 3  # month partitions queried at once for the latest posts
+MAX_WORKERS = 8  # partitions read at once by a query
+BATCH_GET_SIZE = 100  # DynamoDB limit
+MAX_RETRIES = 8
+
+
+def partition_key(sort_key: str) -> str:
+    """Return the partition key of the BlogPost with a sort key."""
+    month = sort_key[:7]
+    if month < SHARDED_SINCE:
+        return LEGACY_PARTITION
+    return f"{PARTITION_PREFIX}{month}"
+
+
+def key(sort_key: str, partition: Optional[str] = None) -> dict:
+    """Return the key of a BlogPost in DynamoDB JSON, in its own partition by default."""
+    return {"PK": {"S": partition or partition_key(sort_key)}, "SK": {"S": sort_key}}
+
+
+def is_blog_post(partition: str) -> bool:
+    """Return whether a partition key is one of the BlogPost partitions."""
+    return partition == LEGACY_PARTITION or partition.startswith(PARTITION_PREFIX)
+
+
+def partitions(since: Optional[str] = None, until: Optional[str] = None) -> List[str]:
+    """
+    Return the partitions that can hold the posts created from `since` to `until`, newest first.
+
+    The bounds are dates or sort keys, the range ends with the current month
+    by default. The legacy partition is always the last one.
+    """
+    first = max((since or "")[:7], SHARDED_SINCE)
+    last = (until or datetime.now(timezone.utc).strftime("%Y-%m"))[:7]
+    year, month = int(last[:4]), int(last[5:7])
+    months = []
+    while f"{year:04d}-{month:02d}" >= first:
+        months.append(f"{PARTITION_PREFIX}{year:04d}-{month:02d}")
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return months + [LEGACY_PARTITION]
+
+
+def get_item(table_name: str, sort_key: str, **params) -> Optional[dict]:
+    """Get a BlogPost by its sort key, or None when it does not exist."""
+    for partition in dict.fromkeys([partition_key(sort_key), LEGACY_PARTITION]):
+        response = get_client("dynamodb").get_item(
+            TableName=table_name, Key=key(sort_key, partition), **params
+        )
+        if "Item" in response:
+            return response["Item"]
+    return None
+
+
+def stored_partitions(table_name: str, sort_keys: Iterable[str]) -> Dict[str, str]:
+    """
+    Return the partition to write each BlogPost to, by sort key.
+
+    That is the legacy partition when the post is stored there, else its own.
+    Only a post of a month partition can be in the legacy partition, so only
+    those are looked up, BATCH_GET_SIZE at a time.
+    """
+    found = {sort_key: partition_key(sort_key) for sort_key in sort_keys}
+    candidates = sorted(
+        key for key, partition in found.items() if partition != LEGACY_PARTITION
+    )
+    for index in range(0, len(candidates), BATCH_GET_SIZE):
+        request = {
+            table_name: {
+                "Keys": [
+                    key(sort_key, LEGACY_PARTITION)
+                    for sort_key in candidates[index:][:BATCH_GET_SIZE]
+                ],
+                "ProjectionExpression": "SK",
+            }
+        }
+        for attempt in range(MAX_RETRIES):
+            response = get_client("dynamodb").batch_get_item(RequestItems=request)
+            for item in response["Responses"].get(table_name, []):
+                found[item["SK"]["S"]] = LEGACY_PARTITION
+            request = response.get("UnprocessedKeys")
+            if not request:
+                break
+            time.sleep(0.05 * 2**attempt)
+        else:
+            raise RuntimeError("Could not read all keys, giving up")
+    return found
+
+
+def query(
+    table_name: str, since: Optional[str] = None, until: Optional[str] = None, **params
+) -> Iterator[dict]:
+    """
+    Yield the BlogPosts created from `since` to `until` in sort key order.
+
+    Both bounds are inclusive dates or sort keys, params are added to each
+    query; with ScanIndexForward=False the newest posts come first. The
+    first pages of up to MAX_WORKERS partitions of the range are read at
+    once, the later pages when the items are consumed.
+    """
+    conditions = {
+        (True, True): " AND SK BETWEEN :since AND :until",
+        (True, False): " AND SK >= :since",
+        (False, True): " AND SK <= :until",
+        (False, False): "",
+    }
+    values = {":since": since, ":until": until}
+    params = dict(
+        params,
+        TableName=table_name,
+        KeyConditionExpression="PK = :pk"
+        + conditions[(since is not None, until is not None)],
+        ExpressionAttributeValues={
+            name: {"S": value} for name, value in values.items() if value is not None
+        },
+    )
+    group = partitions(since, until)
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(group))) as pool:
+        yield from heapq.merge(
+            *(_start_reading(pool, _query_partition(p, params)) for p in group),
+            key=_sort_key,
+            reverse=not params.get("ScanIndexForward", True),
+        )
+
+
+def latest(table_name: str, limit: int, **params) -> List[dict]:
+    """
+    Return the latest `limit` BlogPosts, newest first.
+
+    The newest FANOUT month partitions are queried in parallel with the
+    legacy partition, then the next FANOUT months, until enough posts were
+    found. A month partition only holds posts older than the months before
+    it, so the posts of older months are never newer than those found.
+    """
+    params = dict(
+        params,
+        TableName=table_name,
+        KeyConditionExpression="PK = :pk",
+        ExpressionAttributeValues={},
+        ScanIndexForward=False,
+        Limit=limit,
+    )
+    months = partitions()[:-1]
+    groups = [[LEGACY_PARTITION] + months[:FANOUT]]
+    groups += [months[index:][:FANOUT] for index in range(FANOUT, len(months), FANOUT)]
+
+    items: List[dict] = []
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, FANOUT + 1)) as pool:
+        for group in groups:
+            results = [_start_reading(pool, _query_partition(p, params)) for p in group]
+            merged = heapq.merge(items, *results, key=_sort_key, reverse=True)
+            items = list(itertools.islice(merged, limit))
+            if len(items) >= limit:
+                break
+    return items
+
+
+def oldest(
+    table_name: str, since: Optional[str] = None, until: Optional[str] = None, **params
+) -> Optional[dict]:
+    """
+    Return the oldest BlogPost created from `since` to `until`, or None when there is none.
+
+    The partitions are read one at a time, the legacy partition and then
+    the months oldest first, until a month partition has a post.
+    """
+    params = dict(
+        params,
+        TableName=table_name,
+        KeyConditionExpression="PK = :pk AND SK BETWEEN :since AND :until",
+        # Sort keys start with a year, so they sort between these bounds
+        ExpressionAttributeValues={
+            ":since": {"S": since or "0"},
+            ":until": {"S": until or "~"},
+        },
+        Limit=1,
+    )
+    found: List[dict] = []
+    for partition in [LEGACY_PARTITION] + partitions(since, until)[-2::-1]:
+        pages = _query_partition(partition, params)
+        found += itertools.islice(itertools.chain.from_iterable(pages), 1)
+        if partition != LEGACY_PARTITION and found:
+            break
+    return min(found, key=_sort_key, default=None)
+
+
+def _query_partition(partition: str, params: dict) -> Iterator[List[dict]]:
+    """Yield the pages of a query of one partition, reading each one when it is needed."""
+    projection = params.get("ProjectionExpression")
+    if projection and "SK" not in [name.strip() for name in projection.split(",")]:
+        # The items are merged by their sort key
+        params = dict(params, ProjectionExpression=f"{projection}, SK")
+    params = dict(
+        params,
+        ExpressionAttributeValues=dict(
+            params["ExpressionAttributeValues"], **{":pk": {"S": partition}}
+        ),
+    )
+    while True:
+        response = get_client("dynamodb").query(**params)
+        yield response["Items"]
+        if "LastEvaluatedKey" not in response:
+            return
+        params = dict(params, ExclusiveStartKey=response["LastEvaluatedKey"])
+
+
+def _start_reading(
+    pool: ThreadPoolExecutor, pages: Iterator[List[dict]]
+) -> Iterator[dict]:
+    """Start reading the first page in the pool, return the items of all pages."""
+    return _items(pool.submit(next, pages, []), pages)
+
+
+def _items(first_page: Future, pages: Iterator[List[dict]]) -> Iterator[dict]:
+    """Yield the items of the first page once it was read, then those of the next pages."""
+    yield from first_page.result()
+    for page in pages:
+        yield from page
+
+
+def _sort_key(item: dict) -> str:
+    """Return the sort key of an item, to merge the partitions by."""
+    return item["SK"]["S"]
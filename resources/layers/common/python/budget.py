@@ -0,0 +1,90 @@
+"""
+Deadline-aware execution budget for Lambda handlers.
+
+The budget is read from the Lambda context's get_remaining_time_in_millis()
+and split into stages. A stage gets a share of the time that is left when it
+starts, and learns how long one unit of work takes, so a handler can stop
+before a unit would run past the deadline instead of being killed halfway.
+"""
+import contextlib
+import time
+from typing import Optional
+
+DEFAULT_RESERVE_MS = 2000  # kept free to log, flush metrics and exit cleanly
+ESTIMATE_SAFETY_FACTOR = 2.0
+ESTIMATE_SMOOTHING = 0.3
+
+
+class BudgetExhausted(Exception):
+    """Raised when a stage has no time left for the next unit of work."""
+
+
+class StageBudget:
+    """Time slice of one stage of the handler."""
+
+    def __init__(self, name: str, deadline: float, initial_estimate_ms: float):
+        """Create a stage that must finish before `deadline` (a perf_counter time)."""
+        self.name = name
+        self.deadline = deadline
+        self.estimate_ms = initial_estimate_ms
+        self.units = 0
+
+    def remaining_s(self) -> float:
+        """Return the seconds left in this stage."""
+        return max(0.0, self.deadline - time.perf_counter())
+
+    def has_time_for_unit(self) -> bool:
+        """Return whether one more unit of work is expected to fit."""
+        return self.remaining_s() * 1000 >= self.estimate_ms * ESTIMATE_SAFETY_FACTOR
+
+    def ensure_time_for_unit(self) -> None:
+        """Raise BudgetExhausted when one more unit of work is not expected to fit."""
+        if not self.has_time_for_unit():
+            raise BudgetExhausted(
+                f"Stage {self.name} has {self.remaining_s():.1f}s left after "
+                f"{self.units} units, a unit takes about {self.estimate_ms:.0f} ms"
+            )
+
+    @contextlib.contextmanager
+    def unit(self):
+        """Measure one unit of work to refine the estimate."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.units += 1
+            self.estimate_ms = (
+                ESTIMATE_SMOOTHING * elapsed_ms
+                + (1 - ESTIMATE_SMOOTHING) * self.estimate_ms
+            )
+
+
+class ExecutionBudget:
+    """Time budget of a single invocation."""
+
+    def __init__(self, context, reserve_ms: int = DEFAULT_RESERVE_MS):
+        """
+        Create the budget from the Lambda context.
+
+        Without a context, for example when running locally, the budget is
+        effectively unlimited.
+        """
+        remaining_ms: Optional[int] = None
+        if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+            remaining_ms = context.get_remaining_time_in_millis()
+        if remaining_ms is None:
+            remaining_ms = 24 * 3600 * 1000
+        self.deadline = time.perf_counter() + (remaining_ms - reserve_ms) / 1000
+
+    def remaining_s(self) -> float:
+        """Return the seconds left before the reserve."""
+        return max(0.0, self.deadline - time.perf_counter())
+
+    def stage(self, name: str, share: float, initial_estimate_ms: float) -> StageBudget:
+        """Start a stage that may use `share` of the time that is left."""
+        return StageBudget(
+            name,
+            time.perf_counter() + self.remaining_s() * share,
+            initial_estimate_ms,
+        )
@@ -0,0 +1,121 @@
+"""
+Cold start profiler for the Lambda functions.
+
+Import this module before anything else in a handler module. It records when
+the container started initialising and, when COLD_START_PROFILE is enabled,
+traces every import in the same way as `python -X importtime`: the self and
+cumulative time of each module, including the lazy imports done during the
+first invocation. The init duration is always printed once, at the end of
+the first invocation, as a single JSON line; the import table is added when
+profiling is enabled.
+"""
+import builtins
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List
+
+INIT_START = time.perf_counter()
+PROFILE_ENABLED = os.environ.get("COLD_START_PROFILE", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+REPORT_TOP_N = int(os.environ.get("COLD_START_PROFILE_TOP_N", "15"))
+
+_original_import = builtins.__import__
+# Every thread has its own stack of the imports in progress, thread pools
+# import lazily at the same time
+_import_state = threading.local()
+_import_times: Dict[str, Dict[str, float]] = {}
+_import_times_lock = threading.Lock()
+_cold = True  # pylint: disable=invalid-name
+
+
+def _profiling_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """Wrap __import__ and time modules that were not imported yet."""
+    # pylint: disable=redefined-builtin
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    import_stack = _get_import_stack()
+    import_stack.append(name)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed_us = (time.perf_counter() - start) * 1_000_000
+        import_stack.pop()
+        with _import_times_lock:
+            entry = _import_times.setdefault(
+                name, {"self_us": 0.0, "cumulative_us": 0.0}
+            )
+            entry["cumulative_us"] += elapsed_us
+            entry["self_us"] += elapsed_us
+            if import_stack:
+                parent = _import_times.setdefault(
+                    import_stack[-1], {"self_us": 0.0, "cumulative_us": 0.0}
+                )
+                parent["self_us"] -= elapsed_us
+
+
+def _get_import_stack() -> List[str]:
+    """Return the stack of the imports in progress in the current thread."""
+    if not hasattr(_import_state, "stack"):
+        _import_state.stack = []
+    return _import_state.stack
+
+
+def build_report(init_ms: float) -> dict:
+    """Build the cold start report from the collected import timings."""
+    with _import_times_lock:
+        slowest = sorted(
+            _import_times.items(), key=lambda x: x[1]["cumulative_us"], reverse=True
+        )
+    return {
+        "cold_start": True,
+        "init_ms": round(init_ms, 1),
+        "imports": [
+            {
+                "module": module,
+                "self_ms": round(timing["self_us"] / 1000, 1),
+                "cumulative_ms": round(timing["cumulative_us"] / 1000, 1),
+            }
+            for module, timing in slowest[:REPORT_TOP_N]
+        ],
+    }
+
+
+def profiled(handler: Callable) -> Callable:
+    """Decorate a Lambda handler to report the cold start on its first invocation."""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _cold  # pylint: disable=global-statement,invalid-name
+        if not _cold:
+            return handler(event, context)
+
+        _cold = False
+        init_ms = (time.perf_counter() - INIT_START) * 1000
+        invocation_start = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            if PROFILE_ENABLED:
+                builtins.__import__ = _original_import
+                report = build_report(init_ms)
+            else:
+                report = {"cold_start": True, "init_ms": round(init_ms, 1)}
+            report["first_invocation_ms"] = round(
+                (time.perf_counter() - invocation_start) * 1000, 1
+            )
+            print(json.dumps(report))
+
+    return wrapper
+
+
+if PROFILE_ENABLED:
+    builtins.__import__ = _profiling_import
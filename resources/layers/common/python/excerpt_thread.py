@@ -0,0 +1,155 @@
+"""
+Excerpt threads below the tweet of a blog post.
+
+The excerpt of a post is split into numbered replies to its tweet. Every
+reply is checkpointed on the blog post item as soon as it is sent:
+excerpt_id is the first reply, thread_tail_id the last one sent and
+thread_posted the number of replies sent, and the checkpoint of the last
+reply adds threaded_at. A retry continues the thread below thread_tail_id
+instead of starting over.
+"""
+from typing import TYPE_CHECKING, List, Optional
+
+import instrumentation
+import latency
+import log
+from aws_clients import get_client
+
+if TYPE_CHECKING:
+    from TwitterAPI import TwitterAPI
+
+MAX_TWEET_LENGTH = 280
+
+
+def is_complete(ddb_item: dict) -> bool:
+    """Return whether the whole excerpt thread of a blog post was posted."""
+    if "excerpt_id" not in ddb_item:
+        return False
+    if "thread_posted" not in ddb_item:
+        return True  # Posted in one go, before threads were checkpointed
+    return int(ddb_item["thread_posted"]["N"]) >= len(prepare_texts(ddb_item) or [])
+
+
+def post_thread(
+    ddb_item: dict, twitter_api: "TwitterAPI", table_name: str
+) -> Optional[str]:
+    """
+    Post the excerpt of a blog post as replies to its tweet, return the first reply ID.
+
+    Returns None when the post has no excerpt.
+    """
+    texts = prepare_texts(ddb_item)
+    if not texts:
+        return None
+
+    posted = int(ddb_item.get("thread_posted", {}).get("N", 0))
+    excerpt_id = ddb_item.get("excerpt_id", {}).get("S")
+    reply_to = ddb_item["thread_tail_id"]["S"] if posted else ddb_item["tweet_id"]["S"]
+    if posted:
+        log.info("Resuming the excerpt thread after reply %d of %d", posted, len(texts))
+
+    for index in range(posted, len(texts)):
+        body = send_reply(texts[index], reply_to, twitter_api)
+        reply_to = body["id_str"]
+        excerpt_id = excerpt_id or reply_to
+        checkpoint(
+            ddb_item,
+            table_name,
+            excerpt_id,
+            reply_to,
+            index + 1,
+            complete=index + 1 == len(texts),
+        )
+        log.debug(
+            "Posted reply %d of %d",
+            index + 1,
+            len(texts),
+            text=texts[index],
+            response=body,
+        )
+    return excerpt_id
+
+
+def checkpoint(
+    ddb_item: dict,
+    table_name: str,
+    excerpt_id: str,
+    tail_id: str,
+    posted: int,
+    *,
+    complete: bool = False,
+) -> None:
+    """Store the progress of an excerpt thread on the post, and when it was completed."""
+    update_expression = (
+        "SET excerpt_id = :excerpt_id, thread_tail_id = :tail_id,"
+        " thread_posted = :posted"
+    )
+    values = {
+        ":excerpt_id": {"S": excerpt_id},
+        ":tail_id": {"S": tail_id},
+        ":posted": {"N": str(posted)},
+    }
+    if complete:
+        update_expression += ", threaded_at = :threaded_at"
+        values[":threaded_at"] = {"S": latency.now()}
+    get_client("dynamodb").update_item(
+        TableName=table_name,
+        Key={"PK": ddb_item["PK"], "SK": ddb_item["SK"]},
+        UpdateExpression=update_expression,
+        ExpressionAttributeValues=values,
+    )
+    if complete:
+        latency.record(
+            "threaded",
+            ddb_item.get("date_created", {}).get("S"),
+            values[":threaded_at"]["S"],
+        )
+
+
+def send_reply(text: str, tweet_id: str, twitter_api: "TwitterAPI") -> dict:
+    """Use the Twitter API to send a reply to a tweet."""
+    with instrumentation.track("twitter", "StatusesUpdate") as call:
+        response = twitter_api.request(
+            "statuses/update",
+            {
+                "status": text,
+                "in_reply_to_status_id": tweet_id,
+                "auto_populate_reply_metadata": True,
+            },
+        )
+        call.status(response.status_code)
+
+    body = response.json()
+    if response.status_code != 200:
+        error_strs = [f'{x["code"]}: {x["message"]}' for x in body["errors"]]
+        errors = f'[{", ".join(error_strs)}]'
+        raise Exception(
+            f"Post Status failed with status code {response.status_code}. "
+            f"Errors: {errors}"
+        )
+    return body
+
+
+def prepare_texts(ddb_item: dict) -> Optional[List[str]]:
+    """Split the excerpt of a blog post into numbered tweets."""
+    excerpt = ddb_item.get("post_excerpt", {}).get("S")
+    if not excerpt:
+        return None
+
+    text = f"Excerpt: {excerpt}"
+    if len(text) < MAX_TWEET_LENGTH:
+        return [text]
+
+    texts = []
+    text = ""
+    for component in f"Excerpt: {excerpt}".split(" "):
+        tmp_text = f"{text} {component} "
+        if len(tmp_text) > MAX_TWEET_LENGTH - 8:  # 8 for ' [xx/xx]'
+            texts.append(f"{text} [{len(texts) + 1}/xx]")
+            text = f"… {component}"
+        else:
+            text = tmp_text.strip()
+    texts.append(f"{text} [{len(texts) + 1}/xx]")
+
+    number_of_texts = len(texts)
+    return [text.replace("/xx]", f"/{number_of_texts}]") for text in texts]
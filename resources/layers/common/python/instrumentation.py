@@ -0,0 +1,184 @@
+"""
+Outbound call instrumentation for the Lambda functions.
+
+AWS calls are measured through botocore's before-call and after-call events,
+other outbound calls (the AWS blogs API, Twitter, Mastodon) are wrapped with
+the track() context manager. At the end of every invocation the count,
+latency and error classes of the calls are printed as CloudWatch Embedded
+Metric Format (EMF) lines, which CloudWatch Logs turns into metrics.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import aws_clients
+import latency
+
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "AwsBlogsTwitterFeed")
+FUNCTION_NAME = os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "local")
+MAX_VALUES_PER_METRIC = 100  # EMF limit on the values of one metric
+
+_lock = threading.Lock()
+_calls: Dict[tuple, dict] = {}
+_installed = False  # pylint: disable=invalid-name
+
+
+class TrackedCall:
+    """A single outbound call, set `error` to record a failure without raising."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        """Create a call without an error."""
+        self.error: Optional[str] = None
+
+    def status(self, status_code: int) -> None:
+        """Record an HTTP status code, anything but 2xx counts as an error."""
+        if not 200 <= status_code < 300:
+            self.error = f"HTTP{status_code}"
+
+
+def record(
+    service: str, operation: str, latency_ms: float, error: Optional[str]
+) -> None:
+    """Record one outbound call for the current invocation."""
+    with _lock:
+        entry = _calls.setdefault((service, operation), {"latencies": [], "errors": {}})
+        entry["latencies"].append(latency_ms)
+        if error:
+            entry["errors"][error] = entry["errors"].get(error, 0) + 1
+
+
+@contextlib.contextmanager
+def track(service: str, operation: str):
+    """Measure an outbound call that does not go through botocore."""
+    call = TrackedCall()
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception as exc:
+        call.error = type(exc).__name__
+        raise
+    finally:
+        record(service, operation, (time.perf_counter() - start) * 1000, call.error)
+
+
+def _before_call(context: dict, **_kwargs) -> None:
+    """Store the start time on the request context."""
+    context["instrumentation_start"] = time.perf_counter()
+
+
+def _after_call(event_name: str, context: dict, parsed: dict, **_kwargs) -> None:
+    """Record a finished AWS call, including error responses."""
+    _record_aws_call(event_name, context, parsed.get("Error", {}).get("Code"))
+
+
+def _after_call_error(
+    event_name: str, context: dict, exception: Exception, **_kwargs
+) -> None:
+    """Record an AWS call that failed without a response, like a timeout."""
+    _record_aws_call(event_name, context, type(exception).__name__)
+
+
+def _record_aws_call(event_name: str, context: dict, error: Optional[str]) -> None:
+    """Record an AWS call, the event name is <event>.<service>.<operation>."""
+    start = context.get("instrumentation_start")
+    if start is None:
+        return
+    _, service, operation = event_name.split(".", 2)
+    record(service, operation, (time.perf_counter() - start) * 1000, error)
+
+
+def install() -> None:
+    """Register the botocore event handlers, once per container."""
+    global _installed  # pylint: disable=global-statement,invalid-name
+    if _installed:
+        return
+    aws_clients.register_event_handler("before-call", _before_call)
+    aws_clients.register_event_handler("after-call", _after_call)
+    aws_clients.register_event_handler("after-call-error", _after_call_error)
+    _installed = True
+
+
+def build_metrics() -> List[dict]:
+    """Build the EMF documents for the calls recorded so far."""
+    timestamp = int(time.time() * 1000)
+    documents = []
+    for (service, operation), entry in sorted(_calls.items()):
+        latencies = [round(x, 2) for x in entry["latencies"][:MAX_VALUES_PER_METRIC]]
+        documents.append(
+            {
+                "_aws": {
+                    "Timestamp": timestamp,
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": NAMESPACE,
+                            "Dimensions": [["Function", "Service", "Operation"]],
+                            "Metrics": [
+                                {"Name": "Calls", "Unit": "Count"},
+                                {"Name": "Latency", "Unit": "Milliseconds"},
+                                {"Name": "Errors", "Unit": "Count"},
+                            ],
+                        }
+                    ],
+                },
+                "Function": FUNCTION_NAME,
+                "Service": service,
+                "Operation": operation,
+                "Calls": len(entry["latencies"]),
+                "Latency": latencies,
+                "Errors": sum(entry["errors"].values()),
+                "ErrorClasses": entry["errors"],
+            }
+        )
+        for error_class, count in sorted(entry["errors"].items()):
+            documents.append(
+                {
+                    "_aws": {
+                        "Timestamp": timestamp,
+                        "CloudWatchMetrics": [
+                            {
+                                "Namespace": NAMESPACE,
+                                "Dimensions": [
+                                    ["Function", "Service", "Operation", "ErrorClass"]
+                                ],
+                                "Metrics": [{"Name": "Errors", "Unit": "Count"}],
+                            }
+                        ],
+                    },
+                    "Function": FUNCTION_NAME,
+                    "Service": service,
+                    "Operation": operation,
+                    "ErrorClass": error_class,
+                    "Errors": count,
+                }
+            )
+    return documents
+
+
+def flush() -> None:
+    """Print the recorded calls and post latencies as EMF lines and start a new invocation."""
+    with _lock:
+        documents = build_metrics()
+        _calls.clear()
+    documents += latency.flush_metrics()
+    for document in documents:
+        print(json.dumps(document))
+
+
+def instrumented(handler: Callable) -> Callable:
+    """Decorate a Lambda handler to emit its outbound call metrics per invocation."""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        install()
+        try:
+            return handler(event, context)
+        finally:
+            flush()
+
+    return wrapper
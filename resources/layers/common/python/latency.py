@@ -0,0 +1,93 @@
+"""
+Publication-to-post latency of the blog posts.
+
+Every stage a blog post goes through stores when it happened on the BlogPost
+item, as <stage>_at next to date_created and in the same format:
+
+    fetched   the page with the post was fetched from the AWS blogs API
+    stored    the fetcher stored the post
+    tweeted   the tweet was sent
+    threaded  the last reply of the excerpt thread was sent
+    tooted    the first Mastodon account posted it
+
+The timestamp is part of the write the stage makes anyway, like the put of
+the post or the update with its tweet ID, so it costs no extra request. The
+latency of a stage, the seconds since date_created, is also emitted per
+invocation as an EMF metric with a value per post, which CloudWatch keeps as
+a histogram per stage.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "AwsBlogsTwitterFeed")
+STAGES = ["fetched", "stored", "tweeted", "threaded", "tooted"]
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S%z"  # the format of date_created
+MAX_VALUES_PER_METRIC = (
+    100  # EMF limit on the values of one metric, more go in several lines
+)
+
+_lock = threading.Lock()
+_latencies: Dict[str, List[float]] = {}
+
+
+def now() -> str:
+    """Return the current time as a stage timestamp."""
+    return datetime.now(timezone.utc).strftime(TIME_FORMAT)
+
+
+def attribute(stage: str) -> str:
+    """Return the name of the BlogPost attribute with the timestamp of a stage."""
+    return f"{stage}_at"
+
+
+def seconds_between(date_created: str, timestamp: str) -> float:
+    """Return the seconds from the creation of a post to a stage timestamp."""
+    return (
+        datetime.strptime(timestamp, TIME_FORMAT)
+        - datetime.strptime(date_created, TIME_FORMAT)
+    ).total_seconds()
+
+
+def record(stage: str, date_created: Optional[str], timestamp: str) -> None:
+    """Record the latency of a stage of a post for the metrics of the current invocation."""
+    if not date_created:
+        return
+    try:
+        seconds = seconds_between(date_created, timestamp)
+    except ValueError:
+        return  # An unexpected date format must not fail the stage
+    with _lock:
+        _latencies.setdefault(stage, []).append(seconds)
+
+
+def flush_metrics() -> List[dict]:
+    """Return the EMF documents for the latencies recorded so far and start a new invocation."""
+    with _lock:
+        latencies = dict(_latencies)
+        _latencies.clear()
+    timestamp = int(time.time() * 1000)
+    documents = []
+    for stage, values in sorted(latencies.items()):
+        for index in range(0, len(values), MAX_VALUES_PER_METRIC):
+            documents.append(
+                {
+                    "_aws": {
+                        "Timestamp": timestamp,
+                        "CloudWatchMetrics": [
+                            {
+                                "Namespace": NAMESPACE,
+                                "Dimensions": [["Stage"]],
+                                "Metrics": [{"Name": "PostLatency", "Unit": "Seconds"}],
+                            }
+                        ],
+                    },
+                    "Stage": stage,
+                    "PostLatency": [
+                        round(x, 1) for x in values[index:][:MAX_VALUES_PER_METRIC]
+                    ],
+                }
+            )
+    return documents
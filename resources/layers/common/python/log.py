@@ -0,0 +1,148 @@
+"""
+Structured logging for the Lambda functions.
+
+Every line is a JSON object with the level, the message and the fields of
+the current invocation and blog post, for example
+{"level": "INFO", "message": "Stored 3 items", "sort_key": "..."}. Messages
+are formatted lazily, log.info("Stored %d items", count) only formats the
+message when the line is written, and fields that are callables are only
+called then. LOG_LEVEL sets the level, INFO by default.
+
+Full payloads, like the invocation event, are logged at DEBUG. Besides
+LOG_LEVEL=DEBUG, a share of the blog posts set by LOG_DEBUG_SAMPLE_RATE is
+logged at DEBUG. The sample is deterministic on the sort key of the post, so
+every function logs the same posts in full. The event of a failed invocation
+is always logged.
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import traceback
+import zlib
+from typing import Any, Callable, Dict, Optional
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+LEVEL = {name: level for level, name in LEVEL_NAMES.items()}.get(
+    os.environ.get("LOG_LEVEL", "INFO").upper(), INFO
+)
+DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0"))
+SAMPLE_BUCKETS = 10000
+
+_invocation_fields: Dict[str, Any] = {}  # shared by the threads of an invocation
+_fields: contextvars.ContextVar = contextvars.ContextVar("fields", default={})
+
+
+def sampled(sort_key: Optional[str]) -> bool:
+    """Return whether the blog post with a sort key is in the debug sample."""
+    if not sort_key or DEBUG_SAMPLE_RATE <= 0:
+        return False
+    return (
+        zlib.crc32(sort_key.encode()) % SAMPLE_BUCKETS
+        < DEBUG_SAMPLE_RATE * SAMPLE_BUCKETS
+    )
+
+
+def current_fields() -> Dict[str, Any]:
+    """Return the fields of the current invocation and blog post."""
+    return {**_invocation_fields, **_fields.get()}
+
+
+def is_enabled(level: int) -> bool:
+    """Return whether lines of a level are written for the current blog post."""
+    if level >= LEVEL:
+        return True
+    return level == DEBUG and sampled(current_fields().get("sort_key"))
+
+
+def log(level: int, message: str, *args, **fields) -> None:
+    """Write a line when its level is enabled, formatting `message % args` only then."""
+    if not is_enabled(level):
+        return
+    if args:
+        message = message % args
+    line = {"level": LEVEL_NAMES[level], "message": message}
+    line.update(current_fields())
+    for name, value in fields.items():
+        line[name] = value() if callable(value) else value
+    print(json.dumps(line, default=str))
+
+
+def debug(message: str, *args, **fields) -> None:
+    """Write a DEBUG line."""
+    log(DEBUG, message, *args, **fields)
+
+
+def info(message: str, *args, **fields) -> None:
+    """Write an INFO line."""
+    log(INFO, message, *args, **fields)
+
+
+def warning(message: str, *args, **fields) -> None:
+    """Write a WARNING line."""
+    log(WARNING, message, *args, **fields)
+
+
+def error(message: str, *args, **fields) -> None:
+    """Write an ERROR line."""
+    log(ERROR, message, *args, **fields)
+
+
+def exception(message: str, *args, **fields) -> None:
+    """Write an ERROR line with the exception that is being handled."""
+    log(ERROR, message, *args, exception=traceback.format_exc, **fields)
+
+
+@contextlib.contextmanager
+def context(**fields):
+    """Add fields, like the sort_key of a blog post, to the lines written in this block."""
+    token = _fields.set({**_fields.get(), **fields})
+    try:
+        yield
+    finally:
+        _fields.reset(token)
+
+
+def event_sort_key(event: dict) -> Optional[str]:
+    """Return the sort key of an SQS message with a sort key or of a NewAWSBlogFound event."""
+    if "Records" in event:
+        return event["Records"][0]["body"] if len(event["Records"]) == 1 else None
+    return event["detail"]["data"]["sort_key"]
+
+
+def logged(sort_key_of: Optional[Callable[[dict], Optional[str]]] = None) -> Callable:
+    """
+    Decorate a Lambda handler to log its event at DEBUG, or in full when it fails.
+
+    `sort_key_of` returns the sort key of the blog post an event is about,
+    which is added to every line and selects the events in the debug sample.
+    """
+
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event, context_):
+            _invocation_fields.clear()
+            if hasattr(context_, "aws_request_id"):
+                _invocation_fields["request_id"] = context_.aws_request_id
+            if sort_key_of:
+                try:
+                    _invocation_fields["sort_key"] = sort_key_of(event)
+                except (KeyError, IndexError, TypeError):
+                    pass
+            debug("Received event", event=event)
+            try:
+                return handler(event, context_)
+            except Exception:
+                exception("Invocation failed", event=event)
+                raise
+            finally:
+                _invocation_fields.clear()
+
+        return wrapper
+
+    return decorator
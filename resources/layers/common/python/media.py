@@ -0,0 +1,298 @@
+"""
+Featured image downloads for the posters.
+
+Images are streamed into a content-addressed cache in /tmp, keyed by the
+hash of their URL, so a retry or a second post of the same image in a
+container downloads it once. A download is abandoned as soon as it grows
+beyond MAX_DOWNLOAD_BYTES or turns out not to be an image type the
+platforms accept. Such rejections are cached as well, network errors and
+server errors are not, so a retry downloads the image again. Images are only
+re-encoded when they are larger than the limit of the platform they are
+posted to; that needs Pillow, which is imported on first use. Images Pillow
+cannot decode are rejected for that limit and cached the same way; a file
+system error while re-encoding is not cached. Each re-encode writes to its
+own temporary file under a lock for its target path, so parallel posts of the
+same image do not race. The cache is bounded by MAX_CACHE_BYTES: after every
+write the images used least recently are evicted, except ones used within the
+last MIN_CACHE_AGE seconds, which an invocation may still be uploading.
+"""
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import instrumentation
+import log
+
+CACHE_DIR = os.environ.get(
+    "MEDIA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "media-cache")
+)
+MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = 5  # seconds
+ALLOWED_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+MAX_DOWNSCALE_ATTEMPTS = 5
+MAX_CACHE_BYTES = int(os.environ.get("MEDIA_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+MIN_CACHE_AGE = 300  # seconds
+
+_lock = threading.Lock()
+_path_locks: Dict[str, threading.Lock] = {}
+
+
+class MediaFile(NamedTuple):
+    """An image in the cache."""
+
+    path: str
+    mime_type: str
+    size: int
+
+
+def cache_key(url: str) -> str:
+    """Return the cache key of a URL."""
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def sniff_type(head: bytes) -> Optional[str]:
+    """Return the image type from the first bytes of a file, or None."""
+    for signature, mime_type in SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def path_lock(path: str) -> threading.Lock:
+    """Return the lock for writing `path`."""
+    with _lock:
+        return _path_locks.setdefault(path, threading.Lock())
+
+
+def fetch_image(url: str) -> Optional[MediaFile]:
+    """Return the cached image at `url`, downloading it first if needed; None when unusable."""
+    key = cache_key(url)
+    meta_path = os.path.join(CACHE_DIR, f"{key}.json")
+    with _lock:
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+            if "error" in meta:
+                return None
+            if os.path.exists(meta["path"]):
+                # Marks the image as used for evict
+                os.utime(meta_path)
+                return MediaFile(**meta)
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        try:
+            media = download(url, os.path.join(CACHE_DIR, key))
+            meta = media._asdict()
+        except OSError as exc:
+            log.warning("Downloading image %s failed: %s", url, exc)
+            return None
+        except ValueError as exc:
+            log.info("Not using image %s: %s", url, exc)
+            media, meta = None, {"error": str(exc)}
+        with open(meta_path, "w", encoding="utf-8") as meta_file:
+            json.dump(meta, meta_file)
+        evict()
+        return media
+
+
+def download(url: str, base_path: str) -> MediaFile:
+    """
+    Stream an image to disk.
+
+    Raises ValueError when the image is rejected, because it is too large or
+    not an image, and OSError when it could not be downloaded.
+    """
+    import requests  # pylint: disable=import-outside-toplevel
+
+    tmp_path = f"{base_path}.part"
+    try:
+        with instrumentation.track("media", "Download") as call, requests.get(
+            url, stream=True, timeout=DOWNLOAD_TIMEOUT
+        ) as response:
+            call.status(response.status_code)
+            header_type = check_response(response)
+            size, head = stream_to_file(response, tmp_path)
+    except (requests.RequestException, OSError, ValueError) as exc:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if not isinstance(exc, requests.RequestException):
+            raise
+        raise OSError(type(exc).__name__) from exc
+
+    mime_type = sniff_type(head)
+    if mime_type is None:
+        os.remove(tmp_path)
+        raise ValueError(f"content is not a {header_type}")
+    path = base_path + ALLOWED_TYPES[mime_type]
+    os.replace(tmp_path, path)
+    return MediaFile(path, mime_type, size)
+
+
+def check_response(response) -> str:
+    """Check the status and headers of a download before reading the body, return its type."""
+    if response.status_code >= 500 or response.status_code == 429:
+        raise OSError(f"HTTP {response.status_code}")
+    if response.status_code != 200:
+        raise ValueError(f"HTTP {response.status_code}")
+    header_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+    if header_type not in ALLOWED_TYPES:
+        raise ValueError(f"unsupported type {header_type or 'unknown'}")
+    if int(response.headers.get("Content-Length") or 0) > MAX_DOWNLOAD_BYTES:
+        raise ValueError(f"larger than {MAX_DOWNLOAD_BYTES} bytes")
+    return header_type
+
+
+def stream_to_file(response, path: str) -> Tuple[int, bytes]:
+    """Write the body of a response to `path` in chunks, return its size and first bytes."""
+    size = 0
+    head = b""
+    with open(path, "wb") as image_file:
+        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_DOWNLOAD_BYTES:
+                raise ValueError(f"larger than {MAX_DOWNLOAD_BYTES} bytes")
+            if len(head) < 16:
+                head += chunk[:16]
+            image_file.write(chunk)
+    return size, head
+
+
+def fit_to_limit(media: MediaFile, max_bytes: int) -> Optional[MediaFile]:
+    """
+    Return the image as it is when it fits in `max_bytes`, or a smaller JPEG copy.
+
+    Returns None when the image cannot be made small enough, for example an
+    animated GIF or a file Pillow cannot decode, or when Pillow is not
+    available. Images that cannot be decoded or made small enough are cached
+    as rejected for the limit.
+    """
+    if media.size <= max_bytes:
+        return media
+    if media.mime_type == "image/gif":
+        log.info("Not downscaling GIF %s of %d bytes", media.path, media.size)
+        return None
+
+    base_path = f"{os.path.splitext(media.path)[0]}-{max_bytes}"
+    path, rejected_path = f"{base_path}.jpg", f"{base_path}.json"
+    with path_lock(path):
+        if os.path.exists(rejected_path):
+            return None
+        if not os.path.exists(path):
+            try:
+                from PIL import Image  # pylint: disable=import-outside-toplevel
+            except ImportError:
+                log.warning("Pillow is not available, cannot downscale")
+                return None
+            try:
+                downscale(media, max_bytes, path)
+            # Pillow raises OSError without an errno for unidentified and
+            # truncated files, the file system raises it with one
+            except (OSError, ValueError, Image.DecompressionBombError) as exc:
+                if isinstance(exc, OSError) and exc.errno is not None:
+                    log.warning("Downscaling image %s failed: %s", media.path, exc)
+                else:
+                    log.info("Not using image %s: %r", media.path, exc)
+                    with open(rejected_path, "w", encoding="utf-8") as rejected_file:
+                        json.dump({"error": repr(exc)}, rejected_file)
+                return None
+            log.info(
+                "Downscaled %s from %d to %d bytes",
+                media.path,
+                media.size,
+                os.path.getsize(path),
+            )
+            with _lock:
+                evict()
+        return MediaFile(path, "image/jpeg", os.path.getsize(path))
+
+
+def downscale(media: MediaFile, max_bytes: int, path: str) -> None:
+    """Write a JPEG copy of the image within `max_bytes` to `path`, or raise ValueError."""
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    with Image.open(media.path) as image:
+        image = image.convert("RGB")
+    file_handle, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=os.path.basename(path), suffix=".part"
+    )
+    os.close(file_handle)
+    try:
+        # The encoded size shrinks roughly with the number of pixels
+        scale = min(1.0, math.sqrt(max_bytes / media.size))
+        for _ in range(MAX_DOWNSCALE_ATTEMPTS):
+            size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+            image.resize(size, Image.Resampling.LANCZOS).save(
+                tmp_path, "JPEG", quality=85
+            )
+            if os.path.getsize(tmp_path) <= max_bytes:
+                os.replace(tmp_path, path)
+                return
+            scale *= 0.8
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    raise ValueError(f"cannot be downscaled to {max_bytes} bytes")
+
+
+def evict(max_bytes: Optional[int] = None) -> None:
+    """
+    Remove the images used least recently until the cache fits in `max_bytes`.
+
+    Files are grouped by the cache key they start with, so an image is removed
+    together with its metadata and downscaled copies. Images used within the
+    last MIN_CACHE_AGE seconds are kept. The caller holds `_lock`.
+    """
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    groups: Dict[str, list] = {}
+    total = 0
+    with os.scandir(CACHE_DIR) as entries:
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            group = groups.setdefault(entry.name[:64], [0.0, 0, []])
+            group[0] = max(group[0], stat.st_mtime)
+            group[1] += stat.st_size
+            group[2].append(entry.path)
+    if total <= max_bytes:
+        return
+    cutoff = time.time() - MIN_CACHE_AGE
+    for used_at, size, paths in sorted(groups.values()):
+        if total <= max_bytes or used_at > cutoff:
+            break
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+    log.info("Evicted images from the media cache, %d bytes left", total)
+
+
+def image_for_post(url: Optional[str], max_bytes: int) -> Optional[MediaFile]:
+    """Return the featured image of a post within `max_bytes`, or None when there is none."""
+    if not url:
+        return None
+    media = fetch_image(url)
+    return fit_to_limit(media, max_bytes) if media else None
@@ -0,0 +1,178 @@
+"""
+Publishing engine for new blog posts.
+
+A blog post is loaded once and dispatched to the platform adapters
+concurrently. An adapter posts to one platform or account and keeps its own
+state:
+
+- formatting: the text and media of the post for its platform
+- rate limiting: a RateLimiter that spaces its posts within the container
+- idempotency: the attribute of the BlogPost item it sets once it posted,
+  adapters that find theirs on the loaded item are skipped
+
+A slow or failing platform does not hold up the others. The dispatch fails
+when any adapter failed, after all of them ran, so a retry only posts to the
+platforms that are missing.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import log
+
+MAX_RATE_WAIT = 5  # seconds an adapter waits for its rate limit before it fails
+SHORTENED_SUFFIX = " […]"
+
+
+class RateLimited(Exception):
+    """The rate limit of an adapter does not allow a post within MAX_RATE_WAIT."""
+
+
+class PublishFailed(Exception):
+    """One or more adapters failed to publish a post."""
+
+    def __init__(self, failed: List[str]):
+        """Create the exception for the names of the failed adapters."""
+        super().__init__(f"Publishing to {', '.join(failed)} failed")
+        self.failed = failed
+
+
+class RateLimiter:
+    """Token bucket that allows `per_minute` posts, and bursts of up to `burst`."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        """Create a full bucket."""
+        self.interval = 60 / per_minute
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait: float = MAX_RATE_WAIT) -> None:
+        """Take a token, waiting up to `max_wait` seconds for one, or raise RateLimited."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) / self.interval
+            )
+            self._updated = now
+            wait = (1 - self._tokens) * self.interval
+            if wait > max_wait:
+                raise RateLimited(f"The next post is allowed in {wait:.1f} s")
+            # The token is taken now, concurrent callers queue up behind it
+            self._tokens -= 1
+        if wait > 0:
+            time.sleep(wait)
+
+
+class Adapter:
+    """
+    A platform the publisher posts to.
+
+    Subclasses set the name and the attribute they record their post in,
+    and implement publish(). They can limit the posts they accept.
+    """
+
+    name = ""
+    published_attribute = ""
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        """Create an adapter with its own rate limit."""
+        self.rate_limiter = RateLimiter(per_minute, burst)
+
+    def accepts(self, _ddb_item: dict) -> bool:
+        """Return whether the adapter posts a blog post, all of them by default."""
+        return True
+
+    def is_published(self, ddb_item: dict) -> bool:
+        """Return whether the adapter posted a blog post already."""
+        return self.published_attribute in ddb_item
+
+    def publish(self, ddb_item: dict, delivery_id: str) -> None:
+        """
+        Post a blog post and record it in published_attribute.
+
+        `delivery_id` identifies the event or message that asked for the
+        post, retries of it carry the same ID.
+        """
+        raise NotImplementedError
+
+
+def dispatch(
+    ddb_item: dict, adapters: List[Adapter], delivery_id: str
+) -> Dict[str, str]:
+    """Publish a blog post with every adapter that still has to, return the outcome per adapter."""
+    outcomes = {}
+    pending = []
+    for adapter in adapters:
+        if not adapter.accepts(ddb_item):
+            outcomes[adapter.name] = "not accepted"
+        elif adapter.is_published(ddb_item):
+            outcomes[adapter.name] = "published before"
+        else:
+            pending.append(adapter)
+    if not pending:
+        log.info("Nothing to publish", outcomes=outcomes)
+        return outcomes
+
+    with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+        futures = [
+            # Every thread logs with the fields of the caller, like the sort key
+            (
+                adapter,
+                pool.submit(
+                    contextvars.copy_context().run,
+                    _publish,
+                    adapter,
+                    ddb_item,
+                    delivery_id,
+                ),
+            )
+            for adapter in pending
+        ]
+    failed = []
+    for adapter, future in futures:
+        try:
+            future.result()
+            outcomes[adapter.name] = "published"
+        except Exception as exc:  # pylint: disable=broad-except
+            log.warning("Publishing to %s failed: %r", adapter.name, exc)
+            outcomes[adapter.name] = "failed"
+            failed.append(adapter.name)
+    log.info("Published %s", ddb_item["blog_url"]["S"], outcomes=outcomes)
+    if failed:
+        raise PublishFailed(failed)
+    return outcomes
+
+
+def _publish(adapter: Adapter, ddb_item: dict, delivery_id: str) -> None:
+    """Publish with one adapter within its rate limit, in a thread of the dispatch."""
+    with log.context(adapter=adapter.name):
+        adapter.rate_limiter.acquire()
+        adapter.publish(ddb_item, delivery_id)
+
+
+def format_authors(authors: List[str]) -> str:
+    """Join author names as "A, B and C"."""
+    if len(authors) < 2:
+        return "".join(authors)
+    return f"{', '.join(authors[:-1])} and {authors[-1]}"
+
+
+def shorten(text: str, max_len: int, suffix: str = SHORTENED_SUFFIX) -> str:
+    """Shorten a text to at most max_len characters at a word boundary, ending in the suffix."""
+    if len(text) <= max_len:
+        return text
+    shortened = text[: max(0, max_len - len(suffix)) + 1].rsplit(" ", 1)[0]
+    return shortened[: max(0, max_len - len(suffix))] + suffix
+
+
+def item_string(
+    ddb_item: dict, name: str, default: Optional[str] = ""
+) -> Optional[str]:
+    """Return a string attribute of an item, the default when it is missing or NULL."""
+    return ddb_item.get(name, {}).get("S", default)
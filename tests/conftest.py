@@ -0,0 +1,55 @@
+"""Fixtures of the tests; the common layer and the blog fetcher import as in Lambda."""
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(ROOT_DIR, "resources", "layers", "common", "python"),
+    os.path.join(ROOT_DIR, "resources", "functions", "blog_fetcher"),
+]
+# Never reach a real account
+os.environ.update(
+    AWS_DEFAULT_REGION="us-east-1",
+    AWS_ACCESS_KEY_ID="testing",
+    AWS_SECRET_ACCESS_KEY="testing",
+    AWS_SESSION_TOKEN="testing",
+)
+
+TABLE_NAME = "blogs"
+
+
+@pytest.fixture
+def table():
+    """Create the blogs table in a mocked account, return its name."""
+    from moto import mock_aws  # pylint: disable=import-outside-toplevel
+
+    import aws_clients  # pylint: disable=import-outside-toplevel
+
+    with mock_aws():
+        aws_clients.reset_clients()
+        aws_clients.get_client("dynamodb").create_table(
+            TableName=TABLE_NAME,
+            BillingMode="PAY_PER_REQUEST",
+            KeySchema=[
+                {"AttributeName": "PK", "KeyType": "HASH"},
+                {"AttributeName": "SK", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "PK", "AttributeType": "S"},
+                {"AttributeName": "SK", "AttributeType": "S"},
+            ],
+        )
+        yield TABLE_NAME
+    aws_clients.reset_clients()
+
+
+@pytest.fixture
+def fetcher_table(table, monkeypatch):  # pylint: disable=redefined-outer-name
+    """Point the blog fetcher at the mocked table."""
+    import main  # pylint: disable=import-outside-toplevel
+
+    monkeypatch.setattr(main, "table_name", table)
+    monkeypatch.setattr(main, "known_content_hashes", {})
+    return table
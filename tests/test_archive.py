@@ -0,0 +1,50 @@
+"""Tests of the packing of archive segments."""
+import os
+
+import archive
+import blog_posts
+
+
+def posts(count, title_bytes=100, month="2026-08"):
+    """Return `count` posts sorted by sort key, with incompressible titles."""
+    return [
+        dict(
+            blog_posts.key(f"{month}-{day % 28 + 1:02d}T00:00:00+0000#{day:04d}"),
+            title={"S": os.urandom(title_bytes).hex()},
+        )
+        for day in range(count)
+    ]
+
+
+def test_pack_keeps_a_month_that_fits_in_one_segment():
+    """A segment records its first and last sort key and its posts."""
+    items = sorted(posts(10), key=lambda item: item["SK"]["S"])
+    [segment] = archive.pack(items)
+    assert segment["PK"] == {"S": archive.ARCHIVE_PARTITION}
+    assert segment["SK"] == items[0]["SK"]
+    assert segment["last_sort_key"] == items[-1]["SK"]
+    assert segment["post_count"] == {"N": "10"}
+    assert archive.decode(segment["posts"]["B"]) == items
+
+
+def test_pack_splits_a_month_over_segments_that_fit(monkeypatch):
+    """Segments are halved until they fit, in sort key order, without losing posts."""
+    monkeypatch.setattr(archive, "MAX_SEGMENT_BYTES", 4096)
+    items = sorted(posts(64), key=lambda item: item["SK"]["S"])
+    segments = archive.pack(items)
+    assert len(segments) > 1
+    assert all(len(segment["posts"]["B"]) <= 4096 for segment in segments)
+    unpacked = [
+        post for segment in segments for post in archive.decode(segment["posts"]["B"])
+    ]
+    assert unpacked == items
+    for previous, segment in zip(segments, segments[1:]):
+        assert previous["last_sort_key"]["S"] < segment["SK"]["S"]
+
+
+def test_pack_keeps_a_post_too_large_for_a_segment_on_its_own(monkeypatch):
+    """A single post is never split."""
+    monkeypatch.setattr(archive, "MAX_SEGMENT_BYTES", 100)
+    items = sorted(posts(3, title_bytes=200), key=lambda item: item["SK"]["S"])
+    segments = archive.pack(items)
+    assert [segment["post_count"]["N"] for segment in segments] == ["1", "1", "1"]
@@ -0,0 +1,115 @@
+"""Tests of how the blog fetcher stores blogs."""
+from unittest import mock
+
+import pytest
+from botocore.exceptions import ClientError
+
+import blog_posts
+import main
+
+
+def blog(number, **fields):
+    """Return a parsed blog."""
+    return dict(
+        {
+            "item_url": f"https://aws.amazon.com/blogs/compute/post-{number}/",
+            "date_created": f"2026-12-{number:02d}T10:00:00+0000",
+            "date_updated": f"2026-12-{number:02d}T10:00:00+0000",
+            "title": f"Post {number}",
+            "main_category": "compute",
+            "categories": ["compute"],
+            "authors": ["Jane Doe"],
+            "source": main.DEFAULT_SOURCE["name"],
+        },
+        **fields,
+    )
+
+
+def client_error(code, status_code=400):
+    """Return a ClientError of DynamoDB."""
+    return ClientError(
+        {
+            "Error": {"Code": code, "Message": code},
+            "ResponseMetadata": {"HTTPStatusCode": status_code},
+        },
+        "PutItem",
+    )
+
+
+def stored(table_name, parsed_blog):
+    """Return the item of a blog, or None when it was not stored."""
+    return blog_posts.get_item(table_name, main.blog_sort_key(parsed_blog))
+
+
+def test_stores_every_blog(fetcher_table):
+    """All blogs are processed and stored."""
+    blogs = [blog(1), blog(2)]
+    assert main.store_blogs_in_ddb(blogs) == blogs
+    assert all(stored(fetcher_table, parsed) for parsed in blogs)
+
+
+def test_skips_a_blog_that_cannot_be_stored(fetcher_table):
+    """A blog DynamoDB rejects is skipped, the blogs after it are stored."""
+    blogs = [blog(1), blog(2, title="x" * 500 * 1024), blog(3)]
+    assert main.store_blogs_in_ddb(blogs) == blogs
+    assert stored(fetcher_table, blogs[0]) and stored(fetcher_table, blogs[2])
+    assert stored(fetcher_table, blogs[1]) is None
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        client_error("ProvisionedThroughputExceededException"),
+        client_error("ThrottlingException"),
+        client_error("InternalServerError", 500),
+    ],
+)
+@pytest.mark.usefixtures("fetcher_table")
+def test_stops_at_a_transient_error(error):
+    """The blogs from the failed one on are left to the next run."""
+    blogs = [blog(1), blog(2), blog(3)]
+    with mock.patch.object(
+        main, "store_blog_in_ddb", side_effect=[None, error, None]
+    ) as store:
+        assert main.store_blogs_in_ddb(blogs) == blogs[:1]
+    assert store.call_count == 2
+
+
+@pytest.mark.usefixtures("fetcher_table")
+def test_skips_a_validation_error():
+    """A ValidationException would fail on every run, so the blog is skipped."""
+    blogs = [blog(1), blog(2), blog(3)]
+    with mock.patch.object(
+        main,
+        "store_blog_in_ddb",
+        side_effect=[None, client_error("ValidationException"), None],
+    ) as store:
+        assert main.store_blogs_in_ddb(blogs) == blogs
+    assert store.call_count == 3
+
+
+def test_stores_defaults_for_missing_categories_and_authors(fetcher_table):
+    """DynamoDB rejects empty string sets, the posters need a category and authors."""
+    parsed = blog(1, main_category=None, categories=[], authors=["", None])
+    main.store_blogs_in_ddb([parsed])
+    item = stored(fetcher_table, parsed)
+    assert item["main_category"] == {"S": main.UNCATEGORIZED}
+    assert item["categories"] == {"SS": [main.UNCATEGORIZED]}
+    assert item["authors"] == {"SS": [main.DEFAULT_AUTHOR]}
+
+
+def test_updates_a_post_stored_in_the_legacy_partition(fetcher_table):
+    """A post the previous fetcher stored in the legacy partition is not stored twice."""
+    parsed = blog(1)
+    legacy_item = main.build_ddb_item(parsed)
+    legacy_item["PK"] = {"S": blog_posts.LEGACY_PARTITION}
+    main.get_client("dynamodb").put_item(TableName=fetcher_table, Item=legacy_item)
+
+    with mock.patch.object(main, "send_update_signal"):
+        main.store_blogs_in_ddb([dict(parsed, title="Edited")])
+
+    items = main.get_client("dynamodb").scan(TableName=fetcher_table)["Items"]
+    posts = [item for item in items if blog_posts.is_blog_post(item["PK"]["S"])]
+    assert [(post["PK"]["S"], post["title"]["S"]) for post in posts] == [
+        (blog_posts.LEGACY_PARTITION, "Edited")
+    ]
@@ -0,0 +1,67 @@
+"""Tests of the keys and queries of the BlogPost items."""
+import aws_clients
+import blog_posts
+
+
+def put_post(table_name, sort_key, partition=None):
+    """Store a BlogPost with only its key."""
+    aws_clients.get_client("dynamodb").put_item(
+        TableName=table_name, Item=blog_posts.key(sort_key, partition)
+    )
+
+
+def test_partition_key():
+    """Posts from SHARDED_SINCE on are partitioned by month, older ones are not."""
+    assert blog_posts.partition_key("2026-10-31T23:59:59+0000#a") == "BlogPost"
+    assert blog_posts.partition_key("2026-11-01T00:00:00+0000#a") == "BlogPost#2026-11"
+
+
+def test_partitions_are_newest_first_with_the_legacy_partition_last():
+    """A range over the turn of the year lists every month partition of it."""
+    assert blog_posts.partitions("2026-12-15", "2027-02-01T00:00:00+0000#a") == [
+        "BlogPost#2027-02",
+        "BlogPost#2027-01",
+        "BlogPost#2026-12",
+        "BlogPost",
+    ]
+
+
+def test_partitions_start_at_sharded_since():
+    """No month partitions exist before SHARDED_SINCE."""
+    assert blog_posts.partitions("2020-01-01", "2026-12-31") == [
+        "BlogPost#2026-12",
+        "BlogPost#2026-11",
+        "BlogPost",
+    ]
+    assert blog_posts.partitions(None, "2026-10-31") == ["BlogPost"]
+
+
+def test_oldest_returns_none_without_posts(table):
+    """An empty range has no oldest post."""
+    assert blog_posts.oldest(table, "2026-01-01", "2027-12-31") is None
+
+
+def test_oldest_finds_the_oldest_month(table):
+    """The first month partition with a post ends the search."""
+    put_post(table, "2027-01-03T00:00:00+0000#c")
+    put_post(table, "2026-12-02T00:00:00+0000#b")
+    put_post(table, "2026-12-01T00:00:00+0000#a")
+    oldest = blog_posts.oldest(table, "2026-11-01", "2027-12-31")
+    assert oldest["SK"]["S"] == "2026-12-01T00:00:00+0000#a"
+
+
+def test_oldest_includes_the_legacy_partition(table):
+    """Posts in the legacy partition count, also ones from after SHARDED_SINCE."""
+    put_post(table, "2026-12-01T00:00:00+0000#b")
+    put_post(table, "2026-11-15T00:00:00+0000#a", blog_posts.LEGACY_PARTITION)
+    oldest = blog_posts.oldest(table, "2026-11-01", "2027-12-31")
+    assert oldest["SK"]["S"] == "2026-11-15T00:00:00+0000#a"
+    assert oldest["PK"]["S"] == blog_posts.LEGACY_PARTITION
+
+
+def test_oldest_keeps_to_the_range(table):
+    """Posts before `since` are not returned."""
+    put_post(table, "2026-05-01T00:00:00+0000#old")
+    put_post(table, "2026-12-01T00:00:00+0000#a")
+    oldest = blog_posts.oldest(table, "2026-11-01", "2027-12-31")
+    assert oldest["SK"]["S"] == "2026-12-01T00:00:00+0000#a"
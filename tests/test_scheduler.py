@@ -0,0 +1,94 @@
+"""Tests of the adaptive polling schedule."""
+from datetime import datetime, timezone
+
+import pytest
+
+import scheduler
+
+MONDAY_9 = datetime(2026, 10, 19, 9, 30, tzinfo=timezone.utc)
+
+
+def test_build_profile_averages_posts_per_weekday_and_hour():
+    """Posts are counted in UTC per (weekday, hour) and averaged over the weeks."""
+    profile = scheduler.build_profile(
+        [
+            "2026-10-19T09:05:00+0000",
+            "2026-10-19T09:55:00+0000",
+            "2026-10-12T11:10:00+0200",  # 09:10 UTC
+            "2026-10-20T23:30:00-0100",  # Wednesday 00:30 UTC
+        ],
+        weeks=2,
+    )
+    assert profile == {(0, 9): 1.5, (2, 0): 0.5}
+
+
+def test_poll_interval_is_the_maximum_without_posts():
+    """Hours without posts are polled at MAX_POLL_INTERVAL."""
+    assert scheduler.poll_interval({}, MONDAY_9) == scheduler.MAX_POLL_INTERVAL
+
+
+@pytest.mark.parametrize(
+    "rate, interval",
+    [
+        (0.1, scheduler.MAX_POLL_INTERVAL),  # 60 minutes, capped
+        (1.0, 6),
+        (3.0, 2),
+        (100.0, scheduler.MIN_POLL_INTERVAL),  # under a minute, floored
+    ],
+)
+def test_poll_interval_follows_the_rate_of_the_hour(rate, interval):
+    """The interval leaves POLLS_PER_POST polls per expected post, within the bounds."""
+    assert scheduler.poll_interval({(0, 9): rate}, MONDAY_9) == interval
+
+
+def test_poll_interval_speeds_up_before_a_busy_hour():
+    """The rate of the next hour counts, also across midnight."""
+    assert scheduler.poll_interval({(0, 10): 3.0}, MONDAY_9) == 2
+    sunday_night = datetime(2026, 10, 18, 23, 15, tzinfo=timezone.utc)
+    assert scheduler.poll_interval({(0, 0): 3.0}, sunday_night) == 2
+
+
+def test_schedule_expression():
+    """Rate expressions use the singular for one minute."""
+    assert scheduler.schedule_expression(1) == "rate(1 minute)"
+    assert scheduler.schedule_expression(5) == "rate(5 minutes)"
+
+
+def test_update_schedule_reads_the_rule_again_when_its_copy_is_old(monkeypatch):
+    """A rule changed elsewhere is put back once the copy of its expression is too old."""
+    from moto import mock_aws  # pylint: disable=import-outside-toplevel
+
+    import aws_clients  # pylint: disable=import-outside-toplevel
+
+    monkeypatch.setattr(scheduler, "RULE_NAME", "fetcher-schedule")
+    monkeypatch.setattr(scheduler, "get_profile", lambda _table_name: {})
+    monkeypatch.setattr(scheduler, "_current_expression", None)
+    clock = [1000.0]
+    monkeypatch.setattr(scheduler.time, "time", lambda: clock[0])
+    with mock_aws():
+        aws_clients.reset_clients()
+        events = aws_clients.get_client("events")
+        events.put_rule(Name="fetcher-schedule", ScheduleExpression="rate(1 minute)")
+        expected = scheduler.schedule_expression(scheduler.MAX_POLL_INTERVAL)
+
+        scheduler.update_schedule("blogs")
+        assert (
+            events.describe_rule(Name="fetcher-schedule")["ScheduleExpression"]
+            == expected
+        )
+
+        # Another container, or a deployment, changes the rule
+        events.put_rule(Name="fetcher-schedule", ScheduleExpression="rate(1 minute)")
+        scheduler.update_schedule("blogs")
+        assert (
+            events.describe_rule(Name="fetcher-schedule")["ScheduleExpression"]
+            == "rate(1 minute)"
+        )
+
+        clock[0] += scheduler.RULE_MAX_AGE + 1
+        scheduler.update_schedule("blogs")
+        assert (
+            events.describe_rule(Name="fetcher-schedule")["ScheduleExpression"]
+            == expected
+        )
+    aws_clients.reset_clients()
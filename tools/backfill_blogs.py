@@ -0,0 +1,252 @@
+"""
+Tool to backfill the blogs table from the full history of the AWS blogs API.
+
+The live blog fetcher only looks at the latest MAX_BLOG_PAGES pages. This tool
+walks as many pages as the API returns, with a bounded number of pages in
+flight, using the parsing and item format of the blog fetcher. Writes are
+batched and idempotent: items that already exist, including Authors with a
+Twitter handle, are never overwritten. Posts of archived months exist in the
+archive only, once the TTL deleted their items; those are not stored again
+either. Progress is checkpointed per page to
+a local file, so an interrupted run resumes where it stopped.
+
+Items record the time they were stored, like the ones the live fetcher
+stores. With --no-post the items are marked as backfilled: the stream pipe
+filters them out, so no tweets or toots are posted. Without it, new items
+are posted like the ones of the live fetcher.
+
+Pages are addressed by offset from the newest post, so posts published
+during a long run shift items across page boundaries. Run the tool a second
+time without a checkpoint to pick up anything that was missed.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, List, Optional, Set, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(ROOT_DIR, "resources", "functions", "blog_fetcher"),
+    os.path.join(ROOT_DIR, "resources", "layers", "common", "python"),
+]
+
+import archive  # noqa: E402 pylint: disable=wrong-import-position
+import blog_posts  # noqa: E402 pylint: disable=wrong-import-position
+import main as blog_fetcher  # noqa: E402 pylint: disable=wrong-import-position
+from aws_clients import get_client  # noqa: E402 pylint: disable=wrong-import-position
+
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
+MAX_RETRIES = 8
+
+
+class Checkpoint:
+    """Set of completed pages, persisted to a JSON file after every page."""
+
+    def __init__(self, path: str):
+        """Load the checkpoint from `path`, if it exists."""
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {"completed_pages": [], "stored_posts": 0, "last_page": None}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as checkpoint_file:
+                self.state = json.load(checkpoint_file)
+        self._completed = set(self.state["completed_pages"])
+
+    def is_done(self, page: int) -> bool:
+        """Return whether a page was processed in an earlier run."""
+        return page in self._completed
+
+    def mark_done(self, page: int, stored_posts: int) -> None:
+        """Record a processed page and write the checkpoint atomically."""
+        with self._lock:
+            self._completed.add(page)
+            self.state["completed_pages"] = sorted(self._completed)
+            self.state["stored_posts"] += stored_posts
+            self._write()
+
+    def mark_last_page(self, page: int) -> None:
+        """Record the first page that returned no items."""
+        with self._lock:
+            self.state["last_page"] = page
+            self._write()
+
+    def _write(self) -> None:
+        """Write the state to a temporary file and move it into place."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(self.state, checkpoint_file)
+        os.replace(tmp_path, self.path)
+
+
+def chunks(items: list, size: int) -> Iterable[list]:
+    """Split a list into chunks of at most `size` items."""
+    for index in range(0, len(items), size):
+        yield items[index:][:size]
+
+
+def existing_keys(keys: List[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+    """Return which (PK, SK) keys already exist in the table."""
+    found = set()
+    for chunk in chunks(keys, BATCH_GET_SIZE):
+        request = {
+            blog_fetcher.table_name: {
+                "Keys": [{"PK": {"S": pk}, "SK": {"S": sk}} for pk, sk in chunk],
+                "ProjectionExpression": "PK, SK",
+            }
+        }
+        for attempt in range(MAX_RETRIES):
+            response = get_client("dynamodb").batch_get_item(RequestItems=request)
+            for item in response["Responses"].get(blog_fetcher.table_name, []):
+                found.add((item["PK"]["S"], item["SK"]["S"]))
+            request = response.get("UnprocessedKeys")
+            if not request:
+                break
+            time.sleep(0.05 * 2**attempt)
+        else:
+            raise RuntimeError("Could not read all keys, giving up")
+    return found
+
+
+def archived_keys(sort_keys: List[str]) -> Set[str]:
+    """Return which sort keys are posts in the archive."""
+    wanted = set(sort_keys)
+    found = set()
+    for segment in archive.segments(
+        blog_fetcher.table_name, min(wanted), max(wanted), with_posts=True
+    ):
+        posts = archive.decode(segment["posts"]["B"])
+        found.update(item["SK"]["S"] for item in posts if item["SK"]["S"] in wanted)
+    return found
+
+
+def batch_write(items: List[dict]) -> None:
+    """Write items in batches, retrying unprocessed items with backoff."""
+    for chunk in chunks(items, BATCH_WRITE_SIZE):
+        request = {
+            blog_fetcher.table_name: [{"PutRequest": {"Item": item}} for item in chunk]
+        }
+        for attempt in range(MAX_RETRIES):
+            response = get_client("dynamodb").batch_write_item(RequestItems=request)
+            request = response.get("UnprocessedItems")
+            if not request:
+                break
+            time.sleep(0.05 * 2**attempt)
+        else:
+            raise RuntimeError("Could not write all items, giving up")
+
+
+def backfill_page(page: int, session, no_post: bool) -> Optional[int]:
+    """Store the new items of one page. Return the number stored, or None past the end."""
+    blogs = blog_fetcher.fetch_blog_page(page, session)
+    if not blogs:
+        return None
+
+    posts = {}
+    for blog in blogs:
+        ddb_item = blog_fetcher.build_ddb_item(blog)
+        # Like the live fetcher, the publisher posts to Mastodon once stored_at is set
+        blog_fetcher.add_stage_times(blog, ddb_item)
+        if no_post:
+            ddb_item["backfilled"] = {"BOOL": True}
+        posts[ddb_item["SK"]["S"]] = ddb_item
+    authors = {author for blog in blogs for author in blog["authors"]}
+
+    # A post of a month partition may still be in the legacy partition
+    post_keys = {
+        sort_key: {(item["PK"]["S"], sort_key), (blog_posts.LEGACY_PARTITION, sort_key)}
+        for sort_key, item in posts.items()
+    }
+    existing = existing_keys(
+        sorted(set().union(*post_keys.values()))
+        + [("Author", author) for author in authors]
+    )
+    new_posts = [
+        item for key, item in sorted(posts.items()) if not post_keys[key] & existing
+    ]
+    # Archived posts whose items the TTL deleted
+    archived = (
+        archived_keys([item["SK"]["S"] for item in new_posts]) if new_posts else set()
+    )
+    new_posts = [item for item in new_posts if item["SK"]["S"] not in archived]
+    new_authors = [
+        {"PK": {"S": "Author"}, "SK": {"S": author}}
+        for author in sorted(authors)
+        if ("Author", author) not in existing
+    ]
+    batch_write(new_posts + new_authors)
+    return len(new_posts)
+
+
+def backfill(arguments) -> None:
+    """Walk the pages with at most `arguments.concurrency` pages in flight."""
+    import requests  # pylint: disable=import-outside-toplevel
+
+    checkpoint = Checkpoint(arguments.checkpoint)
+    last_page = checkpoint.state["last_page"] or arguments.max_pages
+    pages = (
+        page
+        for page in range(arguments.start_page, min(last_page, arguments.max_pages))
+        if not checkpoint.is_done(page)
+    )
+
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=arguments.concurrency)
+    with requests.Session() as session, ThreadPoolExecutor(
+        arguments.concurrency
+    ) as pool:
+        session.mount("https://", adapter)
+        in_flight = {}
+        end_reached = False
+        while True:
+            while not end_reached and len(in_flight) < arguments.concurrency:
+                page = next(pages, None)
+                if page is None:
+                    break
+                future = pool.submit(backfill_page, page, session, arguments.no_post)
+                in_flight[future] = page
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = in_flight.pop(future)
+                stored = future.result()
+                if stored is None:
+                    end_reached = True
+                    checkpoint.mark_last_page(page)
+                    print(f"Page {page} is empty, reached the end of the history")
+                    continue
+                checkpoint.mark_done(page, stored)
+                print(f"Page {page}: stored {stored} new posts")
+
+    print(f"Done, {checkpoint.state['stored_posts']} posts stored in total")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the blogs table")
+    parser.add_argument("-t", "--table", required=True, help="Name of the blogs table")
+    parser.add_argument(
+        "--no-post",
+        action="store_true",
+        help="Mark items as backfilled, do not post them",
+    )
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=8, help="Pages in flight"
+    )
+    parser.add_argument("--start-page", type=int, default=0, help="First page to fetch")
+    parser.add_argument(
+        "--max-pages", type=int, default=10000, help="Stop before this page"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default="backfill_checkpoint.json",
+        help="Checkpoint file to resume from",
+    )
+    argument = parser.parse_args()
+
+    blog_fetcher.table_name = argument.table
+    backfill(argument)
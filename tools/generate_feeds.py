@@ -0,0 +1,81 @@
+"""
+Tool to render the feeds from the blogs table in one go.
+
+The feed generator function patches existing feeds from the events of new
+and updated posts. This tool renders them from scratch, to a local directory
+or an s3://bucket/prefix URL, for example to preview the feeds, to rebuild
+them after a change of the feed size, or to add backfilled or remove deleted
+posts, which have no events.
+"""
+import argparse
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(ROOT_DIR, "resources", "functions", "feed_generator"),
+    os.path.join(ROOT_DIR, "resources", "layers", "common", "python"),
+]
+
+import blog_posts  # noqa: E402 pylint: disable=wrong-import-position
+import feed  # noqa: E402 pylint: disable=wrong-import-position
+import main as feed_generator  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def main_categories() -> list:
+    """Return every main category of the stored blog posts."""
+    categories = set()
+    for item in blog_posts.query(
+        feed_generator.table_name, ProjectionExpression="main_category"
+    ):
+        if "S" in item.get("main_category", {}):
+            categories.add(item["main_category"]["S"])
+    return sorted(categories)
+
+
+def generate(categories: list) -> None:
+    """Render the feed of all posts and of every category in `categories`."""
+    names = [("all", None)] + [
+        feed.feed_names(category, per_category=True)[1] for category in categories
+    ]
+    for name, category in names:
+        document = feed.new_feed(
+            feed_generator.feed_title(category),
+            f"{feed_generator.feed_base_url}{name}.json",
+            [],
+        )
+        latest = [
+            feed.feed_item(item) for item in feed_generator.latest_items(category)
+        ]
+        feed.patch_feed(document, latest, [], feed_generator.feed_size)
+        feed_generator.write_feed(name, document)
+        print(f"Rendered feed {name} with {len(document['items'])} items")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render the feeds from the blogs table"
+    )
+    parser.add_argument("-t", "--table", required=True, help="Name of the blogs table")
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="feeds",
+        help="Directory or s3://bucket/prefix to write to",
+    )
+    parser.add_argument("-n", "--size", type=int, default=50, help="Posts per feed")
+    parser.add_argument(
+        "--base-url", default="", help="Public URL the feeds are served from"
+    )
+    parser.add_argument(
+        "--per-category",
+        action="store_true",
+        help="Also render a feed per main category",
+    )
+    arguments = parser.parse_args()
+
+    feed_generator.table_name = arguments.table
+    feed_generator.feed_sink_url = arguments.output
+    feed_generator.feed_size = arguments.size
+    feed_generator.feed_base_url = arguments.base_url
+    generate(main_categories() if arguments.per_category else [])
@@ -0,0 +1,114 @@
+"""
+Tool to report the publication-to-post latency of the stored blog posts.
+
+Reads the stage timestamps of the BlogPost items created in a date range,
+from the table and its archive, and prints the p50, p95 and p99 latency of
+every stage: the time from date_created to when the post was fetched,
+stored, tweeted, threaded and tooted. Posts that were backfilled or that did
+not reach a stage are left out of that stage.
+
+    python tools/latency_report.py -t TABLE --since 2026-07-01 --until 2026-10-01
+"""
+import argparse
+import math
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT_DIR, "resources", "layers", "common", "python")]
+
+import archive  # noqa: E402 pylint: disable=wrong-import-position
+import latency  # noqa: E402 pylint: disable=wrong-import-position
+
+PERCENTILES = [50, 95, 99]
+DEFAULT_DAYS = 30
+
+
+def query_blog_posts(
+    table_name: str, since: str, until: Optional[str]
+) -> Iterator[dict]:
+    """Yield the stage timestamps of the BlogPost items created in [since, until)."""
+    attributes = ["date_created", "backfilled"] + [
+        latency.attribute(stage) for stage in latency.STAGES
+    ]
+    # Sort keys start with the creation date, so the date sorts before every key of that day
+    return archive.query(
+        table_name, since, until, ProjectionExpression=", ".join(attributes)
+    )
+
+
+def stage_latencies(items: Iterator[dict]) -> Dict[str, List[float]]:
+    """Return the latencies in seconds of every stage, sorted."""
+    latencies: Dict[str, List[float]] = {stage: [] for stage in latency.STAGES}
+    for item in items:
+        if "backfilled" in item or "S" not in item.get("date_created", {}):
+            continue
+        for stage in latency.STAGES:
+            timestamp = item.get(latency.attribute(stage), {}).get("S")
+            if timestamp:
+                latencies[stage].append(
+                    latency.seconds_between(item["date_created"]["S"], timestamp)
+                )
+    for values in latencies.values():
+        values.sort()
+    return latencies
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Return the nearest-rank percentile of sorted values."""
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def format_duration(seconds: float) -> str:
+    """Format a latency as hours, minutes and seconds."""
+    sign = "-" if seconds < 0 else ""
+    minutes, seconds = divmod(int(round(abs(seconds))), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{sign}{hours}h{minutes:02d}m"
+    return f"{sign}{minutes}m{seconds:02d}s"
+
+
+def report(arguments) -> None:
+    """Print the latency percentiles of every stage."""
+    since = arguments.since or (
+        datetime.now(timezone.utc) - timedelta(days=DEFAULT_DAYS)
+    ).strftime("%Y-%m-%d")
+    latencies = stage_latencies(
+        query_blog_posts(arguments.table, since, arguments.until)
+    )
+
+    print(f"Posts created from {since} to {arguments.until or 'now'}")
+    print(
+        f"{'stage':<10}{'posts':>7}"
+        + "".join(f"{f'p{percent}':>10}" for percent in PERCENTILES)
+    )
+    for stage in latency.STAGES:
+        values = latencies[stage]
+        columns = [
+            format_duration(percentile(values, percent)) if values else "-"
+            for percent in PERCENTILES
+        ]
+        print(
+            f"{stage:<10}{len(values):>7}"
+            + "".join(f"{column:>10}" for column in columns)
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the latency from publication to each posting stage"
+    )
+    parser.add_argument("-t", "--table", required=True, help="Name of the blogs table")
+    parser.add_argument(
+        "--since",
+        help="Only posts created on or after this date, e.g. 2026-07-01, "
+        f"{DEFAULT_DAYS} days ago by default",
+    )
+    parser.add_argument(
+        "--until", help="Only posts created before this date, e.g. 2026-10-01"
+    )
+    report(parser.parse_args())
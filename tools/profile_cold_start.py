@@ -0,0 +1,150 @@
+"""
+Tool to report the init (cold start) time of every Lambda function.
+
+Each handler module is imported in a fresh interpreter with `-X importtime`,
+the same way the Lambda runtime imports it during the init phase. The total
+init time and the slowest imports are reported per function and compared
+against a stored baseline, so import regressions show up before deploying.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMON_LAYER_DIR = os.path.join(ROOT_DIR, "resources", "layers", "common", "python")
+BASELINE_FILE = os.path.join(ROOT_DIR, "tools", "cold_start_baseline.json")
+
+FUNCTIONS = {
+    "blog_fetcher": "main",
+    "publisher": "main",
+    "excerpt_poster": "main",
+}
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "print((time.perf_counter() - start) * 1000)"
+)
+
+
+def profile_function(function_name: str, module: str, extra_paths: List[str]) -> dict:
+    """Import a handler module in a fresh interpreter and parse the import times."""
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([COMMON_LAYER_DIR, *extra_paths]),
+        "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "eu-west-1"),
+    }
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            IMPORT_SNIPPET.format(module=module),
+        ],
+        cwd=os.path.join(ROOT_DIR, "resources", "functions", function_name),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {function_name} failed:\n{result.stderr}")
+
+    # importtime prints children before their parent, indented by depth. Keep
+    # the direct imports of the handler module, they include their children.
+    imports = []
+    pending = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entry = {
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        }
+        if depth == 1:
+            pending.append(entry)
+        elif depth == 0:
+            if entry["module"] == module:
+                imports = [*pending, entry]
+            pending = []
+
+    return {
+        "init_ms": float(result.stdout.strip().splitlines()[-1]),
+        "imports": sorted(imports, key=lambda x: x["cumulative_ms"], reverse=True),
+    }
+
+
+def load_baseline() -> Dict[str, float]:
+    """Load the stored baseline of init times per function."""
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, encoding="utf-8") as baseline_file:
+        return json.load(baseline_file)
+
+
+def main():
+    """Profile all functions, print a report and compare it with the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "-p",
+        "--path",
+        action="append",
+        default=[],
+        help="Extra path with installed layer packages (can be repeated)",
+    )
+    parser.add_argument(
+        "-r", "--runs", type=int, default=3, help="Runs per function, best is kept"
+    )
+    parser.add_argument(
+        "-t",
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed relative regression against the baseline",
+    )
+    parser.add_argument("-n", "--top", type=int, default=5, help="Imports to show")
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="Store the results as baseline"
+    )
+    arguments = parser.parse_args()
+
+    baseline = load_baseline()
+    results = {}
+    regressions = []
+    for function_name, module in FUNCTIONS.items():
+        runs = [
+            profile_function(function_name, module, arguments.path)
+            for _ in range(arguments.runs)
+        ]
+        best = min(runs, key=lambda x: x["init_ms"])
+        results[function_name] = round(best["init_ms"], 1)
+
+        line = f"{function_name:<16} init {best['init_ms']:8.1f} ms"
+        if function_name in baseline:
+            change = best["init_ms"] / baseline[function_name] - 1
+            line += f" (baseline {baseline[function_name]:.1f} ms, {change:+.0%})"
+            if change > arguments.tolerance:
+                regressions.append(function_name)
+        print(line)
+        for entry in best["imports"][: arguments.top]:
+            print(f"    {entry['cumulative_ms']:8.1f} ms  {entry['module']}")
+
+    if arguments.update_baseline:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        print(f"Stored baseline in {BASELINE_FILE}")
+
+    if regressions:
+        print(f"Init time regressed for: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+"""
+Tool to move failed messages from a dead letter queue back into the pipeline.
+
+Every kind of DLQ is moved back to where its messages came from:
+
+    publish         TwitterPostDLQ to the TwitterPostQueue of the publisher
+    publish-event   PublishEventDLQ, the NewAWSBlogFound events the publisher
+                    failed on or the rule could not deliver, to the
+                    TwitterPostQueue
+    twitter-thread  TwitterThreadDLQ to the TwitterThreadQueue
+    pipe            NewArticleFoundPipeDlq to the event bus: the stream
+                    records the pipe could not deliver are read from the
+                    stream again and published as NewAWSBlogFound events
+
+The DLQ is drained in batches. The messages of a batch are moved oldest blog
+post first, as the sort keys start with the creation date, and paced to
+--rate moves per minute, by default the posts per minute of the Twitter
+adapter, so the posters stay within the rate limits of the platforms. Posts
+that were posted in the meantime, because they have a tweet_id or a digest
+tweet and the toot of every Mastodon account that posts their category, or
+an excerpt thread, are removed from the DLQ without being moved. The
+accounts are read from --mastodon-targets, by default MASTODON_TARGETS as
+the publisher does. The publisher only posts a moved post to
+the platforms it is missing from. A moved post that is claimed for a tweet
+by a delivery that failed, and has no tweet_id, has its claim released
+first: the moved message is a new delivery, that would leave the post to the
+claim until it expires. Messages that cannot be moved stay in the DLQ.
+
+Queues can be given as a URL or as a part of their name that is unique in
+the account, by default the construct ID of the queue, like TwitterPostDLQ.
+The pipe reads the stream of the last 24 hours only, older pipe failures
+cannot be moved back.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT_DIR, "resources", "layers", "common", "python")]
+
+import blog_posts  # noqa: E402 pylint: disable=wrong-import-position
+import excerpt_thread  # noqa: E402 pylint: disable=wrong-import-position
+import latency  # noqa: E402 pylint: disable=wrong-import-position
+from aws_clients import get_client  # noqa: E402 pylint: disable=wrong-import-position
+
+# posts_per_minute of the Twitter adapter, the lowest rate limit of the posters
+POSTS_PER_MINUTE = 10
+KINDS = {
+    "publish": {
+        "dlq": "TwitterPostDLQ",
+        "target": "TwitterPostQueue",
+        "rate": POSTS_PER_MINUTE,
+    },
+    "publish-event": {
+        "dlq": "PublishEventDLQ",
+        "target": "TwitterPostQueue",
+        "rate": POSTS_PER_MINUTE,
+    },
+    "twitter-thread": {
+        "dlq": "TwitterThreadDLQ",
+        "target": "TwitterThreadQueue",
+        "rate": POSTS_PER_MINUTE,
+    },
+    "pipe": {
+        "dlq": "NewArticleFoundPipeDlq",
+        "target": "aws_blogs_event_bus",
+        "rate": POSTS_PER_MINUTE,
+    },
+}
+# The accounts of the Mastodon adapter when MASTODON_TARGETS is not set
+DEFAULT_MASTODON_TARGETS = [{"name": "default"}]
+EVENT_STRING_FIELDS = [
+    "blog_url",
+    "date_created",
+    "date_updated",
+    "title",
+    "post_excerpt",
+    "main_category",
+    "featured_image_url",
+]
+BATCH_GET_SIZE = 100
+RECEIVE_BATCH_SIZE = 10  # SQS limit
+MAX_RETRIES = 8
+
+
+class Pacer:
+    """Spaces calls to at most `rate` per minute."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, rate: float):
+        """Create a pacer that allows the first call right away."""
+        self.interval = 60 / rate
+        self.next_at = time.monotonic()
+
+    def wait(self) -> None:
+        """Sleep until the next call is allowed."""
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + self.interval
+
+
+def resolve_queue(queue: str) -> str:
+    """Return the URL of a queue given as URL or as a unique part of its name."""
+    if queue.startswith("https://"):
+        return queue
+    urls = []
+    for page in get_client("sqs").get_paginator("list_queues").paginate():
+        urls += [
+            url for url in page.get("QueueUrls", []) if queue in url.rsplit("/", 1)[-1]
+        ]
+    if len(urls) != 1:
+        raise SystemExit(
+            f"Found {len(urls)} queues matching {queue}, give its URL instead"
+        )
+    return urls[0]
+
+
+def receive_batch(dlq_url: str, size: int, visibility_timeout: int) -> List[dict]:
+    """Receive up to `size` messages, hidden from other consumers for the run of a batch."""
+    messages: Dict[str, dict] = {}
+    while len(messages) < size:
+        received = (
+            get_client("sqs")
+            .receive_message(
+                QueueUrl=dlq_url,
+                MaxNumberOfMessages=min(RECEIVE_BATCH_SIZE, size - len(messages)),
+                VisibilityTimeout=visibility_timeout,
+                WaitTimeSeconds=1,
+                AttributeNames=["All"],
+            )
+            .get("Messages", [])
+        )
+        new = [message for message in received if message["MessageId"] not in messages]
+        if not new:
+            break
+        messages.update((message["MessageId"], message) for message in new)
+    return list(messages.values())
+
+
+def message_sort_keys(kind: str, message: dict) -> List[str]:
+    """Return the sort keys of the blog posts in a queue message."""
+    if kind == "publish-event":
+        return [failed_event(json.loads(message["Body"]))["detail"]["data"]["sort_key"]]
+    return [message["Body"]]
+
+
+def failed_event(body: dict) -> dict:
+    """
+    Return the event of a PublishEventDLQ message.
+
+    The failure destination of the publisher wraps the event in a record of
+    the failed invocation, with the event as its requestPayload. The rule
+    sends the events it could not deliver as they are.
+    """
+    return body.get("requestPayload", body)
+
+
+def pipe_events(message: dict) -> List[dict]:
+    """Read the stream records of a pipe DLQ message and rebuild the events of the pipe."""
+    batch = json.loads(message["Body"])["DDBStreamBatchInfo"]
+    streams = get_client("dynamodbstreams")
+    shard_iterator = streams.get_shard_iterator(
+        StreamArn=batch["streamArn"],
+        ShardId=batch["shardId"],
+        ShardIteratorType="AT_SEQUENCE_NUMBER",
+        SequenceNumber=batch["startSequenceNumber"],
+    )["ShardIterator"]
+    end = int(batch["endSequenceNumber"])
+
+    events = []
+    while shard_iterator:
+        response = streams.get_records(ShardIterator=shard_iterator)
+        for record in response["Records"]:
+            if int(record["dynamodb"]["SequenceNumber"]) > end:
+                return events
+            image = record["dynamodb"].get("NewImage", {})
+            if (
+                record["eventName"] == "INSERT"
+                and blog_posts.is_blog_post(record["dynamodb"]["Keys"]["PK"]["S"])
+                and "backfilled" not in image
+            ):
+                events.append(pipe_event_detail(record))
+        if not response["Records"]:
+            break
+        shard_iterator = response.get("NextShardIterator")
+    return events
+
+
+def pipe_event_detail(record: dict) -> dict:
+    """Build the detail of a NewAWSBlogFound event like the input template of the pipe."""
+    image = record["dynamodb"]["NewImage"]
+    data = {"sort_key": record["dynamodb"]["Keys"]["SK"]["S"]}
+    data.update(
+        (name, image.get(name, {}).get("S", "")) for name in EVENT_STRING_FIELDS
+    )
+    data.update(
+        categories=image.get("categories", {}).get("SS", []),
+        authors=image.get("authors", {}).get("SS", []),
+    )
+    return {
+        "metadata": {
+            "event_id": record["eventID"],
+            "event_time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "event_version": 1,
+        },
+        "data": data,
+    }
+
+
+def get_items(table: str, sort_keys: Iterable[str]) -> Dict[str, dict]:
+    """Return the BlogPost items of the sort keys that exist, by sort key."""
+    # A post of a month partition may still be in the legacy partition
+    keys = sorted(
+        {
+            (partition, key)
+            for key in set(sort_keys)
+            for partition in (
+                blog_posts.partition_key(key),
+                blog_posts.LEGACY_PARTITION,
+            )
+        }
+    )
+    items = {}
+    for index in range(0, len(keys), BATCH_GET_SIZE):
+        batch = keys[index:][:BATCH_GET_SIZE]
+        request = {
+            table: {
+                "Keys": [blog_posts.key(key, partition) for partition, key in batch]
+            }
+        }
+        for attempt in range(MAX_RETRIES):
+            response = get_client("dynamodb").batch_get_item(RequestItems=request)
+            for item in response["Responses"].get(table, []):
+                items[item["SK"]["S"]] = item
+            request = response.get("UnprocessedKeys")
+            if not request:
+                break
+            time.sleep(0.05 * 2**attempt)
+        else:
+            raise RuntimeError("Could not read all items, giving up")
+    return items
+
+
+def already_posted(
+    kind: str, item: Optional[dict], mastodon_targets: List[dict]
+) -> Optional[str]:
+    """Return why a blog post does not need to be moved back, or None when it does."""
+    if item is None:
+        return "the blog post does not exist"
+    if kind == "twitter-thread":
+        return "the thread was posted" if excerpt_thread.is_complete(item) else None
+    if not all(tooted(target, item) for target in mastodon_targets):
+        return None
+    if "tweet_id" in item:
+        return f"tweet {item['tweet_id']['S']} and the toots were posted"
+    if "digest_tweet_id" in item:
+        return f"digest {item['digest_tweet_id']['S']} and the toots were posted"
+    return None
+
+
+def tooted(target: dict, item: dict) -> bool:
+    """Return whether a Mastodon account posted a blog, or does not post its category."""
+    # Like MastodonAdapter.accepts and is_published
+    if "categories" in target and (
+        item["main_category"].get("S") not in target["categories"]
+    ):
+        return True
+    return (
+        f"toot_id_{target['name']}" in item or latency.attribute("stored") not in item
+    )
+
+
+def release_claim(table: str, item: dict) -> None:
+    """Release the tweet claim of a failed delivery on a blog post that has no tweet."""
+    # pylint: disable-next=import-outside-toplevel
+    from botocore.exceptions import ClientError
+
+    try:
+        get_client("dynamodb").update_item(
+            TableName=table,
+            Key={"PK": item["PK"], "SK": item["SK"]},
+            UpdateExpression="REMOVE tweet_claim, tweet_claim_expires",
+            ConditionExpression="tweet_claim = :delivery_id AND attribute_not_exists(tweet_id)",
+            ExpressionAttributeValues={":delivery_id": item["tweet_claim"]},
+        )
+    except ClientError as exc:
+        if exc.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        return
+    print(
+        f"Released the tweet claim of {item['tweet_claim']['S']} on {item['SK']['S']}"
+    )
+
+
+def move(
+    kind: str, target: str, message: dict, payloads: List[Tuple[str, Optional[dict]]]
+) -> None:
+    """Send the payloads of a DLQ message to the target queue or event bus."""
+    if kind == "pipe":
+        response = get_client("events").put_events(
+            Entries=[
+                {
+                    "EventBusName": target,
+                    "Source": "redrive_dlq",
+                    "DetailType": "NewAWSBlogFound",
+                    "Detail": json.dumps(detail),
+                }
+                for _, detail in payloads
+            ]
+        )
+        if response["FailedEntryCount"]:
+            raise RuntimeError(f"Publishing failed: {response['Entries']}")
+        return
+    for sort_key, _ in payloads:
+        get_client("sqs").send_message(
+            QueueUrl=target,
+            MessageBody=sort_key,
+            MessageGroupId=sort_key,
+            # A rerun after a failed delete does not move the message twice
+            MessageDeduplicationId=message["MessageId"],
+        )
+
+
+def read_payloads(kind: str, message: dict) -> List[Tuple[str, Optional[dict]]]:
+    """Return the sort keys of a DLQ message with the event to publish for each, for the pipe."""
+    if kind == "pipe":
+        return [(event["data"]["sort_key"], event) for event in pipe_events(message)]
+    return [(sort_key, None) for sort_key in message_sort_keys(kind, message)]
+
+
+def redrive_batch(arguments, messages: List[dict], pacer: Pacer) -> Dict[str, int]:
+    """Move the messages of a batch back oldest post first, return the counts per outcome."""
+    entries = []
+    counts = {"moved": 0, "skipped": 0, "failed": 0}
+    for message in messages:
+        try:
+            payloads = read_payloads(arguments.kind, message)
+        except Exception as exc:  # pylint: disable=broad-except
+            print(
+                f"Cannot read message {message['MessageId']}, left in the DLQ: {exc!r}"
+            )
+            counts["failed"] += 1
+            continue
+        entries.append(
+            (min((key for key, _ in payloads), default=""), message, payloads)
+        )
+    entries.sort(key=lambda entry: entry[0])
+
+    sort_keys = (key for _, _, payloads in entries for key, _ in payloads)
+    items = get_items(arguments.table, sort_keys)
+    for _, message, payloads in entries:
+        pending = pending_payloads(arguments, payloads, items)
+        # A tweet claim is left by a failed delivery, the moved message is a new one
+        claimed = [
+            items[sort_key]
+            for sort_key, _ in pending
+            if arguments.kind != "twitter-thread" and "tweet_claim" in items[sort_key]
+        ]
+        if arguments.dry_run:
+            print(f"Would move {', '.join(key for key, _ in pending) or 'nothing'}")
+            for item in claimed:
+                print(f"Would release the tweet claim on {item['SK']['S']}")
+            counts["moved" if pending else "skipped"] += 1
+        else:
+            for item in claimed:
+                release_claim(arguments.table, item)
+            counts[redrive_message(arguments, message, pending, pacer)] += 1
+    return counts
+
+
+def pending_payloads(
+    arguments, payloads: List[Tuple[str, Optional[dict]]], items: Dict[str, dict]
+) -> List[Tuple[str, Optional[dict]]]:
+    """Return the payloads of a message whose blog posts still need to be moved back."""
+    pending = []
+    for sort_key, payload in payloads:
+        reason = already_posted(
+            arguments.kind, items.get(sort_key), arguments.mastodon_targets
+        )
+        if reason:
+            print(f"Skipping {sort_key}: {reason}")
+        else:
+            pending.append((sort_key, payload))
+    return pending
+
+
+def redrive_message(
+    arguments, message: dict, pending: List[Tuple[str, Optional[dict]]], pacer: Pacer
+) -> str:
+    """Move the pending payloads of a message and delete it from the DLQ, return the outcome."""
+    try:
+        if pending:
+            pacer.wait()
+            move(arguments.kind, arguments.target, message, pending)
+        get_client("sqs").delete_message(
+            QueueUrl=arguments.dlq, ReceiptHandle=message["ReceiptHandle"]
+        )
+    except Exception as exc:  # pylint: disable=broad-except
+        print(f"Moving message {message['MessageId']} failed, left in the DLQ: {exc!r}")
+        return "failed"
+    for sort_key, _ in pending:
+        print(f"Moved {sort_key}")
+    return "moved" if pending else "skipped"
+
+
+def redrive(arguments) -> None:
+    """Drain the DLQ batch by batch until it is empty or --max-messages were handled."""
+    kind = KINDS[arguments.kind]
+    # From here on the DLQ and the target are the URLs, or the event bus name
+    arguments.dlq = resolve_queue(arguments.dlq or kind["dlq"])
+    arguments.target = arguments.target or kind["target"]
+    if arguments.kind != "pipe":
+        arguments.target = resolve_queue(arguments.target)
+    rate = arguments.rate or kind["rate"]
+    pacer = Pacer(rate)
+    # Long enough to move a whole batch before its messages become visible again
+    visibility_timeout = (
+        1 if arguments.dry_run else int(arguments.batch_size * 60 / rate) + 60
+    )
+
+    totals = {"moved": 0, "skipped": 0, "failed": 0}
+    handled = 0
+    while handled < arguments.max_messages:
+        size = min(arguments.batch_size, arguments.max_messages - handled)
+        messages = receive_batch(arguments.dlq, size, visibility_timeout)
+        if not messages:
+            break
+        counts = redrive_batch(arguments, messages, pacer)
+        for outcome, count in counts.items():
+            totals[outcome] += count
+        handled += len(messages)
+        if arguments.dry_run:
+            break
+    print(
+        f"{'Dry run' if arguments.dry_run else 'Done'}: {totals['moved']} moved, "
+        f"{totals['skipped']} skipped, {totals['failed']} left in the DLQ"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Move failed messages from a DLQ back into the pipeline"
+    )
+    parser.add_argument("kind", choices=sorted(KINDS), help="The DLQ to redrive")
+    parser.add_argument("-t", "--table", required=True, help="Name of the blogs table")
+    parser.add_argument("--dlq", help="URL or unique part of the name of the DLQ")
+    parser.add_argument(
+        "--target",
+        help="URL or unique part of the name of the queue, or the event bus name",
+    )
+    parser.add_argument(
+        "-r",
+        "--rate",
+        type=float,
+        help=f"Moves per minute, {POSTS_PER_MINUTE} by default",
+    )
+    parser.add_argument(
+        "--mastodon-targets",
+        type=json.loads,
+        default=json.loads(os.environ.get("MASTODON_TARGETS", "[]"))
+        or DEFAULT_MASTODON_TARGETS,
+        help="MASTODON_TARGETS of the publisher as JSON, by default from the environment",
+    )
+    parser.add_argument(
+        "-b", "--batch-size", type=int, default=50, help="Messages per batch"
+    )
+    parser.add_argument(
+        "-n",
+        "--max-messages",
+        type=int,
+        default=10000,
+        help="Stop after this many messages",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only list what would be moved, for one batch",
+    )
+    redrive(parser.parse_args())
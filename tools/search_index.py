@@ -0,0 +1,450 @@
+"""
+Tool to search the stored blog posts from a local full-text index.
+
+`update` exports the BlogPost items from the blogs table and its archive
+and builds an inverted index over their title, excerpt, categories and
+authors. The index remembers the highest sort key it has seen, so later runs
+only query the posts stored since then. Sort keys start with the creation
+date, which makes this a watermark. Edits of posts that are already indexed
+are only picked up by a `--full` rebuild.
+
+`query` memory-maps the index and answers queries without touching
+DynamoDB:
+
+    graviton                      posts that mention graviton
+    graviton AND (arm OR ampere)  AND binds tighter than OR
+    graviton lambda               adjacent terms are combined with AND
+    grav*                         any term starting with grav
+    serverless NOT lambda         NOT excludes posts
+
+--since and --until limit the posts to a range of creation dates.
+
+The index file consists of a header, a document table, a term table sorted
+by term, and the blobs they point into. A term lookup is a binary search
+over the term table. Its postings are a sorted array of 32-bit document
+numbers, read straight from the map. Documents are numbered in sort key
+order, so new posts are appended to the postings and a date range is a
+range of document numbers.
+"""
+import argparse
+import array
+import bisect
+import html
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(ROOT_DIR, "resources", "layers", "common", "python"),
+]
+
+import archive  # noqa: E402 pylint: disable=wrong-import-position
+
+MAGIC = b"BLIX"
+VERSION = 1
+# magic, version, document count, term count, offsets of the metadata, document table and term table
+HEADER = struct.Struct("<4sHxxIIQQQ")
+# offset and length of the document JSON
+DOC_ENTRY = struct.Struct("<QI")
+# offset and length of the term, offset and length of its postings
+TERM_ENTRY = struct.Struct("<QHQI")
+# Postings are arrays of unsigned 32-bit ints in the byte order of the machine,
+# to map them without copying
+POSTING_TYPE = "I"
+POSTING_SIZE = array.array(POSTING_TYPE).itemsize  # pylint: disable=invalid-name
+INDEXED_FIELDS = ("title", "post_excerpt", "main_category", "categories", "authors")
+TOKEN_PATTERN = re.compile(r"\w+")
+QUERY_PATTERN = re.compile(r"\(|\)|[^\s()]+")
+OPERATORS = ("AND", "OR", "NOT")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lower case index terms."""
+    return TOKEN_PATTERN.findall(html.unescape(text).lower())
+
+
+def item_terms(item: dict) -> Set[str]:
+    """Return the terms of a BlogPost item."""
+    terms: Set[str] = set()
+    for field in INDEXED_FIELDS:
+        value = item.get(field, {})
+        for text in value.get("SS", [value["S"]] if "S" in value else []):
+            terms.update(tokenize(text))
+    return terms
+
+
+class IndexBuilder:
+    """In-memory index that is extended with new posts and written to a file."""
+
+    def __init__(self):
+        """Start an empty index."""
+        self.docs: List[list] = []
+        self.postings: Dict[str, List[int]] = {}
+        self.meta = {"watermark": None}
+
+    @classmethod
+    def from_index(cls, index: "Index") -> "IndexBuilder":
+        """Load an existing index to extend it."""
+        builder = cls()
+        builder.meta = dict(index.meta)
+        builder.docs = [index.doc(number) for number in range(index.doc_count)]
+        for term_number in range(index.term_count):
+            term, postings = index.term_at(term_number)
+            builder.postings[term] = list(postings)
+        return builder
+
+    def add(self, item: dict) -> None:
+        """Add a BlogPost item, items must be added in sort key order."""
+        sort_key = item["SK"]["S"]
+        if self.meta["watermark"] is not None and sort_key <= self.meta["watermark"]:
+            return
+        number = len(self.docs)
+        self.docs.append([sort_key, item["title"]["S"], item["blog_url"]["S"]])
+        for term in item_terms(item):
+            self.postings.setdefault(term, []).append(number)
+        self.meta["watermark"] = sort_key
+
+    def write(self, path: str) -> None:
+        """Write the index to a temporary file and move it into place."""
+        self.meta["updated"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        meta_blob = json.dumps(self.meta).encode()
+        doc_blobs = [json.dumps(doc, ensure_ascii=False).encode() for doc in self.docs]
+        terms = sorted(self.postings)
+        term_blobs = [term.encode() for term in terms]
+
+        doc_table_offset = HEADER.size + len(meta_blob)
+        term_table_offset = doc_table_offset + DOC_ENTRY.size * len(doc_blobs)
+        blob_offset = term_table_offset + TERM_ENTRY.size * len(terms)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as index_file:
+            index_file.write(
+                HEADER.pack(
+                    MAGIC,
+                    VERSION,
+                    len(doc_blobs),
+                    len(terms),
+                    HEADER.size,
+                    doc_table_offset,
+                    term_table_offset,
+                )
+            )
+            index_file.write(meta_blob)
+            offset = blob_offset
+            for blob in doc_blobs:
+                index_file.write(DOC_ENTRY.pack(offset, len(blob)))
+                offset += len(blob)
+            for term, blob in zip(terms, term_blobs):
+                postings_offset = offset + len(blob)
+                index_file.write(
+                    TERM_ENTRY.pack(
+                        offset, len(blob), postings_offset, len(self.postings[term])
+                    )
+                )
+                offset = postings_offset + POSTING_SIZE * len(self.postings[term])
+            for blob in doc_blobs:
+                index_file.write(blob)
+            for term, blob in zip(terms, term_blobs):
+                index_file.write(blob)
+                index_file.write(
+                    array.array(POSTING_TYPE, self.postings[term]).tobytes()
+                )
+        os.replace(tmp_path, path)
+
+
+class Index:
+    """Read-only, memory-mapped index file."""
+
+    def __init__(self, path: str):
+        """Map the index file at `path`."""
+        with open(path, "rb") as index_file:
+            self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            self.doc_count,
+            self.term_count,
+            meta_offset,
+            self._doc_table,
+            self._term_table,
+        ) = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} blog index")
+        self.meta = json.loads(self._map[meta_offset : self._doc_table])  # noqa: E203
+
+    def close(self) -> None:
+        """Unmap the index file."""
+        self._map.close()
+
+    def doc(self, number: int) -> list:
+        """Return the sort key, title and URL of a document."""
+        offset, length = DOC_ENTRY.unpack_from(
+            self._map, self._doc_table + number * DOC_ENTRY.size
+        )
+        return json.loads(self._map[offset : offset + length])  # noqa: E203
+
+    def _term_entry(self, term_number: int) -> Tuple[bytes, int, int]:
+        """Return a term, and the offset and length of its postings."""
+        offset, length, postings_offset, postings_count = TERM_ENTRY.unpack_from(
+            self._map, self._term_table + term_number * TERM_ENTRY.size
+        )
+        term = self._map[offset : offset + length]  # noqa: E203
+        return term, postings_offset, postings_count
+
+    def term_at(self, term_number: int) -> Tuple[str, memoryview]:
+        """Return a term and its postings."""
+        term, postings_offset, postings_count = self._term_entry(term_number)
+        return term.decode(), self._postings(postings_offset, postings_count)
+
+    def _postings(self, offset: int, count: int) -> memoryview:
+        """Return a postings array without copying it out of the map."""
+        end = offset + count * POSTING_SIZE
+        return memoryview(self._map)[offset:end].cast(POSTING_TYPE)
+
+    def _bisect(self, term: bytes) -> int:
+        """Return the number of the first term that is not smaller than `term`."""
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._term_entry(middle)[0] < term:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, term: str) -> Set[int]:
+        """Return the documents that contain a term."""
+        encoded = term.encode()
+        number = self._bisect(encoded)
+        if number < self.term_count:
+            found, offset, count = self._term_entry(number)
+            if found == encoded:
+                return set(self._postings(offset, count))
+        return set()
+
+    def lookup_prefix(self, prefix: str) -> Set[int]:
+        """Return the documents that contain a term starting with `prefix`."""
+        encoded = prefix.encode()
+        docs: Set[int] = set()
+        for number in range(self._bisect(encoded), self.term_count):
+            found, offset, count = self._term_entry(number)
+            if not found.startswith(encoded):
+                break
+            docs.update(self._postings(offset, count))
+        return docs
+
+    def doc_range(self, since: Optional[str], until: Optional[str]) -> range:
+        """Return the documents created in [since, until), compared as sort key prefixes."""
+        sort_keys = _SortKeys(self)
+        low = bisect.bisect_left(sort_keys, since) if since else 0
+        high = bisect.bisect_left(sort_keys, until) if until else self.doc_count
+        return range(low, max(low, high))
+
+
+class _SortKeys:
+    """Sequence view of the sort keys of an index, for bisect."""
+
+    def __init__(self, index: Index):
+        self._index = index
+
+    def __len__(self) -> int:
+        return self._index.doc_count
+
+    def __getitem__(self, number: int) -> str:
+        return self._index.doc(number)[0]
+
+
+class QueryParser:
+    """
+    Recursive descent parser for boolean queries.
+
+    query := and_query (OR and_query)*
+    and_query := not_query ([AND] not_query)*
+    not_query := NOT not_query | "(" query ")" | term
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, index: Index, text: str):
+        """Prepare to evaluate `text` against `index`."""
+        self.index = index
+        self.tokens = QUERY_PATTERN.findall(text)
+        self.position = 0
+
+    def parse(self) -> Set[int]:
+        """Evaluate the query, return the matching documents."""
+        if not self.tokens:
+            raise ValueError("Empty query")
+        docs = self._query()
+        if self.position < len(self.tokens):
+            raise ValueError(f"Unexpected {self.tokens[self.position]!r}")
+        return docs
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise ValueError("Unexpected end of query")
+        self.position += 1
+        return token
+
+    def _query(self) -> Set[int]:
+        docs = self._and_query()
+        while self._peek() == "OR":
+            self._next()
+            docs = docs | self._and_query()
+        return docs
+
+    def _and_query(self) -> Set[int]:
+        docs = self._not_query()
+        while self._peek() not in (None, "OR", ")"):
+            if self._peek() == "AND":
+                self._next()
+            docs = docs & self._not_query()
+        return docs
+
+    def _not_query(self) -> Set[int]:
+        token = self._next()
+        if token == "NOT":
+            return set(range(self.index.doc_count)) - self._not_query()
+        if token == "(":
+            docs = self._query()
+            if self._next() != ")":
+                raise ValueError("Missing )")
+            return docs
+        if token in OPERATORS or token == ")":
+            raise ValueError(f"Unexpected {token!r}")
+        return self._term(token)
+
+    def _term(self, token: str) -> Set[int]:
+        prefix = token.endswith("*")
+        terms = tokenize(token)
+        if not terms:
+            raise ValueError(f"No searchable characters in {token!r}")
+        # A token like "ec2-instance" is indexed as two terms, all of them must match
+        docs = None
+        for position, term in enumerate(terms):
+            if prefix and position == len(terms) - 1:
+                found = self.index.lookup_prefix(term)
+            else:
+                found = self.index.lookup(term)
+            docs = found if docs is None else docs & found
+        return docs
+
+
+def export_blog_posts(table_name: str, watermark: Optional[str]) -> Iterator[dict]:
+    """Yield the BlogPost items after the watermark in sort key order."""
+    items = archive.query(
+        table_name,
+        since=watermark,
+        ProjectionExpression=(
+            "SK, blog_url, title, post_excerpt, main_category, categories, authors"
+        ),
+    )
+    for item in items:
+        if item["SK"]["S"] != watermark:
+            yield item
+
+
+def update(arguments) -> None:
+    """Add the posts stored since the last update to the index."""
+    builder = IndexBuilder()
+    if os.path.exists(arguments.index) and not arguments.full:
+        index = Index(arguments.index)
+        try:
+            if index.meta.get("table") not in (None, arguments.table):
+                raise SystemExit(
+                    f"{arguments.index} indexes {index.meta['table']}, use --full to rebuild"
+                )
+            builder = IndexBuilder.from_index(index)
+        finally:
+            index.close()
+    builder.meta["table"] = arguments.table
+
+    before = len(builder.docs)
+    for item in export_blog_posts(arguments.table, builder.meta["watermark"]):
+        builder.add(item)
+    added = len(builder.docs) - before
+    if added or not os.path.exists(arguments.index) or arguments.full:
+        builder.write(arguments.index)
+    print(
+        f"Indexed {added} new posts, {len(builder.docs)} posts and {len(builder.postings)} terms "
+        f"up to {builder.meta['watermark']}"
+    )
+
+
+def query(arguments) -> None:
+    """Print the posts that match a query, newest first."""
+    started = time.perf_counter()
+    index = Index(arguments.index)
+    try:
+        docs = QueryParser(index, " ".join(arguments.query)).parse()
+        if arguments.since or arguments.until:
+            docs &= set(index.doc_range(arguments.since, arguments.until))
+        matches = sorted(docs, reverse=True)
+        results = [index.doc(number) for number in matches[: arguments.limit]]
+    except ValueError as exc:
+        raise SystemExit(f"Invalid query: {exc}") from exc
+    finally:
+        index.close()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    for sort_key, title, blog_url in results:
+        print(f"{sort_key[:10]}  {title}\n            {blog_url}")
+    shown = f", showing {len(results)}" if len(results) < len(matches) else ""
+    print(
+        f"{len(matches)} matching posts{shown} ({elapsed_ms:.1f} ms)", file=sys.stderr
+    )
+
+
+def main(argv: Iterable[str] = None) -> None:
+    """Parse the command line and run a command."""
+    parser = argparse.ArgumentParser(
+        description="Search the stored blog posts from a local index"
+    )
+    parser.add_argument(
+        "-i", "--index", default="blog_index.bin", help="Path of the index file"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    update_parser = commands.add_parser(
+        "update", help="Add new posts from the blogs table to the index"
+    )
+    update_parser.add_argument(
+        "-t", "--table", required=True, help="Name of the blogs table"
+    )
+    update_parser.add_argument(
+        "--full", action="store_true", help="Rebuild the index from scratch"
+    )
+    update_parser.set_defaults(func=update)
+
+    query_parser = commands.add_parser("query", help="Search the index")
+    query_parser.add_argument(
+        "query", nargs="+", help="Query, for example: graviton AND (arm OR grav*)"
+    )
+    query_parser.add_argument(
+        "--since", help="Only posts created on or after this date, e.g. 2026-07-01"
+    )
+    query_parser.add_argument(
+        "--until", help="Only posts created before this date, e.g. 2026-10-01"
+    )
+    query_parser.add_argument(
+        "-n", "--limit", type=int, default=20, help="Number of posts to print"
+    )
+    query_parser.set_defaults(func=query)
+
+    arguments = parser.parse_args(argv)
+    arguments.func(arguments)
+
+
+if __name__ == "__main__":
+    main()